@@ -5,7 +5,45 @@ A Python tool for forensic investigators to decode cookie files
 from iOS devices stored in binary format.
 """
 
-from pycookieparser.pycookieparser import PyCookieParser
+from pycookieparser.pycookieparser import (
+    AsyncPyCookieParser,
+    CandidateFilter,
+    Cookie,
+    CookieDeduplicator,
+    CookieFilter,
+    CookieIndex,
+    CookieSummary,
+    CookieTable,
+    CookieWriter,
+    CsvWriter,
+    JsonLinesWriter,
+    JsonWriter,
+    LazyCookie,
+    MemoryCache,
+    ParseCache,
+    PyCookieParser,
+    SqliteWriter,
+    TxtWriter,
+)
 
 __version__ = "0.0.2"
-__all__ = ["PyCookieParser"]
+__all__ = [
+    "AsyncPyCookieParser",
+    "CandidateFilter",
+    "Cookie",
+    "CookieDeduplicator",
+    "CookieFilter",
+    "CookieIndex",
+    "CookieSummary",
+    "CookieTable",
+    "CookieWriter",
+    "CsvWriter",
+    "JsonLinesWriter",
+    "JsonWriter",
+    "LazyCookie",
+    "MemoryCache",
+    "ParseCache",
+    "PyCookieParser",
+    "SqliteWriter",
+    "TxtWriter",
+]
@@ -1,10 +1,2619 @@
 import json
 import csv
 import argparse
+import fnmatch
+import asyncio
+import gzip
+import hashlib
+import io
 import os
-from struct import unpack
-from time import strftime, gmtime
-from collections import Counter
+import math
+import multiprocessing
+import pickle
+import sqlite3
+import sys
+import tarfile
+import zipfile
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice, repeat
+from mmap import mmap as MemoryMap, ACCESS_READ
+from struct import Struct
+from time import strftime, gmtime, time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from threading import Lock
+
+# Mac absolute time (2001-01-01) to Unix epoch offset, in seconds.
+MAC_EPOCH_OFFSET = 978307200
+
+# Magic bytes at the start of every binary cookie file.
+_MAGIC = b'cook'
+
+# Precompiled layouts of the binary cookie file structures.
+_FILE_HEADER = Struct('>4si')       # magic b'cook', number of pages
+_PAGE_HEADER = Struct('<4si')       # page header b'\x00\x00\x01\x00', cookie number
+_COOKIE_RECORD = Struct('<iiiiiiii8sdd')  # size, unknown, flag, unknown, url/name/path/value
+                                          # offsets, end of header, expiry date, create date
+_INT_BIG_ENDIAN = Struct('>i')
+_INT_LITTLE_ENDIAN = Struct('<i')
+_DOUBLE_LITTLE_ENDIAN = Struct('<d')
+
+# Seconds in a day, the bucket size of the date formatting cache.
+SECONDS_PER_DAY = 86400
+
+# Supported date formats: day strings such as 'Mon, 01 Jan 2001', or ISO-8601 such as '2001-01-01T00:00:00Z'.
+DATE_FORMATS = ('day', 'iso')
+
+# Cookie flag strings by the flag value stored in the file.
+_COOKIE_FLAGS = {
+    0: '',
+    1: 'Secure',
+    4: 'HttpOnly',
+    5: 'Secure; HttpOnly'
+}
+
+# Keys of the cookie dictionaries returned by the parser, in output order.
+COOKIE_FIELDS = ('name', 'value', 'url', 'path', 'expiry_date', 'create_date', 'cookie_flag')
+_ALL_FIELDS = frozenset(COOKIE_FIELDS)
+
+
+def _check_fields(fields) -> tuple:
+    """
+    Validate a selection of cookie fields, such as ('name', 'url').
+
+    :param fields: The selected fields, in output order, or None for all of them.
+    :type fields: tuple
+
+    :return: The fields without repetitions, or None for all of them.
+    :rtype: tuple or None
+
+    :raises ValueError: If no field is selected or a field is unknown.
+    """
+    if fields is None:
+        return None
+
+    fields = tuple(dict.fromkeys(fields))
+    unknown = [field for field in fields if field not in _ALL_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown cookie fields: {', '.join(unknown) or 'none selected'}. "
+                         f"Choose from: {', '.join(COOKIE_FIELDS)}")
+
+    return fields
+
+
+def _decode_string(buffer, offset: int, limit: int, encoding_errors: str = 'strict') -> str:
+    """
+    Decode a null-terminated UTF-8 string at a given offset in a buffer.
+    The string is sliced and decoded once.
+
+    :param buffer: The buffer to read from.
+    :type buffer: bytes or mmap.mmap
+    :param offset: The offset of the first character of the string.
+    :type offset: int
+    :param limit: The offset the terminator must be found before.
+    :type limit: int
+    :param encoding_errors: The error handling scheme for strings that are not valid UTF-8.
+    :type encoding_errors: str
+
+    :return: The decoded string.
+    :rtype: str
+    """
+    end = buffer.find(b'\x00', offset, limit)
+    if end < 0:
+        raise ValueError(f'Unterminated string at offset {offset}.')
+
+    return buffer[offset:end].decode('utf-8', encoding_errors)
+
+
+def _format_date(epoch: float, date_format: str = 'day') -> str:
+    """
+    Format a Unix epoch as a day string, such as 'Mon, 01 Jan 2001', or as an
+    ISO-8601 UTC timestamp, such as '2001-01-01T08:30:00Z'.
+
+    Many cookies share the same expiry or creation day, so the day part is
+    formatted once per day and cached.
+
+    :param epoch: The Unix epoch.
+    :type epoch: float
+    :param date_format: The date format, 'day' or 'iso'.
+    :type date_format: str
+
+    :return: The formatted date.
+    :rtype: str
+    """
+    day, seconds = divmod(epoch, SECONDS_PER_DAY)
+    if date_format == 'iso':
+        seconds = int(seconds)
+        return f'{_format_iso_day(int(day))}T{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}Z'
+
+    return _format_day(int(day))
+
+
+@lru_cache(maxsize=4096)
+def _format_day(day: int) -> str:
+    """
+    Format a day, counted from the Unix epoch, as a day string such as 'Mon, 01 Jan 2001'.
+
+    :param day: The number of days since the Unix epoch.
+    :type day: int
+
+    :return: The formatted day.
+    :rtype: str
+    """
+    return strftime("%a, %d %b %Y", gmtime(day * SECONDS_PER_DAY))
+
+
+@lru_cache(maxsize=4096)
+def _format_iso_day(day: int) -> str:
+    """
+    Format a day, counted from the Unix epoch, as an ISO-8601 date such as '2001-01-01'.
+
+    :param day: The number of days since the Unix epoch.
+    :type day: int
+
+    :return: The formatted day.
+    :rtype: str
+    """
+    return strftime("%Y-%m-%d", gmtime(day * SECONDS_PER_DAY))
+
+
+@lru_cache(maxsize=4096)
+def _date_epoch(date: str):
+    """
+    Return the Unix epoch of a date formatted by _format_date(). Day strings
+    give the start of their day.
+
+    :param date: The formatted date.
+    :type date: str
+
+    :return: The Unix epoch, or None if the date cannot be parsed.
+    :rtype: float or None
+    """
+    for pattern in ('%a, %d %b %Y', '%Y-%m-%dT%H:%M:%SZ'):
+        try:
+            return datetime.strptime(date, pattern).replace(tzinfo=timezone.utc).timestamp()
+        except (TypeError, ValueError):
+            pass
+
+    return None
+
+
+class Cookie(object):
+    """
+    A compact record of a single parsed cookie.
+
+    Besides the formatted fields of the cookie dictionaries (name, value, url,
+    path, expiry_date, create_date, and cookie_flag), a record keeps the raw
+    values read from the cookie file: the integer flag, the expiry and creation
+    dates both as stored (Mac absolute time) and as Unix epoch floats, and the
+    record offsets. The numeric dates can be sorted and compared directly. Records support
+    dictionary-style access to their fields, so they can be passed to
+    write_results() and summarize_cookies() as they are.
+
+    :param name: The cookie name.
+    :type name: str
+    :param value: The cookie value.
+    :type value: str
+    :param url: The cookie domain.
+    :type url: str
+    :param path: The cookie path.
+    :type path: str
+    :param expiry_date: The formatted expiry date.
+    :type expiry_date: str
+    :param create_date: The formatted creation date.
+    :type create_date: str
+    :param cookie_flag: The cookie flag as a string, such as 'Secure; HttpOnly'.
+    :type cookie_flag: str
+    :param flag: The cookie flag as stored in the file.
+    :type flag: int
+    :param expiry_date_epoch: The expiry date as a Unix epoch.
+    :type expiry_date_epoch: float
+    :param create_date_epoch: The creation date as a Unix epoch.
+    :type create_date_epoch: float
+    :param offset: The offset of the cookie record, relative to the start of its page.
+    :type offset: int
+    :param size: The size of the cookie record.
+    :type size: int
+    :param url_offset: The offset of the url string, relative to the start of the record.
+    :type url_offset: int
+    :param name_offset: The offset of the name string, relative to the start of the record.
+    :type name_offset: int
+    :param path_offset: The offset of the path string, relative to the start of the record.
+    :type path_offset: int
+    :param value_offset: The offset of the value string, relative to the start of the record.
+    :type value_offset: int
+    :param expiry_date_mac: The expiry date as stored in the file, in seconds since 2001-01-01.
+        Defaults to the value derived from expiry_date_epoch.
+    :type expiry_date_mac: float
+    :param create_date_mac: The creation date as stored in the file, in seconds since 2001-01-01.
+        Defaults to the value derived from create_date_epoch.
+    :type create_date_mac: float
+    """
+
+    __slots__ = COOKIE_FIELDS + ('flag', 'expiry_date_epoch', 'create_date_epoch', 'offset', 'size',
+                                 'url_offset', 'name_offset', 'path_offset', 'value_offset',
+                                 'expiry_date_mac', 'create_date_mac')
+
+    def __init__(self, name: str, value: str, url: str, path: str, expiry_date: str, create_date: str,
+                 cookie_flag: str, flag: int = 0, expiry_date_epoch: float = 0.0, create_date_epoch: float = 0.0,
+                 offset: int = 0, size: int = 0, url_offset: int = 0, name_offset: int = 0,
+                 path_offset: int = 0, value_offset: int = 0, expiry_date_mac: float = None,
+                 create_date_mac: float = None):
+        self.name = name
+        self.value = value
+        self.url = url
+        self.path = path
+        self.expiry_date = expiry_date
+        self.create_date = create_date
+        self.cookie_flag = cookie_flag
+        self.flag = flag
+        self.expiry_date_epoch = expiry_date_epoch
+        self.create_date_epoch = create_date_epoch
+        self.offset = offset
+        self.size = size
+        self.url_offset = url_offset
+        self.name_offset = name_offset
+        self.path_offset = path_offset
+        self.value_offset = value_offset
+        self.expiry_date_mac = expiry_date_epoch - MAC_EPOCH_OFFSET if expiry_date_mac is None else expiry_date_mac
+        self.create_date_mac = create_date_epoch - MAC_EPOCH_OFFSET if create_date_mac is None else create_date_mac
+
+    def __getitem__(self, key: str):
+        """
+        Return a field by name, like a cookie dictionary.
+
+        :param key: The field name.
+        :type key: str
+
+        :return: The field value.
+        :raises KeyError: If the record has no such field.
+        """
+        if key not in Cookie.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Cookie):
+            return NotImplemented
+        return all(getattr(self, key) == getattr(other, key) for key in Cookie.__slots__)
+
+    def __repr__(self):
+        return f'Cookie(name={self.name!r}, url={self.url!r}, path={self.path!r})'
+
+    def get(self, key: str, default=None):
+        """
+        Return a field by name, or a default value if the record has no such field.
+
+        :param key: The field name.
+        :type key: str
+        :param default: The value returned for unknown fields.
+
+        :return: The field value, or the default value.
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> dict:
+        """
+        Convert the record to a cookie dictionary, as returned by the parser by default.
+
+        :return: A dictionary with the name, value, url, path, expiry_date, create_date,
+            and cookie_flag keys.
+        :rtype: dict
+        """
+        return {key: getattr(self, key) for key in COOKIE_FIELDS}
+
+
+def _lazy_field(field: str, decode):
+    """
+    Build a property that computes a Cookie field on first access and caches it
+    in the field's slot.
+
+    :param field: The name of the Cookie field.
+    :type field: str
+    :param decode: A function computing the field value from the cookie.
+    :type decode: callable
+
+    :return: The property.
+    :rtype: property
+    """
+    slot = Cookie.__dict__[field]
+
+    def getter(self):
+        try:
+            return slot.__get__(self, Cookie)
+        except AttributeError:
+            value = decode(self)
+            slot.__set__(self, value)
+            return value
+
+    return property(getter, doc=f'The cookie {field}, computed on first access.')
+
+
+class LazyCookie(Cookie):
+    """
+    A cookie record that decodes its fields only when they are accessed.
+
+    The fixed-size part of the record (flag, dates, and offsets) is unpacked
+    when the cookie is created, but the url, name, path, and value strings are
+    decoded, and the dates formatted, on first access and then cached. Scans that
+    only look at some fields, such as the flag or the domain, skip the cost of
+    decoding the others.
+
+    A lazy cookie keeps a reference to the buffer of the cookie file. For
+    memory-mapped files, fields must be accessed before the file is closed.
+
+    :param buffer: The content of the cookie file, or of the page the cookie belongs to.
+    :type buffer: bytes or mmap.mmap
+    :param position: The offset of the cookie record in the buffer.
+    :type position: int
+    :param offset: The offset of the cookie record, relative to the start of its page.
+    :type offset: int
+    :param encoding_errors: The error handling scheme for strings that are not valid UTF-8.
+    :type encoding_errors: str
+    :param date_format: The date format, 'day' or 'iso'.
+    :type date_format: str
+    """
+
+    __slots__ = ('_buffer', '_position', '_encoding_errors', '_date_format')
+
+    def __init__(self, buffer, position: int, offset: int, encoding_errors: str = 'strict',
+                 date_format: str = 'day'):
+        (self.size, _, self.flag, _,
+         self.url_offset, self.name_offset, self.path_offset, self.value_offset,
+         _, self.expiry_date_mac, self.create_date_mac) = _COOKIE_RECORD.unpack_from(buffer, position)
+        self.offset = offset
+        self.expiry_date_epoch = self.expiry_date_mac + MAC_EPOCH_OFFSET
+        self.create_date_epoch = self.create_date_mac + MAC_EPOCH_OFFSET
+        self.cookie_flag = _COOKIE_FLAGS.get(self.flag, 'Unknown')
+        self._buffer = buffer
+        self._position = position
+        self._encoding_errors = encoding_errors
+        self._date_format = date_format
+
+    def _decode(self, string_offset: int) -> str:
+        """
+        Decode a string of the record.
+
+        :param string_offset: The offset of the string, relative to the start of the record.
+        :type string_offset: int
+
+        :return: The decoded string.
+        :rtype: str
+        """
+        return _decode_string(self._buffer, self._position + string_offset,
+                              self._position + self.size, self._encoding_errors)
+
+    url = _lazy_field('url', lambda self: self._decode(self.url_offset))
+    name = _lazy_field('name', lambda self: self._decode(self.name_offset))
+    path = _lazy_field('path', lambda self: self._decode(self.path_offset))
+    value = _lazy_field('value', lambda self: self._decode(self.value_offset))
+    expiry_date = _lazy_field('expiry_date', lambda self: _format_date(self.expiry_date_epoch, self._date_format))
+    create_date = _lazy_field('create_date', lambda self: _format_date(self.create_date_epoch, self._date_format))
+
+
+class CookieFilter(object):
+    """
+    Predicates on cookies, evaluated while a cookie file is parsed.
+
+    The flag and date predicates are checked against the fixed-size header of
+    each cookie record, then the domain against the url string alone, and the
+    name against the name string, so cookies that do not match are skipped
+    before their other strings are decoded and their dates formatted. A cookie
+    is kept if it matches all the given predicates::
+
+        cookie_filter = CookieFilter(domains=('.google.com',), secure=True, expires_after=time.time())
+        with PyCookieParser('cookies.binarycookies') as parser:
+            cookies = parser.read_cookie_file(cookie_filter=cookie_filter)
+
+    A domain matches itself and its subdomains, case-insensitively and with or
+    without a leading dot; a domain starting with '*.' only matches subdomains.
+
+    :param domains: Keep cookies of any of these domains.
+    :type domains: tuple
+    :param names: Keep cookies with any of these exact names.
+    :type names: tuple
+    :param secure: Keep only Secure cookies if True, or only cookies that are not if False.
+    :type secure: bool
+    :param http_only: Keep only HttpOnly cookies if True, or only cookies that are not if False.
+    :type http_only: bool
+    :param expires_after: Keep cookies expiring at or after this Unix epoch.
+    :type expires_after: float
+    :param expires_before: Keep cookies expiring before this Unix epoch.
+    :type expires_before: float
+    :param created_after: Keep cookies created at or after this Unix epoch.
+    :type created_after: float
+    :param created_before: Keep cookies created before this Unix epoch.
+    :type created_before: float
+    :param unexpired: Keep only the cookies that have not expired yet when they are checked.
+        The current time is not part of the filter, so parse caches are not used with it.
+    :type unexpired: bool
+    """
+
+    def __init__(self, domains: tuple = None, names: tuple = None, secure: bool = None, http_only: bool = None,
+                 expires_after: float = None, expires_before: float = None, created_after: float = None,
+                 created_before: float = None, unexpired: bool = False):
+        self.domains = tuple(domains) if domains else None
+        self.names = frozenset(names) if names else None
+        self.secure = secure
+        self.http_only = http_only
+        self.expires_after = expires_after
+        self.expires_before = expires_before
+        self.created_after = created_after
+        self.created_before = created_before
+        self.unexpired = unexpired
+
+        # (domain without wildcard or leading dot, whether the domain itself matches)
+        self._domains = tuple((domain.lower().lstrip('*').lstrip('.'), not domain.startswith('*.'))
+                              for domain in self.domains or ())
+
+    def __repr__(self):
+        # the parse caches key results on the repr of the parse options
+        fields = ('domains', 'names', 'secure', 'http_only', 'expires_after', 'expires_before',
+                  'created_after', 'created_before')
+        options = {field: getattr(self, field) for field in fields}
+        options['names'] = sorted(self.names) if self.names else None
+        options['unexpired'] = True if self.unexpired else None
+        return 'CookieFilter({})'.format(', '.join(
+            f'{field}={value!r}' for field, value in options.items() if value is not None))
+
+    @classmethod
+    def parse(cls, expressions: list) -> 'CookieFilter':
+        """
+        Build a filter from expressions such as 'domain=.google.com', 'name=SID',
+        'secure', 'httponly', 'insecure', 'unexpired', 'expires_after=2025-01-01' or
+        'created_before=2024-06-30T12:00:00'. Dates are ISO-8601, in UTC unless they
+        give a time zone, or Unix epochs. Repeated domains and names are alternatives.
+
+        :param expressions: The filter expressions.
+        :type expressions: list
+
+        :return: The filter.
+        :rtype: CookieFilter
+
+        :raises ValueError: If an expression is not valid.
+        """
+        domains = []
+        names = []
+        options = {}
+
+        for expression in expressions:
+            key, _, value = expression.partition('=')
+            key = key.strip().lower()
+            value = value.strip()
+
+            if key == 'domain' and value:
+                domains.append(value)
+            elif key == 'name' and value:
+                names.append(value)
+            elif key in ('secure', 'insecure') and not value:
+                options['secure'] = key == 'secure'
+            elif key == 'httponly' and not value:
+                options['http_only'] = True
+            elif key == 'unexpired' and not value:
+                options['unexpired'] = True
+            elif key in ('expires_after', 'expires_before', 'created_after', 'created_before') and value:
+                options[key] = cls._parse_date(value)
+            else:
+                raise ValueError(f'Invalid filter: {expression}')
+
+        return cls(domains or None, names or None, **options)
+
+    def matches(self, cookie) -> bool:
+        """
+        Check whether a Cookie record matches. The fields are checked in the same
+        order as while parsing, so a LazyCookie only decodes the fields it needs.
+
+        :param cookie: The cookie record.
+        :type cookie: Cookie
+
+        :return: True if the cookie matches.
+        :rtype: bool
+        """
+        return (self.matches_header(cookie.flag, cookie.expiry_date_epoch, cookie.create_date_epoch)
+                and self.matches_url(cookie.url) and self.matches_name(cookie.name))
+
+    def matches_header(self, flag: int, expiry_date_epoch: float, create_date_epoch: float) -> bool:
+        """
+        Check the predicates on the flag and the dates of a cookie.
+
+        :param flag: The cookie flag as stored in the file.
+        :type flag: int
+        :param expiry_date_epoch: The expiry date as a Unix epoch.
+        :type expiry_date_epoch: float
+        :param create_date_epoch: The creation date as a Unix epoch.
+        :type create_date_epoch: float
+
+        :return: True if the predicates match.
+        :rtype: bool
+        """
+        if self.secure is not None and bool(flag & 1) != self.secure:
+            return False
+        if self.http_only is not None and bool(flag & 4) != self.http_only:
+            return False
+        if self.expires_after is not None and expiry_date_epoch < self.expires_after:
+            return False
+        if self.expires_before is not None and expiry_date_epoch >= self.expires_before:
+            return False
+        if self.created_after is not None and create_date_epoch < self.created_after:
+            return False
+        if self.created_before is not None and create_date_epoch >= self.created_before:
+            return False
+        if self.unexpired and expiry_date_epoch < time():
+            return False
+        return True
+
+    def matches_url(self, url: str) -> bool:
+        """
+        Check the domain predicate.
+
+        :param url: The cookie domain.
+        :type url: str
+
+        :return: True if the predicate matches.
+        :rtype: bool
+        """
+        if not self._domains:
+            return True
+
+        url = url.lower().lstrip('.')
+        return any((url == domain and itself) or url.endswith('.' + domain) for domain, itself in self._domains)
+
+    def matches_name(self, name: str) -> bool:
+        """
+        Check the name predicate.
+
+        :param name: The cookie name.
+        :type name: str
+
+        :return: True if the predicate matches.
+        :rtype: bool
+        """
+        return self.names is None or name in self.names
+
+    @staticmethod
+    def _parse_date(value: str) -> float:
+        """
+        Parse an ISO-8601 date or a Unix epoch.
+
+        :param value: The date.
+        :type value: str
+
+        :return: The Unix epoch.
+        :rtype: float
+        """
+        try:
+            return float(value)
+        except ValueError:
+            pass
+
+        date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return date.timestamp()
+
+
+class CookieTable(object):
+    """
+    A columnar table of parsed cookies.
+
+    The numeric fields are stored in parallel arrays (flag, expiry_date_epoch,
+    and create_date_epoch), and the url, path, cookie_flag, and source columns
+    are interned: each distinct string is stored once and rows hold integer codes
+    into it. The parser fills a table directly, without building a dictionary
+    per cookie::
+
+        with PyCookieParser('cookies.binarycookies') as parser:
+            table = parser.read_cookie_table()
+        google = table.filter(url='.google.com')
+
+    Iterating over a table yields cookie dictionaries, so a table can also be
+    passed to write_results() and summarize_cookies().
+
+    :param date_format: The format of the expiry_date and create_date columns, 'day' or 'iso'.
+    :type date_format: str
+    """
+
+    INTERNED_COLUMNS = ('url', 'path', 'cookie_flag', 'source')
+    NUMERIC_COLUMNS = ('flag', 'expiry_date_epoch', 'create_date_epoch')
+
+    def __init__(self, date_format: str = 'day'):
+        self.date_format = date_format
+        self.name = []
+        self.value = []
+        self.flag = array('i')
+        self.expiry_date_epoch = array('d')
+        self.create_date_epoch = array('d')
+        self._codes = {column: array('i') for column in self.INTERNED_COLUMNS}
+        self._categories = {column: [] for column in self.INTERNED_COLUMNS}
+        self._lookup = {column: {} for column in self.INTERNED_COLUMNS}
+
+    def __len__(self):
+        return len(self.name)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def append(self, name: str, value: str, url: str, path: str, cookie_flag: str, flag: int,
+               expiry_date_epoch: float, create_date_epoch: float, source: str = '') -> None:
+        """
+        Append a cookie to the table.
+
+        :param name: The cookie name.
+        :type name: str
+        :param value: The cookie value.
+        :type value: str
+        :param url: The cookie domain.
+        :type url: str
+        :param path: The cookie path.
+        :type path: str
+        :param cookie_flag: The cookie flag as a string.
+        :type cookie_flag: str
+        :param flag: The cookie flag as stored in the file.
+        :type flag: int
+        :param expiry_date_epoch: The expiry date as a Unix epoch.
+        :type expiry_date_epoch: float
+        :param create_date_epoch: The creation date as a Unix epoch.
+        :type create_date_epoch: float
+        :param source: The file the cookie was read from.
+        :type source: str
+        """
+        self.name.append(name)
+        self.value.append(value)
+        self.flag.append(flag)
+        self.expiry_date_epoch.append(expiry_date_epoch)
+        self.create_date_epoch.append(create_date_epoch)
+        self._codes['url'].append(self._intern('url', url))
+        self._codes['path'].append(self._intern('path', path))
+        self._codes['cookie_flag'].append(self._intern('cookie_flag', cookie_flag))
+        self._codes['source'].append(self._intern('source', source))
+
+    def extend(self, other: 'CookieTable', source: str = None) -> None:
+        """
+        Append all cookies of another table.
+
+        :param other: The table to append.
+        :type other: CookieTable
+        :param source: If given, the source of all appended cookies, replacing their own.
+        :type source: str
+        """
+        self.name.extend(other.name)
+        self.value.extend(other.value)
+        self.flag.extend(other.flag)
+        self.expiry_date_epoch.extend(other.expiry_date_epoch)
+        self.create_date_epoch.extend(other.create_date_epoch)
+
+        for column in self.INTERNED_COLUMNS:
+            if column == 'source' and source is not None:
+                self._codes[column].extend(repeat(self._intern(column, source), len(other)))
+                continue
+            # translate the codes of the other table into codes of this one
+            codes = [self._intern(column, category) for category in other._categories[column]]
+            self._codes[column].extend(codes[code] for code in other._codes[column])
+
+    def categories(self, column: str) -> list:
+        """
+        Return the distinct values of an interned column, indexed by their codes.
+
+        :param column: The column name: url, path, cookie_flag, or source.
+        :type column: str
+
+        :return: List of distinct values.
+        :rtype: list
+        """
+        return self._categories[column]
+
+    def codes(self, column: str) -> memoryview:
+        """
+        Return the integer codes of an interned column without copying them.
+
+        :param column: The column name: url, path, cookie_flag, or source.
+        :type column: str
+
+        :return: A view of the codes, one per row.
+        :rtype: memoryview
+        """
+        return memoryview(self._codes[column])
+
+    def column(self, column: str) -> list:
+        """
+        Return the values of a column as a list.
+        The expiry_date and create_date columns are formatted from the epoch columns.
+
+        :param column: The column name.
+        :type column: str
+
+        :return: List of values, one per row.
+        :rtype: list
+        """
+        if column in self.INTERNED_COLUMNS:
+            categories = self._categories[column]
+            return [categories[code] for code in self._codes[column]]
+        if column == 'expiry_date':
+            return [_format_date(epoch, self.date_format) for epoch in self.expiry_date_epoch]
+        if column == 'create_date':
+            return [_format_date(epoch, self.date_format) for epoch in self.create_date_epoch]
+        if column in ('name', 'value') or column in self.NUMERIC_COLUMNS:
+            return list(getattr(self, column))
+        raise KeyError(column)
+
+    def row(self, index: int) -> dict:
+        """
+        Return a single row as a cookie dictionary.
+
+        :param index: The row index.
+        :type index: int
+
+        :return: A dictionary with the name, value, url, path, expiry_date, create_date,
+            and cookie_flag keys.
+        :rtype: dict
+        """
+        return {
+            'name': self.name[index],
+            'value': self.value[index],
+            'url': self._categories['url'][self._codes['url'][index]],
+            'path': self._categories['path'][self._codes['path'][index]],
+            'expiry_date': _format_date(self.expiry_date_epoch[index], self.date_format),
+            'create_date': _format_date(self.create_date_epoch[index], self.date_format),
+            'cookie_flag': self._categories['cookie_flag'][self._codes['cookie_flag'][index]]
+        }
+
+    def rows(self, columns: tuple = COOKIE_FIELDS):
+        """
+        Iterate over the rows as tuples, for exporting without building a dictionary per row.
+
+        :param columns: The columns to include, in order.
+        :type columns: tuple
+
+        :return: A generator of tuples.
+        :rtype: generator
+        """
+        return zip(*(self.column(column) for column in columns))
+
+    def take(self, indices) -> 'CookieTable':
+        """
+        Return a new table with the rows at the given indices.
+
+        :param indices: The row indices.
+        :type indices: iterable
+
+        :return: A new table.
+        :rtype: CookieTable
+        """
+        table = CookieTable(self.date_format)
+        indices = list(indices)
+        table.name = [self.name[index] for index in indices]
+        table.value = [self.value[index] for index in indices]
+        for column in self.NUMERIC_COLUMNS:
+            values = getattr(self, column)
+            setattr(table, column, array(values.typecode, [values[index] for index in indices]))
+        for column in self.INTERNED_COLUMNS:
+            # the categories are shared, so the codes stay valid
+            codes = self._codes[column]
+            table._codes[column] = array('i', [codes[index] for index in indices])
+            table._categories[column] = list(self._categories[column])
+            table._lookup[column] = dict(self._lookup[column])
+
+        return table
+
+    def filter(self, url: str = None, path: str = None, cookie_flag: str = None, source: str = None,
+               flag: int = None, expires_after: float = None, expires_before: float = None) -> 'CookieTable':
+        """
+        Return a new table with the rows matching all given conditions.
+        Interned columns are compared by their integer codes.
+
+        :param url: Keep cookies of this domain.
+        :type url: str
+        :param path: Keep cookies with this path.
+        :type path: str
+        :param cookie_flag: Keep cookies with this flag string.
+        :type cookie_flag: str
+        :param source: Keep cookies read from this file.
+        :type source: str
+        :param flag: Keep cookies with this integer flag.
+        :type flag: int
+        :param expires_after: Keep cookies expiring at or after this Unix epoch.
+        :type expires_after: float
+        :param expires_before: Keep cookies expiring before this Unix epoch.
+        :type expires_before: float
+
+        :return: A new table.
+        :rtype: CookieTable
+        """
+        indices = range(len(self))
+
+        for column, wanted in (('url', url), ('path', path), ('cookie_flag', cookie_flag), ('source', source)):
+            if wanted is None:
+                continue
+            code = self._lookup[column].get(wanted)
+            codes = self._codes[column]
+            indices = [index for index in indices if codes[index] == code]
+
+        if flag is not None:
+            indices = [index for index in indices if self.flag[index] == flag]
+        if expires_after is not None:
+            indices = [index for index in indices if self.expiry_date_epoch[index] >= expires_after]
+        if expires_before is not None:
+            indices = [index for index in indices if self.expiry_date_epoch[index] < expires_before]
+
+        return self.take(indices)
+
+    def count_by(self, column: str) -> Counter:
+        """
+        Count the rows per value of an interned column, such as the cookies per domain.
+
+        :param column: The column name: url, path, cookie_flag, or source.
+        :type column: str
+
+        :return: A Counter mapping values to row counts.
+        :rtype: collections.Counter
+        """
+        categories = self._categories[column]
+        return Counter({categories[code]: count for code, count in Counter(self._codes[column]).items()})
+
+    def group_by(self, column: str) -> dict:
+        """
+        Group the row indices per value of an interned column, such as the rows per domain.
+
+        :param column: The column name: url, path, cookie_flag, or source.
+        :type column: str
+
+        :return: A dictionary mapping values to lists of row indices.
+        :rtype: dict
+        """
+        groups = {}
+        categories = self._categories[column]
+        for index, code in enumerate(self._codes[column]):
+            groups.setdefault(categories[code], []).append(index)
+
+        return groups
+
+    def to_numpy(self) -> dict:
+        """
+        Convert the table to NumPy arrays. Requires NumPy to be installed.
+        The numeric columns share memory with the table; interned columns
+        become object arrays.
+
+        :return: A dictionary mapping column names to arrays.
+        :rtype: dict
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('NumPy is required for CookieTable.to_numpy(). Install it with: pip install numpy')
+
+        columns = {
+            'name': numpy.array(self.name, dtype=object),
+            'value': numpy.array(self.value, dtype=object),
+        }
+        for column in self.NUMERIC_COLUMNS:
+            values = getattr(self, column)
+            columns[column] = numpy.frombuffer(values, dtype=numpy.int32 if values.typecode == 'i' else numpy.float64)
+        for column in self.INTERNED_COLUMNS:
+            categories = numpy.array(self._categories[column], dtype=object)
+            columns[column] = categories[numpy.frombuffer(self._codes[column], dtype=numpy.int32)]
+
+        return columns
+
+    def _intern(self, column: str, value: str) -> int:
+        """
+        Return the code of a value in an interned column, adding the value if it is new.
+
+        :param column: The column name.
+        :type column: str
+        :param value: The value.
+        :type value: str
+
+        :return: The code of the value.
+        :rtype: int
+        """
+        lookup = self._lookup[column]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(self._categories[column])
+            self._categories[column].append(value)
+
+        return code
+
+
+# Fields of a cookie whose strings repeat across cookies and files.
+_INTERNED_FIELDS = ('url', 'path', 'cookie_flag')
+
+
+class CookieDeduplicator(object):
+    """
+    A deduplication stage for batch results, at two levels.
+
+    Files with the same content as a file already seen, such as copies of the
+    same store in several cases, are dropped as a whole. Given to the batch
+    methods, the deduplicator hashes the content of every candidate file and
+    drops duplicate files before they are parsed. Within the remaining files, a
+    cookie is a duplicate of an earlier one with the same domain, name, path and
+    creation time. Only the first occurrence of each cookie is kept, and domain,
+    path and flag strings are interned across all cookies. Every file a cookie
+    was found in is kept in its provenance list::
+
+        deduplicator = CookieDeduplicator()
+        results = PyCookieParser.iter_batch_process('dataset', as_record=True, deduplicator=deduplicator)
+        for file_name, cookies in deduplicator.deduplicate(results):
+            print(file_name, len(cookies), 'new cookies')
+
+        for cookie in deduplicator.unique_cookies():
+            print(cookie['url'], deduplicator.provenance(cookie))
+
+    The creation time of Cookie records is compared as stored in the file. Cookie
+    dictionaries only have a formatted creation date, which cannot tell apart the
+    cookies created on the same day, so a dictionary is only a duplicate of one
+    with all the same fields. Parse with as_record=True to deduplicate by creation time.
+
+    Results added without going through filter() have no file content, so a
+    file is then a duplicate if its non-empty list of cookies is identical to
+    that of a file already seen.
+    """
+
+    def __init__(self):
+        self.files_seen = 0
+        self.duplicate_files = 0
+        self.cookies_seen = 0
+        self.duplicate_cookies = 0
+        self._file_keys = {}
+        self._file_sources = {}
+        self._file_digests = {}
+        self._cookies = {}
+        self._sources = {}
+        self._strings = {}
+
+    def add(self, source: str, cookies: list) -> list:
+        """
+        Add the cookies of a file, and return those that were not seen before.
+
+        :param source: The name of the file.
+        :type source: str
+        :param cookies: The cookies of the file.
+        :type cookies: list
+
+        :return: The new cookies, or None if the file is a duplicate.
+        :rtype: list or None
+        """
+        self.cookies_seen += len(cookies)
+        # files that went through filter() were counted and checked there
+        digest = self._file_digests.get(source)
+        if digest is None:
+            self.files_seen += 1
+            # every empty or fully filtered file has the same cookies, but not the same content
+            digest = self._file_digest(cookies) if cookies else None
+
+        keys = self._file_keys.get(digest)
+        if keys is not None:
+            self.duplicate_files += 1
+            self.duplicate_cookies += len(cookies)
+            self._file_sources[digest].append(source)
+            for key in keys:
+                self._add_source(key, source)
+            return None
+
+        keys = []
+        new_cookies = []
+        for cookie in cookies:
+            key = self._cookie_key(cookie)
+            keys.append(key)
+            if key in self._cookies:
+                self.duplicate_cookies += 1
+            else:
+                self._intern(cookie)
+                self._cookies[key] = cookie
+                new_cookies.append(cookie)
+            self._add_source(key, source)
+
+        if digest is not None:
+            self._file_keys[digest] = keys
+            self._file_sources.setdefault(digest, [source])
+
+        return new_cookies
+
+    def filter(self, sources):
+        """
+        Filter (name, file path or content) tuples, dropping the files whose content
+        was already seen. The first file with a given content is kept, and the files
+        dropped are added to the provenance of its cookies.
+
+        :param sources: An iterable of (name, file path or content) tuples.
+        :type sources: iterable
+
+        :return: A generator of the tuples of the files not seen before.
+        :rtype: generator
+        """
+        for name, source in sources:
+            self.files_seen += 1
+            try:
+                digest = self._content_digest(source)
+            except OSError:
+                # left to the parser, which skips the files it cannot read
+                yield name, source
+                continue
+
+            names = self._file_sources.get(digest)
+            if names is not None:
+                self.duplicate_files += 1
+                names.append(name)
+                continue
+
+            self._file_sources[digest] = [name]
+            self._file_digests[name] = digest
+            yield name, source
+
+    def deduplicate(self, results):
+        """
+        Deduplicate a stream of batch results. Duplicate files are skipped,
+        and other files are yielded with their new cookies only.
+
+        :param results: An iterable of (file name, list of cookies) tuples.
+        :type results: iterable
+
+        :return: A generator of (file name, list of new cookies) tuples.
+        :rtype: generator
+        """
+        for source, cookies in results:
+            new_cookies = self.add(source, cookies)
+            if new_cookies is not None:
+                yield source, new_cookies
+
+    def unique_cookies(self) -> list:
+        """
+        Return the first occurrence of every cookie, in the order they were found.
+
+        :return: List of unique cookies.
+        :rtype: list
+        """
+        return list(self._cookies.values())
+
+    def provenance(self, cookie) -> list:
+        """
+        Return the files a cookie was found in.
+
+        :param cookie: The cookie.
+        :type cookie: dict or Cookie
+
+        :return: List of file names, in the order they were added, each followed by the
+            files dropped as duplicates of it.
+        :rtype: list
+        """
+        sources = self._sources.get(self._cookie_key(cookie), [])
+        return [name for source in sources
+                for name in (self._file_sources[self._file_digests[source]]
+                             if source in self._file_digests else (source,))]
+
+    def file_duplicates(self) -> dict:
+        """
+        Return the files that were dropped as duplicates, by the first file with the same content or cookies.
+
+        :return: A dictionary mapping file names to lists of duplicate file names.
+        :rtype: dict
+        """
+        return {sources[0]: sources[1:] for sources in self._file_sources.values() if len(sources) > 1}
+
+    def _intern(self, cookie) -> None:
+        """
+        Replace the domain, path and flag strings of a cookie with the first equal strings seen.
+
+        :param cookie: The cookie.
+        :type cookie: dict or Cookie
+        """
+        for field in _INTERNED_FIELDS:
+            value = cookie[field]
+            value = self._strings.setdefault(value, value)
+            if isinstance(cookie, Cookie):
+                # through the slot, since the fields of lazy records are read-only properties
+                Cookie.__dict__[field].__set__(cookie, value)
+            else:
+                cookie[field] = value
+
+    def _add_source(self, key: tuple, source: str) -> None:
+        """
+        Add a file to the provenance list of a cookie, once.
+
+        :param key: The key of the cookie.
+        :type key: tuple
+        :param source: The name of the file.
+        :type source: str
+        """
+        sources = self._sources.setdefault(key, [])
+        if not sources or sources[-1] != source:
+            sources.append(source)
+
+    @staticmethod
+    def _cookie_key(cookie) -> tuple:
+        """
+        Return the identity of a cookie: its domain, name, path and creation time,
+        or all the fields of a cookie dictionary.
+
+        :param cookie: The cookie.
+        :type cookie: dict or Cookie
+
+        :return: The key.
+        :rtype: tuple
+        """
+        if isinstance(cookie, Cookie):
+            return cookie.url, cookie.name, cookie.path, cookie.create_date_mac
+
+        return tuple(cookie.get(field) for field in COOKIE_FIELDS)
+
+    @staticmethod
+    def _content_digest(source) -> str:
+        """
+        Return a digest of the content of a file.
+
+        :param source: The path to the file, or its content.
+        :type source: str or bytes
+
+        :return: The hex digest.
+        :rtype: str
+        """
+        if isinstance(source, bytes):
+            return hashlib.sha256(source).hexdigest()
+
+        file_hash = hashlib.sha256()
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                file_hash.update(chunk)
+
+        return file_hash.hexdigest()
+
+    @staticmethod
+    def _file_digest(cookies: list) -> str:
+        """
+        Return a digest of all the fields of the cookies of a file.
+
+        :param cookies: The cookies of the file.
+        :type cookies: list
+
+        :return: The hex digest.
+        :rtype: str
+        """
+        file_hash = hashlib.sha256()
+        for cookie in cookies:
+            file_hash.update(repr((tuple(cookie.get(field) for field in COOKIE_FIELDS),
+                                   getattr(cookie, 'expiry_date_mac', None),
+                                   getattr(cookie, 'create_date_mac', None))).encode('utf-8', 'surrogatepass'))
+
+        return file_hash.hexdigest()
+
+
+def _expiry_year(cookie):
+    """
+    Return the year a cookie expires in, from its formatted expiry date.
+
+    :param cookie: The cookie.
+    :type cookie: dict or Cookie
+
+    :return: The year, or None if it cannot be determined.
+    :rtype: int or None
+    """
+    expiry_date = cookie.get('expiry_date') or ''
+    # ISO-8601 dates start with the year, day strings end with it
+    year = expiry_date[:4] if expiry_date[:4].isdigit() else expiry_date[-4:]
+    return int(year) if year.isdigit() else None
+
+
+def _epoch_year(epoch: float):
+    """
+    Return the UTC year of a Unix epoch time, through the per-day date cache.
+
+    :param epoch: The Unix epoch time.
+    :type epoch: float
+
+    :return: The year, or None if the time is out of range.
+    :rtype: int or None
+    """
+    try:
+        return int(_format_iso_day(int(epoch // SECONDS_PER_DAY))[:4])
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+class _HyperLogLog(object):
+    """
+    A HyperLogLog sketch estimating the number of distinct strings in constant memory.
+    Strings are hashed with BLAKE2b rather than hash(), so that sketches built in
+    different processes can be merged.
+
+    :param precision: The number of index bits; the sketch has 2 ** precision registers.
+    :type precision: int
+    """
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str) -> None:
+        """
+        Add a string to the sketch.
+
+        :param value: The string.
+        :type value: str
+        """
+        digest = hashlib.blake2b(value.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+        bits = int.from_bytes(digest, 'big')
+        rest_bits = 64 - self.precision
+        index = bits >> rest_bits
+        rank = rest_bits - (bits & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: '_HyperLogLog') -> None:
+        """
+        Merge another sketch of the same precision into this one.
+
+        :param other: The other sketch.
+        :type other: _HyperLogLog
+        """
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """
+        Estimate the number of distinct strings added.
+
+        :return: The estimate.
+        :rtype: int
+        """
+        size = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / size) * size * size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # linear counting is more accurate for small cardinalities
+            estimate = size * math.log(size / zeros)
+
+        return int(round(estimate))
+
+
+class _SpaceSaving(object):
+    """
+    A Space-Saving sketch of the most frequent strings, holding a bounded number of counters.
+    Counts of the strings it reports may be overestimated, never underestimated.
+
+    :param capacity: The number of counters.
+    :type capacity: int
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = {}
+
+    def add(self, value: str, count: int = 1) -> None:
+        """
+        Count a string.
+
+        :param value: The string.
+        :type value: str
+        :param count: The number of occurrences.
+        :type count: int
+        """
+        counts = self.counts
+        if value in counts:
+            counts[value] += count
+        elif len(counts) < self.capacity:
+            counts[value] = count
+        else:
+            # the new string takes over the smallest counter
+            smallest = min(counts, key=counts.get)
+            counts[value] = counts.pop(smallest) + count
+
+    def merge(self, other: '_SpaceSaving') -> None:
+        """
+        Merge another sketch into this one, keeping the largest counters.
+
+        :param other: The other sketch.
+        :type other: _SpaceSaving
+        """
+        counts = Counter(self.counts)
+        counts.update(other.counts)
+        self.counts = dict(counts.most_common(self.capacity))
+
+    def most_common(self, n: int) -> list:
+        """
+        Return the n most frequent strings and their counts.
+
+        :param n: The number of strings.
+        :type n: int
+
+        :return: List of (string, count) tuples.
+        :rtype: list
+        """
+        return Counter(self.counts).most_common(n)
+
+
+class CookieSummary(object):
+    """
+    A streaming summary of cookies, updated as cookies are parsed.
+
+    Besides the totals of summarize_cookies(), it counts cookies per file, builds
+    a histogram of expiry years, and computes the share of Secure and HttpOnly
+    cookies, overall and per domain. Summaries built separately, such as in worker
+    processes, can be merged::
+
+        summary = CookieSummary()
+        for file_name, cookies in PyCookieParser.iter_batch_process('dataset'):
+            summary.update(cookies, source=file_name)
+        print(summary.to_dict()['secure_ratio'])
+
+    Exact summaries keep a counter per domain. For very large runs, the approximate
+    mode estimates the number of distinct domains with a HyperLogLog sketch and the
+    top domains with a bounded Space-Saving sketch, in constant memory. Per-domain
+    flag ratios are only kept in exact mode.
+
+    :param top_k: The number of top domains reported.
+    :type top_k: int
+    :param approximate: If True, count domains with bounded-memory sketches.
+    :type approximate: bool
+    :param precision: The precision of the HyperLogLog sketch in approximate mode.
+    :type precision: int
+    """
+
+    def __init__(self, top_k: int = 10, approximate: bool = False, precision: int = 14):
+        self.top_k = top_k
+        self.approximate = approximate
+        self.total_cookies = 0
+        self.secure_cookies = 0
+        self.http_only_cookies = 0
+        self.flag_counts = Counter()
+        self.file_counts = Counter()
+        self.expiry_years = Counter()
+
+        if approximate:
+            self._distinct_domains = _HyperLogLog(precision)
+            self._top_domains = _SpaceSaving(max(top_k * 10, 100))
+        else:
+            self.domain_counts = Counter()
+            # domain -> [Secure cookies, HttpOnly cookies]
+            self.domain_flags = {}
+
+    def add(self, cookie, source: str = None) -> None:
+        """
+        Add a single cookie.
+
+        :param cookie: The cookie.
+        :type cookie: dict or Cookie
+        :param source: The file the cookie was read from.
+        :type source: str
+        """
+        self._add(cookie.get('url', ''), cookie.get('cookie_flag', ''), _expiry_year(cookie), source)
+
+    def update(self, cookies, source: str = None) -> 'CookieSummary':
+        """
+        Add cookies from any iterable, such as a list, a generator or a CookieTable.
+        The sources of the rows of a table are used if no source is given.
+
+        :param cookies: The cookies.
+        :type cookies: iterable
+        :param source: The file the cookies were read from.
+        :type source: str
+
+        :return: The summary itself.
+        :rtype: CookieSummary
+        """
+        if isinstance(cookies, CookieTable):
+            sources = repeat(source) if source is not None else cookies.column('source')
+            for domain, flag, epoch, row_source in zip(cookies.column('url'), cookies.column('cookie_flag'),
+                                                       cookies.expiry_date_epoch, sources):
+                self._add(domain, flag, _epoch_year(epoch), row_source or None)
+            return self
+
+        for cookie in cookies or ():
+            self._add(cookie.get('url', ''), cookie.get('cookie_flag', ''), _expiry_year(cookie), source)
+
+        return self
+
+    def merge(self, other: 'CookieSummary') -> 'CookieSummary':
+        """
+        Merge another summary of the same mode into this one.
+
+        :param other: The other summary.
+        :type other: CookieSummary
+
+        :return: The summary itself.
+        :rtype: CookieSummary
+        """
+        if other.approximate != self.approximate:
+            raise ValueError('Cannot merge an exact and an approximate summary.')
+
+        self.total_cookies += other.total_cookies
+        self.secure_cookies += other.secure_cookies
+        self.http_only_cookies += other.http_only_cookies
+        self.flag_counts.update(other.flag_counts)
+        self.file_counts.update(other.file_counts)
+        self.expiry_years.update(other.expiry_years)
+
+        if self.approximate:
+            self._distinct_domains.merge(other._distinct_domains)
+            self._top_domains.merge(other._top_domains)
+        else:
+            self.domain_counts.update(other.domain_counts)
+            for domain, (secure, http_only) in other.domain_flags.items():
+                flags = self.domain_flags.setdefault(domain, [0, 0])
+                flags[0] += secure
+                flags[1] += http_only
+
+        return self
+
+    def to_dict(self) -> dict:
+        """
+        Return the summary as a dictionary, with the keys of summarize_cookies() and:
+        secure_ratio and http_only_ratio, the share of Secure and HttpOnly cookies;
+        files, the number of cookies per file; expiry_histogram, the number of cookies
+        per expiry year; domain_flags, the number of cookies and the Secure and HttpOnly
+        ratios per domain, empty in approximate mode; and approximate.
+
+        :return: A dictionary containing summary statistics.
+        :rtype: dict
+        """
+        if self.approximate:
+            unique_domains = self._distinct_domains.count() if self.total_cookies else 0
+            top_domains = self._top_domains.most_common(self.top_k)
+            domain_flags = {}
+        else:
+            unique_domains = len(self.domain_counts)
+            top_domains = self.domain_counts.most_common(self.top_k)
+            domain_flags = {}
+            for domain, count in self.domain_counts.items():
+                secure, http_only = self.domain_flags.get(domain, (0, 0))
+                domain_flags[domain] = {'cookies': count, 'secure_ratio': secure / count,
+                                        'http_only_ratio': http_only / count}
+
+        return {
+            'total_cookies': self.total_cookies,
+            'unique_domains': unique_domains,
+            'flag_distribution': dict(self.flag_counts),
+            'top_domains': top_domains,
+            'secure_ratio': self.secure_cookies / self.total_cookies if self.total_cookies else 0.0,
+            'http_only_ratio': self.http_only_cookies / self.total_cookies if self.total_cookies else 0.0,
+            'files': dict(self.file_counts),
+            'expiry_histogram': {year: self.expiry_years[year]
+                                 for year in sorted(self.expiry_years, key=lambda year: (year is None, year or 0))},
+            'domain_flags': domain_flags,
+            'approximate': self.approximate,
+        }
+
+    def _add(self, domain: str, flag: str, expiry_year, source: str) -> None:
+        """
+        Count a cookie.
+
+        :param domain: The domain of the cookie.
+        :type domain: str
+        :param flag: The flag text of the cookie.
+        :type flag: str
+        :param expiry_year: The year the cookie expires in.
+        :type expiry_year: int
+        :param source: The file the cookie was read from, or None.
+        :type source: str
+        """
+        self.total_cookies += 1
+        self.flag_counts[flag] += 1
+        self.expiry_years[expiry_year] += 1
+        if source is not None:
+            self.file_counts[source] += 1
+
+        secure = 'Secure' in flag
+        http_only = 'HttpOnly' in flag
+        self.secure_cookies += secure
+        self.http_only_cookies += http_only
+
+        if self.approximate:
+            self._distinct_domains.add(domain)
+            self._top_domains.add(domain)
+            return
+
+        self.domain_counts[domain] += 1
+        if secure or http_only:
+            flags = self.domain_flags.setdefault(domain, [0, 0])
+            flags[0] += secure
+            flags[1] += http_only
+
+
+# Key of the row list in a domain trie node; labels are never empty.
+_ROWS = ''
+
+
+class CookieIndex(object):
+    """
+    An index of parsed cookies by domain, name and source file, for fast lookups
+    across a whole corpus, such as "which devices had a cookie for this domain".
+
+    Domains are stored in a trie of their labels in reverse order, so that a
+    domain and all its subdomains are found in one walk. Names and source files
+    are indexed in hash tables. The index is built as cookies are parsed, and
+    can be saved to disk and loaded again::
+
+        index = CookieIndex()
+        for file_name, cookies in PyCookieParser.iter_batch_process('dataset'):
+            index.update(cookies, source=file_name)
+        index.save('dataset.index')
+
+        index = CookieIndex.load('dataset.index')
+        cookies = index.find(domain='.google.com', name='SID')
+        devices = index.sources(domain='.google.com')
+
+    The index is saved with pickle, so only load indexes you created yourself.
+    Lazy records keep the buffer of their file, so index Cookie records or
+    dictionaries instead.
+    """
+
+    def __init__(self):
+        self._cookies = []
+        self._sources = []
+        self._domains = {}
+        self._names = {}
+        self._files = {}
+
+    def __len__(self):
+        return len(self._cookies)
+
+    def add(self, cookie, source: str = None) -> None:
+        """
+        Add a single cookie.
+
+        :param cookie: The cookie.
+        :type cookie: dict or Cookie
+        :param source: The file the cookie was read from.
+        :type source: str
+        """
+        row = len(self._cookies)
+        self._cookies.append(cookie)
+        self._sources.append(source)
+
+        node = self._domains
+        for label in self._labels(cookie['url']):
+            node = node.setdefault(label, {})
+        node.setdefault(_ROWS, []).append(row)
+
+        self._names.setdefault(cookie['name'], []).append(row)
+        self._files.setdefault(source, []).append(row)
+
+    def update(self, cookies, source: str = None) -> 'CookieIndex':
+        """
+        Add cookies from any iterable.
+
+        :param cookies: The cookies.
+        :type cookies: iterable
+        :param source: The file the cookies were read from.
+        :type source: str
+
+        :return: The index itself.
+        :rtype: CookieIndex
+        """
+        for cookie in cookies:
+            self.add(cookie, source)
+
+        return self
+
+    def find(self, domain: str = None, name: str = None, source: str = None) -> list:
+        """
+        Find the cookies matching all the given criteria, in the order they were added.
+
+        A domain matches itself and its subdomains, with or without a leading dot:
+        '.google.com' and 'google.com' both match 'google.com', '.google.com' and
+        'mail.google.com'. A domain starting with '*.' only matches subdomains.
+
+        :param domain: The domain.
+        :type domain: str
+        :param name: The exact cookie name.
+        :type name: str
+        :param source: The exact source file.
+        :type source: str
+
+        :return: List of cookies.
+        :rtype: list
+        """
+        return [self._cookies[row] for row in self._find_rows(domain, name, source)]
+
+    def find_with_sources(self, domain: str = None, name: str = None, source: str = None) -> list:
+        """
+        Find the cookies matching all the given criteria, with the file each one was read from.
+
+        :param domain: The domain, matched as in find().
+        :type domain: str
+        :param name: The exact cookie name.
+        :type name: str
+        :param source: The exact source file.
+        :type source: str
+
+        :return: List of (source file, cookie) tuples.
+        :rtype: list
+        """
+        return [(self._sources[row], self._cookies[row]) for row in self._find_rows(domain, name, source)]
+
+    def sources(self, domain: str = None, name: str = None) -> list:
+        """
+        Find the files with at least one cookie matching the given criteria.
+
+        :param domain: The domain, matched as in find().
+        :type domain: str
+        :param name: The exact cookie name.
+        :type name: str
+
+        :return: List of source files, in the order they were added.
+        :rtype: list
+        """
+        return list(dict.fromkeys(self._sources[row] for row in self._find_rows(domain, name, None)))
+
+    def save(self, path: str) -> None:
+        """
+        Save the index to a file.
+
+        :param path: The path of the file.
+        :type path: str
+        """
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> 'CookieIndex':
+        """
+        Load an index saved with save().
+
+        :param path: The path of the file.
+        :type path: str
+
+        :return: The index.
+        :rtype: CookieIndex
+        """
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+
+        if not isinstance(index, CookieIndex):
+            raise ValueError(f'{path} is not a cookie index.')
+
+        return index
+
+    def _find_rows(self, domain: str, name: str, source: str) -> list:
+        """
+        Find the rows matching all the given criteria.
+
+        :param domain: The domain.
+        :type domain: str
+        :param name: The exact cookie name.
+        :type name: str
+        :param source: The exact source file.
+        :type source: str
+
+        :return: Sorted list of row numbers.
+        :rtype: list
+        """
+        candidates = []
+        if domain is not None:
+            candidates.append(self._domain_rows(domain))
+        if name is not None:
+            candidates.append(self._names.get(name, []))
+        if source is not None:
+            candidates.append(self._files.get(source, []))
+
+        if not candidates:
+            return list(range(len(self._cookies)))
+
+        # start from the smallest list and check the others through sets
+        candidates.sort(key=len)
+        rows = candidates[0]
+        for other in candidates[1:]:
+            other = set(other)
+            rows = [row for row in rows if row in other]
+
+        return sorted(rows)
+
+    def _domain_rows(self, domain: str) -> list:
+        """
+        Collect the rows of a domain and its subdomains from the trie.
+
+        :param domain: The domain, optionally starting with '.' or '*.'.
+        :type domain: str
+
+        :return: List of row numbers.
+        :rtype: list
+        """
+        node = self._domains
+        for label in self._labels(domain):
+            node = node.get(label)
+            if node is None:
+                return []
+
+        # a wildcard leaves out the rows of the domain itself
+        rows = []
+        pending = [node]
+        if domain.startswith('*.'):
+            pending = [child for label, child in node.items() if label != _ROWS]
+
+        while pending:
+            node = pending.pop()
+            for label, child in node.items():
+                if label == _ROWS:
+                    rows.extend(child)
+                else:
+                    pending.append(child)
+
+        return rows
+
+    @staticmethod
+    def _labels(domain: str) -> list:
+        """
+        Split a domain into lowercase labels, from the top-level domain down.
+        Leading dots and wildcards are ignored.
+
+        :param domain: The domain.
+        :type domain: str
+
+        :return: List of labels.
+        :rtype: list
+        """
+        return [label for label in reversed(domain.lower().split('.')) if label and label != '*']
+
+
+# File name extensions of the supported output compressions.
+COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+
+
+class CookieWriter(object):
+    """
+    Base class of the streaming cookie writers.
+
+    A writer accepts any iterable of cookies (dictionaries, Cookie records, or a
+    CookieTable), so cookies can be written as they are parsed, without
+    collecting them first. The CSV, text and SQLite writers write the rows of
+    a CookieTable from its columns, without a dictionary per row. Cookies are formatted in batches and written through
+    a large buffer, and the output can be compressed on the fly::
+
+        with JsonLinesWriter('cookies.jsonl.gz', compression='gzip') as writer:
+            writer.write(parser.iter_cookies())
+
+    :param file_name: The name of the output file.
+    :type file_name: str
+    :param compression: The output compression, None, 'gzip', or 'zstd'. Zstandard
+        compression requires the zstandard package.
+    :type compression: str
+    :param batch_size: The number of cookies formatted per write.
+    :type batch_size: int
+    :param buffer_size: The size of the output buffer in bytes.
+    :type buffer_size: int
+    :param include_source: If True, add a source column with the file each cookie was read from.
+        Used to write a whole batch run into a single output file.
+    :type include_source: bool
+    :param fields: Only write these fields, in this order, such as ('name', 'url'). All fields by default.
+    :type fields: tuple
+
+    :raises ValueError: If a field is unknown.
+    """
+
+    extension = ''
+
+    def __init__(self, file_name: str, compression: str = None, batch_size: int = 1000,
+                 buffer_size: int = 1024 * 1024, include_source: bool = False, fields: tuple = None):
+        self.file_name = file_name
+        self.compression = compression
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.include_source = include_source
+        self.fields = _check_fields(fields)
+        self.count = 0
+        self.output_file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def open(self) -> None:
+        """
+        Open the output file and write the format header, if any.
+        """
+        if self.compression is None:
+            self.output_file = open(self.file_name, 'w', buffering=self.buffer_size)
+        elif self.compression == 'gzip':
+            raw_file = gzip.open(self.file_name, 'wb')
+            self.output_file = io.TextIOWrapper(io.BufferedWriter(raw_file, self.buffer_size))
+        elif self.compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError('zstandard is required for zstd compression. Install it with: pip install zstandard')
+            raw_file = zstandard.ZstdCompressor().stream_writer(open(self.file_name, 'wb'))
+            self.output_file = io.TextIOWrapper(io.BufferedWriter(raw_file, self.buffer_size))
+        else:
+            raise ValueError(f'Unsupported compression: {self.compression}')
+
+        self._write_header()
+
+    def close(self) -> None:
+        """
+        Write the format footer, if any, and close the output file.
+        """
+        if self.output_file:
+            self._write_footer()
+            self.output_file.close()
+            self.output_file = None
+
+    def write(self, cookies, source: str = '') -> int:
+        """
+        Write cookies to the output file in batches.
+
+        :param cookies: The cookies to write.
+        :type cookies: iterable
+        :param source: The file the cookies were read from, written in the source column
+            if include_source is set.
+        :type source: str
+
+        :return: The number of cookies written.
+        :rtype: int
+        """
+        write_batch = self._write_batch
+        columns = self._table_columns() if isinstance(cookies, CookieTable) else None
+        if columns is not None:
+            # tuples straight from the table columns, without a dictionary per row
+            cookies = cookies.rows(columns)
+            write_batch = self._write_rows
+
+        written = 0
+        batch = []
+        for cookie in cookies:
+            batch.append(cookie)
+            if len(batch) >= self.batch_size:
+                write_batch(batch, source)
+                written += len(batch)
+                batch = []
+
+        if batch:
+            write_batch(batch, source)
+            written += len(batch)
+
+        self.count += written
+
+        return written
+
+    def _write_header(self) -> None:
+        """
+        Write the format header. Does nothing by default.
+        """
+
+    def _write_footer(self) -> None:
+        """
+        Write the format footer. Does nothing by default.
+        """
+
+    def _write_batch(self, batch: list, source: str = '') -> None:
+        """
+        Format and write a batch of cookies.
+
+        :param batch: The cookies to write.
+        :type batch: list
+        :param source: The file the cookies were read from.
+        :type source: str
+        """
+        raise NotImplementedError
+
+    def _table_columns(self):
+        """
+        Return the CookieTable columns written by _write_rows(), or None if rows
+        of a table are written as cookie dictionaries.
+
+        :return: The columns, or None.
+        :rtype: tuple or None
+        """
+        return None
+
+    def _write_rows(self, batch: list, source: str = '') -> None:
+        """
+        Format and write a batch of CookieTable rows.
+
+        :param batch: The rows to write, as tuples of the columns given by _table_columns().
+        :type batch: list
+        :param source: The file the cookies were read from.
+        :type source: str
+        """
+        raise NotImplementedError
+
+    def _with_source(self, batch: list, source: str) -> list:
+        """
+        Return the batch as cookie dictionaries with only the selected fields, if fields
+        are set, and with a source key, if include_source is set.
+
+        :param batch: The cookies.
+        :type batch: list
+        :param source: The file the cookies were read from.
+        :type source: str
+
+        :return: The cookies.
+        :rtype: list
+        """
+        if self.fields is not None:
+            batch = [{field: cookie[field] for field in self.fields} for cookie in batch]
+            if self.include_source:
+                for cookie in batch:
+                    cookie['source'] = source
+            return batch
+
+        if not self.include_source:
+            return batch
+
+        return [dict(cookie.to_dict() if isinstance(cookie, Cookie) else cookie, source=source) for cookie in batch]
+
+
+class JsonWriter(CookieWriter):
+    """
+    Write cookies as a JSON array, one element at a time. The output is the
+    same as writing the whole list with json.dump(cookies, f, indent=4).
+    """
+
+    extension = '.json'
+
+    def _write_header(self) -> None:
+        self._elements = 0
+
+    def _write_batch(self, batch: list, source: str = '') -> None:
+        # indent every object by one level, as the array element it is
+        elements = [json.dumps(cookie, indent=4, default=Cookie.to_dict).replace('\n', '\n    ')
+                    for cookie in self._with_source(batch, source)]
+        self.output_file.write(('[\n    ' if not self._elements else ',\n    ') + ',\n    '.join(elements))
+        self._elements += len(batch)
+
+    def _write_footer(self) -> None:
+        self.output_file.write('\n]' if self._elements else '[]')
+
+
+class JsonLinesWriter(CookieWriter):
+    """
+    Write cookies as JSON Lines, one JSON object per line.
+    """
+
+    extension = '.jsonl'
+
+    def _write_batch(self, batch: list, source: str = '') -> None:
+        self.output_file.write(''.join(json.dumps(cookie, default=Cookie.to_dict) + '\n'
+                                       for cookie in self._with_source(batch, source)))
+
+
+class CsvWriter(CookieWriter):
+    """
+    Write cookies as CSV, with a header row.
+    """
+
+    extension = '.csv'
+
+    def _write_header(self) -> None:
+        self._columns = self.fields or COOKIE_FIELDS
+        self._csv_writer = csv.writer(self.output_file)
+        self._csv_writer.writerow(self._columns + ('source',) if self.include_source else self._columns)
+
+    def _write_batch(self, batch: list, source: str = '') -> None:
+        columns = self._columns
+        if self.include_source:
+            self._csv_writer.writerows([cookie[field] for field in columns] + [source] for cookie in batch)
+        else:
+            self._csv_writer.writerows([cookie[field] for field in columns] for cookie in batch)
+
+    def _table_columns(self):
+        return self._columns
+
+    def _write_rows(self, batch: list, source: str = '') -> None:
+        if self.include_source:
+            self._csv_writer.writerows(row + (source,) for row in batch)
+        else:
+            self._csv_writer.writerows(batch)
+
+
+class TxtWriter(CookieWriter):
+    """
+    Write cookies as text, one cookie per line in a Set-Cookie like format.
+    With fields, each line only has the selected attributes, in the given order.
+    """
+
+    extension = '.txt'
+
+    # attribute names of the fields in the Set-Cookie like format, the flags have none
+    _labels = {
+        'name': 'name',
+        'value': 'value',
+        'url': 'domain',
+        'path': 'path',
+        'expiry_date': 'expires',
+        'create_date': 'created',
+        'cookie_flag': None
+    }
+
+    def _write_batch(self, batch: list, source: str = '') -> None:
+        suffix = f'; source={source}\n' if self.include_source else '\n'
+        if self.fields is not None:
+            labels = [self._labels[field] for field in self.fields]
+            self.output_file.write(''.join(
+                'Cookie: ' + '; '.join(f'{label}={cookie[field]}' if label else cookie[field]
+                                       for field, label in zip(self.fields, labels)) + suffix
+                for cookie in batch
+            ))
+            return
+
+        self.output_file.write(''.join(
+            f"Cookie: {cookie['name']}={cookie['value']}; "
+            f"domain={cookie['url']}; "
+            f"path={cookie['path']}; "
+            f"created={cookie['create_date']};"
+            f"expires={cookie['expiry_date']}; "
+            f"{cookie['cookie_flag']}{suffix}"
+            for cookie in batch
+        ))
+
+    def _table_columns(self):
+        return self.fields or ('name', 'value', 'url', 'path', 'create_date', 'expiry_date', 'cookie_flag')
+
+    def _write_rows(self, batch: list, source: str = '') -> None:
+        suffix = f'; source={source}\n' if self.include_source else '\n'
+        if self.fields is not None:
+            labels = [self._labels[field] for field in self.fields]
+            self.output_file.write(''.join(
+                'Cookie: ' + '; '.join(f'{label}={value}' if label else value
+                                       for label, value in zip(labels, row)) + suffix
+                for row in batch
+            ))
+            return
+
+        self.output_file.write(''.join(
+            f"Cookie: {name}={value}; domain={url}; path={path}; created={create_date};"
+            f"expires={expiry_date}; {cookie_flag}{suffix}"
+            for name, value, url, path, create_date, expiry_date, cookie_flag in batch
+        ))
+
+
+class SqliteWriter(CookieWriter):
+    """
+    Write cookies into an SQLite database, in a cookies table with indexes on
+    the domain, name, expiry date, and source file.
+
+    Each batch is inserted with executemany(), and everything written between
+    open() and close() is a single transaction. Writing to an existing database
+    appends to its cookies table, so a batch run can fill one database
+    incrementally. Besides the formatted dates, the table has numeric
+    expiry_date_epoch and create_date_epoch columns, so that dates sort and the
+    expiry index can be used. They are exact for Cookie records and CookieTable
+    rows; for cookie dictionaries, they are parsed from the formatted dates,
+    which only give the day with the default date format.
+    The source column is always present. With fields, the other text columns
+    are left empty. Compression is not supported.
+    """
+
+    extension = '.sqlite'
+
+    def open(self) -> None:
+        if self.compression is not None:
+            raise ValueError('Compression is not supported for SQLite output.')
+
+        self.output_file = sqlite3.connect(self.file_name, isolation_level=None)
+        self.output_file.execute('BEGIN')
+        self.output_file.execute(
+            'CREATE TABLE IF NOT EXISTS cookies ('
+            'id INTEGER PRIMARY KEY, name TEXT, value TEXT, url TEXT, path TEXT, '
+            'expiry_date TEXT, create_date TEXT, cookie_flag TEXT, '
+            'expiry_date_epoch REAL, create_date_epoch REAL, source TEXT)'
+        )
+
+    def close(self) -> None:
+        if self.output_file:
+            # indexes are built once, after the bulk insert
+            for column in ('url', 'name', 'expiry_date_epoch', 'source'):
+                self.output_file.execute(f'CREATE INDEX IF NOT EXISTS cookies_{column} ON cookies ({column})')
+            self.output_file.execute('COMMIT')
+            self.output_file.close()
+            self.output_file = None
+
+    def _write_batch(self, batch: list, source: str = '') -> None:
+        columns = self.fields or COOKIE_FIELDS
+        self.output_file.executemany(
+            f"INSERT INTO cookies ({', '.join(columns)}, expiry_date_epoch, create_date_epoch, source) "
+            f"VALUES ({', '.join('?' * (len(columns) + 3))})",
+            [tuple(cookie[field] for field in columns) + self._epochs(cookie) + (source,) for cookie in batch]
+        )
+
+    def _table_columns(self):
+        # the epoch columns of a table are exact, as for Cookie records
+        return (self.fields or COOKIE_FIELDS) + ('expiry_date_epoch', 'create_date_epoch')
+
+    def _write_rows(self, batch: list, source: str = '') -> None:
+        columns = self.fields or COOKIE_FIELDS
+        self.output_file.executemany(
+            f"INSERT INTO cookies ({', '.join(columns)}, expiry_date_epoch, create_date_epoch, source) "
+            f"VALUES ({', '.join('?' * (len(columns) + 3))})",
+            [row + (source,) for row in batch]
+        )
+
+    @staticmethod
+    def _epochs(cookie) -> tuple:
+        """
+        Return the expiry and creation dates of a cookie as Unix epochs.
+
+        :param cookie: The cookie.
+        :type cookie: dict or Cookie
+
+        :return: The expiry and creation epochs, None if unknown.
+        :rtype: tuple
+        """
+        if isinstance(cookie, Cookie):
+            return cookie.expiry_date_epoch, cookie.create_date_epoch
+
+        return _date_epoch(cookie.get('expiry_date')), _date_epoch(cookie.get('create_date'))
+
+
+# Streaming writers by output type.
+WRITERS = {
+    'json': JsonWriter,
+    'jsonl': JsonLinesWriter,
+    'csv': CsvWriter,
+    'txt': TxtWriter,
+    'sqlite': SqliteWriter
+}
+
+# Threads listing directories concurrently in batch processing.
+DISCOVERY_THREADS = 8
+
+# Start method of the worker process pools. Forking while the discovery threads
+# run can deadlock the workers, so processes are started from a clean server instead.
+_POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# Containers scanned member by member in batch processing.
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+class CandidateFilter(object):
+    """
+    A cheap pre-filter that rejects files that cannot be binary cookie files
+    before any parsing work is scheduled in batch processing.
+
+    Every file must start with the 'cook' magic, so only its first 4 bytes are
+    read. Name patterns, and size limits when the size is known from the directory
+    listing, reject files without opening them.
+    The number of files scanned and rejected is counted, and the names of the
+    candidates that then failed to parse, such as truncated files, are listed::
+
+        candidate_filter = CandidateFilter(max_size=64 * 1024 * 1024)
+        results = PyCookieParser.batch_process('backup', candidate_filter=candidate_filter)
+        print(candidate_filter.scanned, candidate_filter.rejected, candidate_filter.failed)
+
+    :param name_patterns: Shell-style patterns, such as '*.binarycookies', one of which
+        the file name must match. By default, all names are accepted.
+    :type name_patterns: tuple
+    :param min_size: The minimum file size in bytes.
+    :type min_size: int
+    :param max_size: The maximum file size in bytes, or None for no limit.
+    :type max_size: int
+    """
+
+    def __init__(self, name_patterns: tuple = None, min_size: int = _FILE_HEADER.size, max_size: int = None):
+        self.name_patterns = name_patterns
+        self.min_size = min_size
+        self.max_size = max_size
+        self.scanned = 0
+        self.rejected = 0
+        self.failed = []
+
+    def accepts(self, name: str, source, size: int = None) -> bool:
+        """
+        Check whether a file may be a binary cookie file, and count it.
+
+        :param name: The name of the file.
+        :type name: str
+        :param source: The path to the file, or its content.
+        :type source: str or bytes
+        :param size: The size of the file, if already known. Otherwise, it is read when the file is opened,
+            or taken from the content.
+        :type size: int
+
+        :return: True if the file is a candidate.
+        :rtype: bool
+        """
+        self.scanned += 1
+        if self._accepts(name, source, size):
+            return True
+
+        self.rejected += 1
+        return False
+
+    def filter(self, sources):
+        """
+        Filter (name, file path or content) tuples, keeping the candidates.
+        A tuple may have the size of the file as a third item.
+
+        :param sources: An iterable of (name, file path or content) tuples.
+        :type sources: iterable
+
+        :return: A generator of the (name, file path or content) tuples of the candidates.
+        :rtype: generator
+        """
+        for name, source, *size in sources:
+            if self.accepts(name, source, *size):
+                yield name, source
+
+    def _accepts(self, name: str, source, size: int = None) -> bool:
+        """
+        Check the name, size and magic of a file. A file is only opened if its
+        name and known size pass, to read its magic.
+
+        :param name: The name of the file.
+        :type name: str
+        :param source: The path to the file, or its content.
+        :type source: str or bytes
+        :param size: The size of the file, or None if it is not known yet.
+        :type size: int
+
+        :return: True if the file is a candidate.
+        :rtype: bool
+        """
+        if not self._matches_listing(name, size):
+            return False
+
+        if isinstance(source, bytes):
+            return (size is not None or self._fits(len(source))) and source[:4] == _MAGIC
+
+        try:
+            with open(source, 'rb') as f:
+                if size is None and not self._fits(os.fstat(f.fileno()).st_size):
+                    return False
+                return f.read(4) == _MAGIC
+        except OSError:
+            return False
+
+    def _matches_listing(self, name: str, size: int = None) -> bool:
+        """
+        Check the name of a file, and its size if it is known, without opening it.
+
+        :param name: The name of the file.
+        :type name: str
+        :param size: The size of the file, or None if it is not known yet.
+        :type size: int
+
+        :return: True if the name and size pass.
+        :rtype: bool
+        """
+        if self.name_patterns:
+            base_name = name.rsplit('/', 1)[-1]
+            if not any(fnmatch.fnmatch(base_name, pattern) for pattern in self.name_patterns):
+                return False
+
+        return size is None or self._fits(size)
+
+    def _fits(self, size: int) -> bool:
+        """
+        Check the size limits.
+
+        :param size: The size of the file.
+        :type size: int
+
+        :return: True if the size is within the limits.
+        :rtype: bool
+        """
+        return size >= self.min_size and (self.max_size is None or size <= self.max_size)
+
+
+# Marker for cache misses, since None is a valid cached result.
+_MISSING = object()
+
+
+class ParseCache(object):
+    """
+    A persistent on-disk cache of parsed cookie files, stored in an SQLite database.
+
+    Results are keyed by the SHA-256 digest and size of the file content, so
+    unchanged files, and identical copies of a file anywhere in a case tree, are
+    served from the cache instead of being parsed again. The digest of a path is
+    remembered with its size and modification time, so unchanged files are not
+    even hashed again. Files that are not binary cookie files are cached too.
+
+    When the cached results grow beyond max_size bytes, the least recently used
+    entries are evicted. Results are stored with pickle, so only use caches
+    you created yourself::
+
+        with ParseCache('cookies-cache.sqlite') as cache:
+            results = PyCookieParser.batch_process('dataset', cache=cache)
+
+    :param path: The path of the cache database.
+    :type path: str
+    :param max_size: The maximum total size of the cached results in bytes.
+    :type max_size: int
+    """
+
+    def __init__(self, path: str, max_size: int = 1024 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, digest TEXT)'
+        )
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, data BLOB, size INTEGER, last_access REAL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+        self._access = self._connection.execute('SELECT MAX(last_access) FROM entries').fetchone()[0] or 0
+        # kept up to date by put() and _evict(), so the entries are only summed once
+        self._size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self) -> None:
+        """
+        Commit pending changes and close the cache database.
+        """
+        if self._connection:
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+
+    def flush(self) -> None:
+        """
+        Commit pending changes to the cache database.
+        """
+        self._connection.commit()
+
+    def key(self, file_path, options: str = '') -> str:
+        """
+        Return the cache key of a file: the digest and size of its content, and the parse options.
+        The file is only hashed if its size or modification time changed since it was last seen.
+        The content of a file, such as an archive member, can be given instead of its path.
+
+        :param file_path: The path of the file, or its content.
+        :type file_path: str or bytes
+        :param options: The parse options the result depends on.
+        :type options: str
+
+        :return: The cache key.
+        :rtype: str
+        """
+        if isinstance(file_path, bytes):
+            return f'{hashlib.sha256(file_path).hexdigest()}:{len(file_path)}:{options}'
+
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        row = self._connection.execute('SELECT size, mtime, digest FROM files WHERE path = ?',
+                                       (file_path,)).fetchone()
+
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            digest = row[2]
+        else:
+            file_hash = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    file_hash.update(chunk)
+            digest = file_hash.hexdigest()
+            self._connection.execute('INSERT OR REPLACE INTO files (path, size, mtime, digest) VALUES (?, ?, ?, ?)',
+                                     (file_path, stat.st_size, stat.st_mtime_ns, digest))
+
+        return f'{digest}:{stat.st_size}:{options}'
+
+    def get(self, key: str, default=None):
+        """
+        Return a cached result and mark it as recently used.
+
+        :param key: The cache key.
+        :type key: str
+        :param default: The value returned on a cache miss.
+
+        :return: The cached result, or the default value.
+        """
+        row = self._connection.execute('SELECT data FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._access += 1
+        self._connection.execute('UPDATE entries SET last_access = ? WHERE key = ?', (self._access, key))
+
+        return pickle.loads(row[0])
+
+    def put(self, key: str, result) -> None:
+        """
+        Store a result, evicting the least recently used entries if the cache is full.
+        Results larger than max_size are not stored.
+
+        :param key: The cache key.
+        :type key: str
+        :param result: The result to store.
+        """
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_size:
+            return
+
+        self._access += 1
+        row = self._connection.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        self._connection.execute('INSERT OR REPLACE INTO entries (key, data, size, last_access) VALUES (?, ?, ?, ?)',
+                                 (key, data, len(data), self._access))
+        self._size += len(data) - (row[0] if row else 0)
+        self._evict()
+
+    def size(self) -> int:
+        """
+        Return the total size of the cached results in bytes.
+
+        :return: The size in bytes.
+        :rtype: int
+        """
+        return self._size
+
+    def _evict(self) -> None:
+        """
+        Evict the least recently used entries until the cache fits in max_size.
+        """
+        excess = self._size - self.max_size
+        if excess <= 0:
+            return
+
+        evicted = []
+        for key, size in self._connection.execute('SELECT key, size FROM entries ORDER BY last_access'):
+            evicted.append((key,))
+            excess -= size
+            self._size -= size
+            if excess <= 0:
+                break
+        self._connection.executemany('DELETE FROM entries WHERE key = ?', evicted)
+
+
+class MemoryCache(object):
+    """
+    An in-process LRU cache of parsed cookie files, for programs that read
+    the same files again and again.
+
+    Results are keyed by the path, inode, modification time and size of the
+    file and by the parse options, so a file that changes on disk is parsed
+    again. A cache hit skips both reading and decoding the file. The cache is
+    bounded by a number of entries and by an estimate of the memory used by
+    the cached cookies, and the least recently used entries are evicted first.
+    A cache can be shared by parsers in several threads::
+
+        cache = MemoryCache(max_entries=64)
+        cookies = PyCookieParser('cookies.binarycookies', cache=cache).read_cookie_file()
+
+    Cookies are copied into the cache and out of it, so callers may modify
+    the cookies they get.
+
+    :param max_entries: The maximum number of cached files.
+    :type max_entries: int
+    :param max_bytes: The maximum estimated size of the cached cookies in bytes.
+    :type max_bytes: int
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, file_path: str, options: tuple = ()):
+        """
+        Return the cache key of a file, or None if the file cannot be found.
+
+        :param file_path: The path of the file.
+        :type file_path: str
+        :param options: The parse options the result depends on.
+        :type options: tuple
+
+        :return: The cache key.
+        :rtype: tuple or None
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+
+        return (os.path.abspath(file_path), stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size) + options
+
+    def get(self, key, default=None):
+        """
+        Return a copy of a cached result and mark it as recently used.
+
+        :param key: The cache key.
+        :param default: The value returned on a cache miss.
+
+        :return: The cached result, or the default value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+        return self._copy_result(entry[0])
+
+    def put(self, key, result) -> None:
+        """
+        Store a result, evicting the least recently used entries if the cache is full.
+        Results larger than max_bytes are not stored.
+
+        :param key: The cache key.
+        :param result: The list of cookies to store.
+        """
+        size = self._result_size(result)
+        if size > self.max_bytes:
+            return
+
+        result = self._copy_result(result)
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._size -= self._entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Remove all cached results.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def size(self) -> int:
+        """
+        Return the estimated size of the cached cookies in bytes.
+
+        :return: The size in bytes.
+        :rtype: int
+        """
+        return self._size
+
+    @staticmethod
+    def _copy_result(cookies: list) -> list:
+        """
+        Copy a list of cookies, so that the cached cookies are never shared with a caller.
+
+        :param cookies: The list of cookie dictionaries or records.
+        :type cookies: list
+
+        :return: A list of copies of the cookies.
+        :rtype: list
+        """
+        return [dict(cookie) if isinstance(cookie, dict) else
+                Cookie(*(getattr(cookie, slot) for slot in Cookie.__slots__)) for cookie in cookies]
+
+    @staticmethod
+    def _result_size(cookies: list) -> int:
+        """
+        Estimate the memory used by a list of cookies. Strings shared between
+        cookies are counted once per cookie, so this is an upper bound.
+
+        :param cookies: The list of cookie dictionaries or records.
+        :type cookies: list
+
+        :return: The estimated size in bytes.
+        :rtype: int
+        """
+        size = sys.getsizeof(cookies)
+        for cookie in cookies:
+            values = cookie.values() if isinstance(cookie, dict) else (getattr(cookie, slot, None)
+                                                                       for slot in Cookie.__slots__)
+            size += sys.getsizeof(cookie) + sum(sys.getsizeof(value) for value in values)
+        return size
 
 
 class PyCookieParser(object):
@@ -20,14 +2629,118 @@ class PyCookieParser(object):
         with PyCookieParser('cookies.binarycookies') as parser:
             cookies = parser.read_cookie_file()
 
+    Large cookie stores can be memory-mapped instead of read into memory,
+    so that only the cookie fields being decoded are copied::
+
+        with PyCookieParser('cookies.binarycookies', mmap=True) as parser:
+            cookies = parser.read_cookie_file()
+
+    With a MemoryCache, files that were already read and did not change
+    since are not read or decoded again.
+
+    Cookie files extracted from archives or received over the network can be
+    parsed straight from memory or from a file object, without a temporary file::
+
+        with PyCookieParser.from_bytes(data) as parser:
+            cookies = parser.read_cookie_file()
+
     :param file_name: The name of the cookie file.
     :type file_name: str
+    :param encoding_errors: The error handling scheme used when a cookie string
+        is not valid UTF-8, such as 'strict', 'replace', or 'backslashreplace'.
+    :type encoding_errors: str
+    :param mmap: If True, memory-map the cookie file when it is opened.
+    :type mmap: bool
+    :param date_format: The format of the expiry and creation dates: 'day' for day strings
+        such as 'Mon, 01 Jan 2001', or 'iso' for ISO-8601 UTC timestamps.
+    :type date_format: str
+    :param cache: An in-process cache of parsed files shared by parsers.
+    :type cache: MemoryCache
     """
     
-    def __init__(self, file_name: str):
+    def __init__(self, file_name: str, encoding_errors: str = 'strict', mmap: bool = False,
+                 date_format: str = 'day', cache: MemoryCache = None):
         self.file_name = file_name
+        self.encoding_errors = encoding_errors
+        self.mmap = mmap
+        self.date_format = date_format
+        self.cache = cache
         self.cookie_file = None
         self.offset = 0
+        self._buffer = None
+        self._in_memory = False
+
+    @classmethod
+    def from_buffer(cls, buffer, file_name: str = '<buffer>', encoding_errors: str = 'strict',
+                    date_format: str = 'day') -> 'PyCookieParser':
+        """
+        Create a parser that reads a cookie file from a buffer in memory. Bytes, bytearrays
+        and memory maps are used as they are, without copying; other bytes-like objects,
+        such as memoryviews, are copied to bytes. The parser does not need to be opened.
+
+        :param buffer: The content of the cookie file.
+        :type buffer: bytes, bytearray or mmap.mmap
+        :param file_name: The name shown in messages.
+        :type file_name: str
+        :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+        :type encoding_errors: str
+        :param date_format: The format of the expiry and creation dates, 'day' or 'iso'.
+        :type date_format: str
+
+        :return: The parser.
+        :rtype: PyCookieParser
+        """
+        if not isinstance(buffer, (bytes, bytearray, MemoryMap)):
+            buffer = bytes(buffer)
+
+        parser = cls(file_name, encoding_errors, date_format=date_format)
+        parser._buffer = buffer
+        parser._in_memory = True
+        return parser
+
+    @classmethod
+    def from_bytes(cls, data: bytes, file_name: str = '<bytes>', encoding_errors: str = 'strict',
+                   date_format: str = 'day') -> 'PyCookieParser':
+        """
+        Create a parser that reads a cookie file from bytes in memory.
+
+        :param data: The content of the cookie file.
+        :type data: bytes
+        :param file_name: The name shown in messages.
+        :type file_name: str
+        :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+        :type encoding_errors: str
+        :param date_format: The format of the expiry and creation dates, 'day' or 'iso'.
+        :type date_format: str
+
+        :return: The parser.
+        :rtype: PyCookieParser
+        """
+        return cls.from_buffer(bytes(data), file_name, encoding_errors, date_format)
+
+    @classmethod
+    def from_fileobj(cls, fileobj, file_name: str = None, encoding_errors: str = 'strict',
+                     date_format: str = 'day') -> 'PyCookieParser':
+        """
+        Create a parser that reads a cookie file from a binary file object, such as a
+        member of a zip or tar archive or a network stream. The object is read once,
+        from its current position to the end, and is not closed.
+
+        :param fileobj: The readable binary file object.
+        :param file_name: The name shown in messages. Defaults to the name of the file object.
+        :type file_name: str
+        :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+        :type encoding_errors: str
+        :param date_format: The format of the expiry and creation dates, 'day' or 'iso'.
+        :type date_format: str
+
+        :return: The parser.
+        :rtype: PyCookieParser
+        """
+        if file_name is None:
+            file_name = str(getattr(fileobj, 'name', '<fileobj>'))
+
+        return cls.from_buffer(fileobj.read(), file_name, encoding_errors, date_format)
 
     def __enter__(self):
         """
@@ -52,58 +2765,136 @@ class PyCookieParser(object):
         self.close_file()
         return False
 
-    def open_file(self):
+    def open_file(self, mmap: bool = None):
         """
         Open the cookie file for reading.
         If an IOError is encountered, a message is printed to the console.
+
+        In memory-mapped mode, pages are decoded straight out of the mapping
+        and bytes are only copied when a cookie string is decoded. Files that
+        cannot be mapped, such as empty files, are read normally instead.
+
+        :param mmap: If True, memory-map the cookie file. Defaults to the value given to the constructor.
+        :type mmap: bool
         """
         
+        if self._in_memory:
+            return
+
+        if mmap is None:
+            mmap = self.mmap
+
         try:
             self.cookie_file = open(self.file_name, 'rb')
         except IOError:
             print('Failed to open the cookie file:', self.file_name)
+            return
+
+        if mmap:
+            try:
+                self._buffer = MemoryMap(self.cookie_file.fileno(), 0, access=ACCESS_READ)
+            except (ValueError, OSError):
+                self._buffer = None
 
     def close_file(self):
         """
         Close the cookie file.
         This method checks if the cookie file is open before attempting to close it.
+        Buffers given to from_buffer() are kept, and are never closed.
         """
         
+        if self._in_memory:
+            return
+
+        if isinstance(self._buffer, MemoryMap):
+            self._buffer.close()
+        self._buffer = None
+
         if self.cookie_file:
             self.cookie_file.close()
             self.cookie_file = None
 
-    def read_cookie_file(self, silent: bool = False):
+    def read_cookie_file(self, silent: bool = False, workers: int = 1, executor: Executor = None,
+                         as_record: bool = False, lazy: bool = False, cookie_filter: CookieFilter = None,
+                         fields: tuple = None):
         """
         Read and parse the contents of the cookie file.
         Returns a list of cookies if successful, otherwise returns None.
         Each cookie is a dictionary with the following keys: 
         name, value, url, path, expiry_date, create_date, and cookie_flag.
+        With as_record, each cookie is a compact Cookie record instead, and with
+        lazy, a LazyCookie record that decodes its fields on first access.
+
+        Every page of a cookie file is self-contained, so the pages of a large
+        file can be decoded concurrently, either by a pool of worker processes
+        or by a given thread or process pool. Cookies are returned in file order.
+
+        With a cache, a file that was already read and did not change is neither
+        read nor decoded again, and it does not need to be opened. Lazy records
+        hold on to the file buffer, so they are never cached, and neither are
+        the results of a filter on unexpired cookies.
+
+        With a filter, cookies that do not match are skipped as soon as their
+        header, url or name shows it, before their other fields are decoded.
+
+        With fields, only the selected strings are decoded and dates formatted,
+        and the dictionaries only have the selected keys, in the given order.
+        Cookie records keep all their attributes, but the fields that are neither
+        selected nor checked by the filter are None. LazyCookie records already
+        decode only the fields that are accessed, so fields do not apply to them.
 
         :param silent: If True, suppress warning messages for invalid files.
         :type silent: bool
+        :param workers: The number of worker processes used to decode pages in parallel.
+        :type workers: int
+        :param executor: An existing thread or process pool to decode pages with, instead of creating one.
+        :type executor: concurrent.futures.Executor
+        :param as_record: If True, return Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param lazy: If True, return LazyCookie records. Pages are then always read sequentially,
+            since decoding is deferred anyway.
+        :type lazy: bool
+        :param cookie_filter: Only return the cookies matching this filter.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and return these fields, such as ('name', 'url'). All fields by default.
+        :type fields: tuple
 
         :return: A list of cookie dictionaries, or None on failure.
         :rtype: list or None
+
+        :raises ValueError: If a field is unknown.
         """
-        
-        if not self.cookie_file:
+
+        fields = _check_fields(fields)
+        cache_key = None
+        # unexpired depends on the current time, so its results cannot be reused
+        if (self.cache is not None and not lazy and not self._in_memory
+                and not (cookie_filter is not None and cookie_filter.unexpired)):
+            cache_key = self.cache.key(self.file_name, (self.encoding_errors, self.date_format, as_record,
+                                                        repr(cookie_filter), fields))
+            if cache_key is not None:
+                cookies = self.cache.get(cache_key)
+                if cookies is not None:
+                    return cookies
+
+        if not self.cookie_file and not self._in_memory:
             if not silent:
                 print('No file opened.')
             return None
 
         try:
-            file_header = self._read_chunk()
-            if file_header != b'cook':
-                if not silent:
-                    print(self.file_name, 'is not a binary cookie file.')
+            page_sizes = self._read_page_table(silent)
+            if page_sizes is None:
                 return None
 
-            num_pages = self._read_chunk_big_endian()
+            if lazy:
+                return [cookie for page_offset in self._get_page_offsets(page_sizes)
+                        for cookie in self._read_page(page_offset, lazy=True, cookie_filter=cookie_filter)]
 
-            page_sizes = self._read_page_sizes(num_pages)
+            cookies = self._read_cookies(page_sizes, workers, executor, as_record, cookie_filter, fields)
 
-            cookies = self._read_cookies(page_sizes)
+            if cache_key is not None:
+                self.cache.put(cache_key, cookies)
 
             return cookies
 
@@ -112,144 +2903,591 @@ class PyCookieParser(object):
                 print('Failed to read the cookie file:', self.file_name)
             return None
 
-    def write_results(self, cookies: list, output_type: str, output_path: str, input_file: str) -> None:
+    def iter_cookies(self, silent: bool = False, as_record: bool = False, lazy: bool = False,
+                     cookie_filter: CookieFilter = None, fields: tuple = None):
+        """
+        Lazily read and parse the contents of the cookie file.
+        Cookies are decoded one page at a time and yielded in file order,
+        so memory use does not grow with the number of cookies.
+        Nothing is yielded if the file is not opened or is not a binary cookie file.
+
+        :param silent: If True, suppress warning messages for invalid files.
+        :type silent: bool
+        :param as_record: If True, yield Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param lazy: If True, yield LazyCookie records that decode their fields on first access.
+        :type lazy: bool
+        :param cookie_filter: Only yield the cookies matching this filter.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and yield these fields, as in read_cookie_file(). All fields by default.
+        :type fields: tuple
+
+        :return: A generator of cookie dictionaries.
+        :rtype: generator
+
+        :raises ValueError: If a field is unknown.
+        """
+
+        fields = _check_fields(fields)
+
+        if not self.cookie_file and not self._in_memory:
+            if not silent:
+                print('No file opened.')
+            return
+
+        try:
+            page_sizes = self._read_page_table(silent)
+            if page_sizes is None:
+                return
+
+            for page_offset in self._get_page_offsets(page_sizes):
+                yield from self._read_page(page_offset, as_record, lazy, cookie_filter, fields)
+
+        except Exception:
+            if not silent:
+                print('Failed to read the cookie file:', self.file_name)
+
+    def read_cookie_table(self, silent: bool = False, source: str = ''):
+        """
+        Read and parse the contents of the cookie file into a columnar table.
+        The table is filled directly from the cookie records, without building
+        a dictionary per cookie.
+
+        :param silent: If True, suppress warning messages for invalid files.
+        :type silent: bool
+        :param source: The source file name stored with every cookie.
+        :type source: str
+
+        :return: A table of cookies, or None on failure.
+        :rtype: CookieTable or None
+        """
+
+        if not self.cookie_file and not self._in_memory:
+            if not silent:
+                print('No file opened.')
+            return None
+
+        try:
+            page_sizes = self._read_page_table(silent)
+            if page_sizes is None:
+                return None
+
+            table = CookieTable(self.date_format)
+            for page_offset in self._get_page_offsets(page_sizes):
+                self._fill_table(table, page_offset, source)
+
+            return table
+
+        except Exception:
+            if not silent:
+                print('Failed to read the cookie file:', self.file_name)
+            return None
+
+    def write_results(self, cookies, output_type: str, output_path: str, input_file: str,
+                      compression: str = None, fields: tuple = None) -> None:
         """
         Write parsed cookie results to a file.
+        The cookies are streamed to the file, so any iterable of cookies can be written,
+        including the generators returned by iter_cookies().
+
+        :param cookies: The parsed cookies.
+        :type cookies: iterable
+        :param output_type: The output format ('json', 'jsonl', 'csv', 'txt', or 'sqlite').
+            SQLite output is appended to the database if it already exists.
+        :type output_type: str
+        :param output_path: The directory path to write the output file.
+        :type output_path: str
+        :param input_file: The name of the input file (used to generate output filename).
+        :type input_file: str
+        :param compression: The output compression, None, 'gzip', or 'zstd'.
+        :type compression: str
+        :param fields: Only write these fields, such as ('name', 'url'). All fields by default.
+        :type fields: tuple
+        """
+        file_name = os.path.join(output_path, input_file + '-parsed') 
+        # input names may come from the evidence, and must not write outside the output path
+        output_root = os.path.realpath(output_path)
+        if os.path.commonpath([output_root, os.path.realpath(file_name)]) != output_root:
+            print('Output file would be outside the output path:', input_file)
+            return
+
+        parent_dir = os.path.dirname(file_name)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        
+        writer_class = WRITERS.get(output_type)
+        if writer_class is None:
+            print('Output file type is not supported.')
+            return
+
+        file_name += writer_class.extension + COMPRESSION_EXTENSIONS.get(compression, '')
+        with writer_class(file_name, compression, fields=fields) as writer:
+            writer.write(cookies, source=input_file)
+
+    @staticmethod
+    def summarize_cookies(cookies, approximate: bool = False) -> dict:
+        """
+        Generate a statistical summary of parsed cookies.
+        The cookies are scanned once, so any iterable of cookies can be summarized,
+        including the generators returned by iter_cookies(). Use CookieSummary
+        directly to update a summary file by file or to merge summaries.
+
+        Produces a summary containing:
+        - Total number of cookies
+        - Number of unique domains
+        - Cookie flag distribution
+        - Top domains by cookie count
+        - Secure and HttpOnly ratios, overall and per domain
+        - Expiry year histogram, and cookies per file for tables
+
+        :param cookies: The parsed cookies.
+        :type cookies: iterable
+        :param approximate: If True, estimate the distinct and top domains with bounded-memory sketches.
+        :type approximate: bool
+
+        :return: A dictionary containing summary statistics.
+        :rtype: dict
+        """
+        return CookieSummary(approximate=approximate).update(cookies).to_dict()
+
+    @staticmethod
+    def batch_process(directory: str, encoding_errors: str = 'strict', mmap: bool = False, workers: int = 1,
+                      as_record: bool = False, date_format: str = 'day', cache: ParseCache = None,
+                      candidate_filter: CandidateFilter = None, cookie_filter: CookieFilter = None,
+                      fields: tuple = None, deduplicator: CookieDeduplicator = None) -> dict:
+        """
+        Process all binary cookie files in a directory and its subdirectories.
+
+        Scans the given directory recursively for files and attempts to parse each one
+        as a binary cookie file. Files that are not valid binary cookie files
+        are silently skipped.
+
+        Zip and tar archives, found in the directory or given instead of it, are
+        scanned member by member without extracting them to disk. Their members are
+        named after the archive, such as 'evidence.zip/Cookies.binarycookies'.
+        In an unencrypted iTunes or Finder backup directory, only the cookie files
+        listed in its Manifest.db are parsed, named after their domain and path in
+        the backup, such as 'HomeDomain/Library/Cookies/Cookies.binarycookies'.
+        Backups found in subdirectories are named after their directory as well,
+        such as 'Backup/<udid>/HomeDomain/Library/Cookies/Cookies.binarycookies'.
+
+        :param directory: The path to the directory containing cookie files, or to an archive.
+        :type directory: str
+        :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+        :type encoding_errors: str
+        :param mmap: If True, memory-map each cookie file instead of reading it into memory.
+        :type mmap: bool
+        :param workers: The number of worker processes used to parse files in parallel.
+            If None, the number of CPUs is used.
+        :type workers: int
+        :param as_record: If True, parse cookies into Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param date_format: The format of the expiry and creation dates, 'day' or 'iso'.
+        :type date_format: str
+        :param cache: A parse cache. Files already in the cache are not parsed again.
+        :type cache: ParseCache
+        :param candidate_filter: The pre-filter of candidate files, to set heuristics and read its counts.
+            By default, files are only checked for the binary cookie magic.
+        :type candidate_filter: CandidateFilter
+        :param cookie_filter: Keep only the cookies matching this filter, skipping the others while parsing.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and return these fields, such as ('name', 'url'). All fields by default.
+        :type fields: tuple
+        :param deduplicator: A deduplicator whose files are hashed before parsing, so that files with
+            the same content as one already seen are not parsed. Their cookies are deduplicated with add().
+        :type deduplicator: CookieDeduplicator
+
+        :return: A dictionary mapping relative file paths to their list of parsed cookies.
+        :rtype: dict
+        """
+        return dict(PyCookieParser.iter_batch_process(directory, encoding_errors, mmap, workers, as_record,
+                                                      date_format, cache, candidate_filter, cookie_filter, fields,
+                                                      deduplicator))
+
+    @staticmethod
+    def iter_batch_process(directory: str, encoding_errors: str = 'strict', mmap: bool = False, workers: int = 1,
+                           as_record: bool = False, date_format: str = 'day', cache: ParseCache = None,
+                           candidate_filter: CandidateFilter = None, cookie_filter: CookieFilter = None,
+                           fields: tuple = None, deduplicator: CookieDeduplicator = None):
+        """
+        Lazily process all binary cookie files in a directory and its subdirectories.
+
+        This is the streaming counterpart of batch_process(). Each file is parsed
+        only when the next result is requested, so only one file's cookies are held
+        in memory at a time.
+
+        With more than one worker, files are sent in chunks to a pool of processes.
+        Results are still yielded in the same order as with a single worker, and a
+        file that fails to parse is skipped without affecting the others.
+        Archives and backups are scanned as described in batch_process().
+
+        :param directory: The path to the directory containing cookie files, or to an archive.
+        :type directory: str
+        :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+        :type encoding_errors: str
+        :param mmap: If True, memory-map each cookie file instead of reading it into memory.
+        :type mmap: bool
+        :param workers: The number of worker processes used to parse files in parallel.
+            If None, the number of CPUs is used.
+        :type workers: int
+        :param as_record: If True, parse cookies into Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param date_format: The format of the expiry and creation dates, 'day' or 'iso'.
+        :type date_format: str
+        :param cache: A parse cache. Files already in the cache are not parsed again.
+        :type cache: ParseCache
+        :param candidate_filter: The pre-filter of candidate files, to set heuristics and read its counts,
+            and the names of the files that failed to parse. By default, files are only checked for the
+            binary cookie magic.
+        :type candidate_filter: CandidateFilter
+        :param cookie_filter: Keep only the cookies matching this filter, skipping the others while parsing.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and return these fields, such as ('name', 'url'). All fields by default.
+        :type fields: tuple
+        :param deduplicator: A deduplicator whose files are hashed before parsing, so that files with
+            the same content as one already seen are not parsed. Their cookies are deduplicated with add().
+        :type deduplicator: CookieDeduplicator
+
+        :return: A generator of (relative file path, list of parsed cookies) tuples.
+        :rtype: generator
+        """
+        fields = _check_fields(fields)
+        # unexpired depends on the current time, so its results cannot be reused
+        if cookie_filter is not None and cookie_filter.unexpired:
+            cache = None
+        return PyCookieParser._map_files(directory, workers, _parse_file, encoding_errors, mmap, as_record,
+                                         date_format, True, cookie_filter, fields, cache=cache,
+                                         candidate_filter=candidate_filter, deduplicator=deduplicator)
+
+    @staticmethod
+    def batch_process_table(directory: str, encoding_errors: str = 'strict', mmap: bool = False,
+                            workers: int = 1, date_format: str = 'day', cache: ParseCache = None,
+                            candidate_filter: CandidateFilter = None) -> CookieTable:
+        """
+        Process all binary cookie files in a directory and its subdirectories into a single
+        columnar table. The relative path of each file is stored in the source column.
+        Archives and backups are scanned as described in batch_process().
+
+        :param directory: The path to the directory containing cookie files, or to an archive.
+        :type directory: str
+        :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+        :type encoding_errors: str
+        :param mmap: If True, memory-map each cookie file instead of reading it into memory.
+        :type mmap: bool
+        :param workers: The number of worker processes used to parse files in parallel.
+            If None, the number of CPUs is used.
+        :type workers: int
+        :param date_format: The format of the expiry and creation dates, 'day' or 'iso'.
+        :type date_format: str
+        :param cache: A parse cache. Files already in the cache are not parsed again.
+        :type cache: ParseCache
+        :param candidate_filter: The pre-filter of candidate files, to set heuristics and read its counts.
+            By default, files are only checked for the binary cookie magic.
+        :type candidate_filter: CandidateFilter
+
+        :return: A table of all parsed cookies.
+        :rtype: CookieTable
+        """
+        table = CookieTable(date_format)
+        for rel_path, file_table in PyCookieParser._map_files(directory, workers, _parse_file_table,
+                                                              encoding_errors, mmap, date_format, cache=cache,
+                                                              candidate_filter=candidate_filter):
+            table.extend(file_table, source=rel_path)
+
+        return table
+
+    @staticmethod
+    def _map_files(directory: str, workers: int, parse, *args, cache: ParseCache = None,
+                   candidate_filter: CandidateFilter = None, deduplicator: CookieDeduplicator = None):
+        """
+        Apply a parse function to all files in a directory and its subdirectories,
+        serially or in a pool of worker processes. Files are pre-filtered first,
+        so that files that are not binary cookie files are never parsed or cached.
+
+        With more than one worker, files are sent to the pool a window at a time,
+        in chunks. Results are yielded in the same order as with a single worker.
+        With a cache, only files that are not in the cache are parsed, and their
+        results are added to it. Candidates that fail to parse are not yielded,
+        but added to the failed list of the candidate filter.
+
+        :param directory: The path to the directory, archive or backup.
+        :type directory: str
+        :param workers: The number of worker processes. If None, the number of CPUs is used.
+        :type workers: int
+        :param parse: A module-level function taking a file path or content and the extra arguments.
+        :param args: Extra arguments passed to the parse function.
+        :param cache: A parse cache.
+        :type cache: ParseCache
+        :param candidate_filter: The pre-filter of candidate files.
+        :type candidate_filter: CandidateFilter
+        :param deduplicator: A deduplicator dropping the candidate files whose content was already seen.
+        :type deduplicator: CookieDeduplicator
+
+        :return: A generator of (relative file path, result) tuples.
+        :rtype: generator
+        """
+        candidate_filter = candidate_filter or CandidateFilter()
+        sources = PyCookieParser._find_sources(directory, candidate_filter)
+        if sources is None:
+            print(f"Directory not found: {directory}")
+            return
+
+        sources = candidate_filter.filter(sources)
+        if deduplicator is not None:
+            sources = deduplicator.filter(sources)
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        options = repr((parse.__name__,) + args)
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT) as executor:
+                # a window at a time, so that the members of an archive are not all held in memory
+                while True:
+                    window = list(islice(sources, workers * 64))
+                    if not window:
+                        break
+
+                    results = [_MISSING] * len(window)
+                    keys = [None] * len(window)
+                    if cache:
+                        for index, (_, source) in enumerate(window):
+                            keys[index] = cache.key(source, options)
+                            results[index] = cache.get(keys[index], _MISSING)
+
+                    missing = [index for index, result in enumerate(results) if result is _MISSING]
+                    # a few chunks per worker keeps the pool busy without one IPC round trip per file
+                    chunksize = max(1, len(missing) // (workers * 4))
+                    parsed = executor.map(parse, [window[index][1] for index in missing],
+                                          *(repeat(arg) for arg in args), chunksize=chunksize)
+                    for index, result in zip(missing, parsed):
+                        results[index] = result
+                        if cache:
+                            cache.put(keys[index], result)
+
+                    if cache:
+                        cache.flush()
+
+                    for (name, _), result in zip(window, results):
+                        if result is None:
+                            candidate_filter.failed.append(name)
+                        else:
+                            yield name, result
+            return
+
+        for name, source in sources:
+            if cache:
+                key = cache.key(source, options)
+                result = cache.get(key, _MISSING)
+                if result is _MISSING:
+                    result = parse(source, *args)
+                    cache.put(key, result)
+            else:
+                result = parse(source, *args)
+
+            if result is None:
+                candidate_filter.failed.append(name)
+            else:
+                yield name, result
+
+        if cache:
+            cache.flush()
+
+    @staticmethod
+    def _find_sources(directory: str, candidate_filter: CandidateFilter = None):
+        """
+        Find the files to parse in a directory, a backup directory or an archive.
+
+        :param directory: The path to the directory, backup or archive.
+        :type directory: str
+        :param candidate_filter: The pre-filter whose name patterns and size limits are checked
+            before archive members are read.
+        :type candidate_filter: CandidateFilter
+
+        :return: An iterable of (name, file path or content) tuples, some with the file size as a third item,
+            or None if the directory is not found.
+        :rtype: iterable or None
+        """
+        if os.path.isdir(directory):
+            if os.path.isfile(os.path.join(directory, 'Manifest.db')):
+                backup_files = PyCookieParser._find_backup_files(directory)
+                if backup_files is not None:
+                    return backup_files
+
+            return PyCookieParser._walk_sources(directory, candidate_filter)
+
+        if os.path.isfile(directory) and directory.lower().endswith(ARCHIVE_EXTENSIONS):
+            return PyCookieParser._read_archive(directory, candidate_filter=candidate_filter)
+
+        return None
+
+    @staticmethod
+    def _walk_sources(directory: str, candidate_filter: CandidateFilter = None):
+        """
+        Find all files in a directory and its subdirectories, and the members of the archives among them.
+        In a subdirectory with a Manifest.db, only the files listed in the backup manifest are found.
+
+        :param directory: The path to the directory.
+        :type directory: str
+        :param candidate_filter: The pre-filter checked before archive members are read.
+        :type candidate_filter: CandidateFilter
 
-        :param cookies: The list of parsed cookies.
-        :type cookies: list
-        :param output_type: The output format ('json', 'csv', or 'txt').
-        :type output_type: str
-        :param output_path: The directory path to write the output file.
-        :type output_path: str
-        :param input_file: The name of the input file (used to generate output filename).
-        :type input_file: str
+        :return: A generator of (relative file path, file path or content, size) tuples.
+        :rtype: generator
         """
-        file_name = os.path.join(output_path, input_file + '-parsed') 
-        parent_dir = os.path.dirname(file_name)
-        if parent_dir:
-            os.makedirs(parent_dir, exist_ok=True)
-        
-        if output_type == 'json':
-            with open(file_name + '.json', 'w') as f:
-                json.dump(cookies, f, indent=4)
+        backup_dir = None
+        checked_dir = None
+        for rel_path, file_path, size in PyCookieParser._find_files(directory):
+            # the files of a directory are found together, before the files of its subdirectories
+            rel_dir = os.path.dirname(rel_path)
+            if backup_dir is not None and (rel_dir == backup_dir or rel_dir.startswith(backup_dir + os.sep)):
+                continue
 
-        elif output_type == 'txt':
-            with open(file_name + '.txt', 'w') as f:
-                for cookie in cookies:
-                    cookie_string = (
-                        f"Cookie: {cookie['name']}={cookie['value']}; "
-                        f"domain={cookie['url']}; "
-                        f"path={cookie['path']}; "
-                        f"created={cookie['create_date']};"
-                        f"expires={cookie['expiry_date']}; "
-                        f"{cookie['cookie_flag']}"
-                    )
-                    f.write(cookie_string + '\n')
-        
-        elif output_type == 'csv':
-            with open(file_name + '.csv', 'w') as f:
-                writer = csv.writer(f)
-                writer.writerow(['name', 
-                                 'value', 
-                                 'url', 
-                                 'path', 
-                                 'expiry_date', 
-                                 'create_date', 
-                                 'cookie_flag'])
+            if rel_dir != checked_dir:
+                checked_dir = rel_dir
+                # the top directory was already checked for a backup
+                if rel_dir and os.path.isfile(os.path.join(directory, rel_dir, 'Manifest.db')):
+                    backup_files = PyCookieParser._find_backup_files(os.path.join(directory, rel_dir))
+                    if backup_files is not None:
+                        backup_dir = rel_dir
+                        for name, backup_file in backup_files:
+                            yield rel_dir + '/' + name, backup_file
+                        continue
 
-                for cookie in cookies:
-                    row = [
-                        cookie['name'], 
-                        cookie['value'],
-                        cookie['url'],
-                        cookie['path'],
-                        cookie['expiry_date'],
-                        cookie['create_date'],
-                        cookie['cookie_flag']
-                    ]
-                    writer.writerow(row)
-        
-        else:
-            print('Output file type is not supported.')
+            if file_path.lower().endswith(ARCHIVE_EXTENSIONS):
+                yield from PyCookieParser._read_archive(file_path, rel_path + '/', candidate_filter)
+            else:
+                yield rel_path, file_path, size
 
     @staticmethod
-    def summarize_cookies(cookies: list) -> dict:
+    def _read_archive(archive_path: str, prefix: str = '', candidate_filter: CandidateFilter = None):
         """
-        Generate a statistical summary of parsed cookies.
+        Read the members of a zip or tar archive one at a time, without extracting them to disk.
+        Compressed tar archives are read as a stream.
 
-        Produces a summary containing:
-        - Total number of cookies
-        - Number of unique domains
-        - Cookie flag distribution
-        - Top domains by cookie count
+        A member is only read in full if its name and listed size pass the candidate
+        filter and it starts with the binary cookie magic. Otherwise, only its first
+        bytes are returned, for the candidate filter to reject and count it.
 
-        :param cookies: The list of parsed cookies.
-        :type cookies: list
+        :param archive_path: The path to the archive.
+        :type archive_path: str
+        :param prefix: The prefix added to the member names.
+        :type prefix: str
+        :param candidate_filter: The pre-filter whose name patterns and size limits are checked first.
+        :type candidate_filter: CandidateFilter
 
-        :return: A dictionary containing summary statistics.
-        :rtype: dict
+        :return: A generator of (member name, member content, member size) tuples.
+        :rtype: generator
         """
-        if not cookies:
-            return {
-                'total_cookies': 0,
-                'unique_domains': 0,
-                'flag_distribution': {},
-                'top_domains': []
-            }
+        def read_member(name, member_file, size):
+            if candidate_filter is not None and not candidate_filter._matches_listing(name, size):
+                return b''
+            head = member_file.read(4)
+            if head != _MAGIC:
+                return head
+            return head + member_file.read()
 
-        domains = [cookie.get('url', '') for cookie in cookies]
-        flags = [cookie.get('cookie_flag', '') for cookie in cookies]
+        try:
+            if zipfile.is_zipfile(archive_path):
+                with zipfile.ZipFile(archive_path) as zip_file:
+                    for info in zip_file.infolist():
+                        if not info.is_dir():
+                            name = prefix + _safe_name(info.filename)
+                            with zip_file.open(info) as member_file:
+                                yield name, read_member(name, member_file, info.file_size), info.file_size
+            else:
+                with tarfile.open(archive_path, 'r|*') as tar_file:
+                    for member in tar_file:
+                        if member.isfile():
+                            name = prefix + _safe_name(member.name)
+                            yield name, read_member(name, tar_file.extractfile(member), member.size), member.size
+        except (zipfile.BadZipFile, tarfile.TarError, OSError):
+            print('Failed to read the archive:', archive_path)
 
-        domain_counts = Counter(domains)
-        flag_counts = Counter(flags)
+    @staticmethod
+    def _find_backup_files(directory: str):
+        """
+        Find the cookie files of an iTunes or Finder backup through its Manifest.db.
+        Files are stored under their SHA-1 file ID, in a subdirectory named after its
+        first two characters, or directly in the backup directory in older backups.
 
-        top_domains = domain_counts.most_common(10)
+        :param directory: The path to the backup directory.
+        :type directory: str
 
-        return {
-            'total_cookies': len(cookies),
-            'unique_domains': len(set(domains)),
-            'flag_distribution': dict(flag_counts),
-            'top_domains': top_domains
-        }
+        :return: List of (domain and relative path, file path) tuples, or None if Manifest.db cannot be read.
+        :rtype: list or None
+        """
+        try:
+            connection = sqlite3.connect(f'file:{os.path.join(directory, "Manifest.db")}?mode=ro', uri=True)
+            try:
+                rows = connection.execute(
+                    "SELECT fileID, domain, relativePath FROM Files WHERE relativePath LIKE '%.binarycookies' "
+                    "ORDER BY domain, relativePath"
+                ).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            print('Failed to read the backup manifest, scanning all files:', directory)
+            return None
+
+        backup_files = []
+        for file_id, domain, relative_path in rows:
+            file_path = os.path.join(directory, file_id[:2], file_id)
+            if not os.path.isfile(file_path):
+                file_path = os.path.join(directory, file_id)
+            if os.path.isfile(file_path):
+                backup_files.append((_safe_name(f'{domain}/{relative_path}'), file_path))
+
+        return backup_files
 
     @staticmethod
-    def batch_process(directory: str) -> dict:
+    def _find_files(directory: str, threads: int = DISCOVERY_THREADS):
         """
-        Process all binary cookie files in a directory and its subdirectories.
+        Find all files in a directory and its subdirectories.
 
-        Scans the given directory recursively for files and attempts to parse each one
-        as a binary cookie file. Files that are not valid binary cookie files
-        are silently skipped.
+        Every subdirectory is listed in a thread pool as soon as it is found, so
+        that slow directory listings, such as on network shares, overlap with each
+        other and with the parsing of the files already found. Files are still
+        yielded in the same order as os.walk(), and symbolic links to directories
+        are not followed.
 
-        :param directory: The path to the directory containing cookie files.
+        :param directory: The path to the directory.
         :type directory: str
+        :param threads: The number of threads listing directories.
+        :type threads: int
 
-        :return: A dictionary mapping relative file paths to their list of parsed cookies.
-        :rtype: dict
+        :return: A generator of (relative file path, file path, file size or None) tuples.
+        :rtype: generator
+        """
+        executor = ThreadPoolExecutor(max_workers=threads)
+        try:
+            pending = [executor.submit(_scan_directory, directory, '')]
+            while pending:
+                files, subdirectories = pending.pop().result()
+                # pushed in reverse, so that subdirectories are popped in listing order
+                pending.extend(executor.submit(_scan_directory, path, rel_path)
+                               for rel_path, path in reversed(subdirectories))
+                yield from files
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def _get_buffer(self):
         """
-        results = {}
+        Return the whole content of the cookie file, reading it on first use.
+        All decoding works on this buffer instead of seeking and reading
+        the file field by field.
 
-        if not os.path.isdir(directory):
-            print(f"Directory not found: {directory}")
-            return results
+        :return: The content of the cookie file, or its memory map.
+        :rtype: bytes or mmap.mmap
+        """
 
-        for root, _, files in os.walk(directory):
-            for file_name in files:
-                file_path = os.path.join(root, file_name)
-                rel_path = os.path.relpath(file_path, directory)
+        if self._buffer is None:
+            self.cookie_file.seek(0)
+            self._buffer = self.cookie_file.read()
 
-                try:
-                    with PyCookieParser(file_path) as parser:
-                        cookies = parser.read_cookie_file(silent=True)
-                        if cookies is not None:
-                            results[rel_path] = cookies
-                except Exception:
-                    # Skip files that cannot be parsed
-                    continue
+        return self._buffer
 
-        return results
-    
     def _increment_offset(self, chunk_size: int):
         """
         Increment the current offset into the cookie file by the given chunk size.
@@ -269,8 +3507,7 @@ class PyCookieParser(object):
         :type chunk_size: int
         """
         
-        self.cookie_file.seek(self.offset)
-        chunk = self.cookie_file.read(chunk_size)
+        chunk = self._get_buffer()[self.offset:self.offset + chunk_size]
         self._increment_offset(chunk_size)
 
         return chunk
@@ -284,8 +3521,7 @@ class PyCookieParser(object):
         :type chunk_size: int
         """
         
-        self.cookie_file.seek(self.offset)
-        chunk = unpack('>i', self.cookie_file.read(chunk_size))[0] 
+        chunk = _INT_BIG_ENDIAN.unpack_from(self._get_buffer(), self.offset)[0]
         self._increment_offset(chunk_size)
 
         return chunk
@@ -299,8 +3535,7 @@ class PyCookieParser(object):
         :type chunk_size: int
         """
         
-        self.cookie_file.seek(self.offset)
-        chunk = unpack('<i', self.cookie_file.read(chunk_size))[0]
+        chunk = _INT_LITTLE_ENDIAN.unpack_from(self._get_buffer(), self.offset)[0]
         self._increment_offset(chunk_size)
 
         return chunk
@@ -314,12 +3549,33 @@ class PyCookieParser(object):
         :type chunk_size: int
         """
         
-        self.cookie_file.seek(self.offset)
-        chunk = unpack('<d', self.cookie_file.read(chunk_size))[0]
+        chunk = _DOUBLE_LITTLE_ENDIAN.unpack_from(self._get_buffer(), self.offset)[0]
         self._increment_offset(chunk_size)
 
         return chunk
 
+    def _read_page_table(self, silent: bool = False):
+        """
+        Check the file header and read the page size table that follows it.
+
+        :param silent: If True, suppress the warning message for files that are not binary cookie files.
+        :type silent: bool
+
+        :return: List of page sizes, or None if the file is not a binary cookie file.
+        :rtype: list or None
+        """
+
+        buffer = self._get_buffer()
+        if buffer[:4] != _MAGIC:
+            if not silent:
+                print(self.file_name, 'is not a binary cookie file.')
+            return None
+
+        _, num_pages = _FILE_HEADER.unpack_from(buffer, 0)
+        self.offset = _FILE_HEADER.size
+
+        return self._read_page_sizes(num_pages)
+
     def _read_page_sizes(self, num_pages: int) -> list:
         """
         Read the sizes of all pages in the cookie file.
@@ -331,43 +3587,150 @@ class PyCookieParser(object):
         :rtype: list
         """
         
-        page_sizes = []
-        for page in range(num_pages):            
-            page_size = self._read_chunk_big_endian()
-            page_sizes.append(page_size)
+        page_sizes = list(Struct(f'>{num_pages}i').unpack_from(self._get_buffer(), self.offset))
+        self._increment_offset(num_pages * 4)
         
         return page_sizes
 
-    def _read_cookies(self, page_sizes: list) -> list:
+    def _read_cookies(self, page_sizes: list, workers: int = 1, executor: Executor = None,
+                      as_record: bool = False, cookie_filter: CookieFilter = None, fields: tuple = None) -> list:
         """
         Read all cookies from the cookie file.
 
         :param page_sizes: The sizes of the pages to read from.
         :type page_sizes: list
+        :param workers: The number of worker processes used to decode pages in parallel.
+        :type workers: int
+        :param executor: An existing thread or process pool to decode pages with.
+        :type executor: concurrent.futures.Executor
+        :param as_record: If True, return Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param cookie_filter: Only return the cookies matching this filter.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and return these fields.
+        :type fields: tuple
 
-        :return: List of cookies. Each cookie is a dictionary.
+        :return: List of cookies. Each cookie is a dictionary or a Cookie record.
         :rtype: list
         """
         
+        page_offsets = self._get_page_offsets(page_sizes)
+
+        if executor is not None:
+            return self._read_pages_concurrently(page_offsets, page_sizes, executor, as_record, cookie_filter,
+                                                 fields)
+
+        if workers > 1 and len(page_offsets) > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT) as executor:
+                return self._read_pages_concurrently(page_offsets, page_sizes, executor, as_record, cookie_filter,
+                                                     fields)
+
         cookies = []
-        for _ in page_sizes:
-            # header b'\x00\x00\x01\x00'
-            _ = self._read_chunk()  
+        for page_offset in page_offsets:
+            cookies.extend(self._read_page(page_offset, as_record, cookie_filter=cookie_filter, fields=fields))
+        
+        return cookies
+
+    def _read_pages_concurrently(self, page_offsets: list, page_sizes: list, executor: Executor,
+                                 as_record: bool = False, cookie_filter: CookieFilter = None,
+                                 fields: tuple = None) -> list:
+        """
+        Decode pages concurrently and merge their cookies in the original order.
 
-            # cookie number
-            cookie_number = self._read_chunk_little_endian()
+        :param page_offsets: The offsets of the pages in the cookie file.
+        :type page_offsets: list
+        :param page_sizes: The sizes of the pages.
+        :type page_sizes: list
+        :param executor: The thread or process pool to decode pages with.
+        :type executor: concurrent.futures.Executor
+        :param as_record: If True, return Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param cookie_filter: Only return the cookies matching this filter.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and return these fields.
+        :type fields: tuple
 
-            cookie_offsets = self._read_cookie_offsets(cookie_number)
+        :return: List of cookies. Each cookie is a dictionary or a Cookie record.
+        :rtype: list
+        """
 
-            # end of header b'\x00\x00\x00\x00'
-            _ = self._read_chunk()
+        buffer = self._get_buffer()
+        pages = [buffer[page_offset:page_offset + page_size]
+                 for page_offset, page_size in zip(page_offsets, page_sizes)]
+        chunksize = max(1, len(pages) // (getattr(executor, '_max_workers', 1) * 4))
+
+        cookies = []
+        for page_cookies in executor.map(_read_page_data, pages, repeat(self.encoding_errors), repeat(as_record),
+                                         repeat(self.date_format), repeat(cookie_filter), repeat(fields),
+                                         chunksize=chunksize):
+            cookies.extend(page_cookies)
 
-            for offset in cookie_offsets:
-                cookie = self._read_cookie(offset)
-                cookies.append(cookie)
-        
         return cookies
 
+    def _get_page_offsets(self, page_sizes: list) -> list:
+        """
+        Compute the offset of every page in the cookie file.
+        The first page starts at the current offset, and every following page
+        starts right after the previous one.
+
+        :param page_sizes: The sizes of the pages.
+        :type page_sizes: list
+
+        :return: List of page offsets.
+        :rtype: list
+        """
+
+        page_offsets = []
+        page_offset = self.offset
+        for page_size in page_sizes:
+            page_offsets.append(page_offset)
+            page_offset += page_size
+
+        return page_offsets
+
+    def _read_page(self, page_offset: int, as_record: bool = False, lazy: bool = False,
+                   cookie_filter: CookieFilter = None, fields: tuple = None) -> list:
+        """
+        Read all cookies from a single page.
+
+        :param page_offset: The offset of the page in the cookie file.
+        :type page_offset: int
+        :param as_record: If True, return Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param lazy: If True, return LazyCookie records instead of dictionaries.
+        :type lazy: bool
+        :param cookie_filter: Only return the cookies matching this filter.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and return these fields. Ignored for LazyCookie records.
+        :type fields: tuple
+
+        :return: List of cookies in the page. Each cookie is a dictionary or a Cookie record.
+        :rtype: list
+        """
+
+        # header b'\x00\x00\x01\x00' and cookie number
+        _, cookie_number = _PAGE_HEADER.unpack_from(self._get_buffer(), page_offset)
+
+        self.offset = page_offset + _PAGE_HEADER.size
+        cookie_offsets = self._read_cookie_offsets(cookie_number)
+
+        # cookie offsets are relative to the start of the page
+        if lazy:
+            buffer = self._get_buffer()
+            cookies = [LazyCookie(buffer, page_offset + offset, offset, self.encoding_errors, self.date_format)
+                       for offset in cookie_offsets]
+            if cookie_filter is not None:
+                cookies = [cookie for cookie in cookies if cookie_filter.matches(cookie)]
+            return cookies
+
+        if cookie_filter is not None:
+            cookies = (self._read_cookie(page_offset + offset, as_record, page_offset, cookie_filter, fields)
+                       for offset in cookie_offsets)
+            return [cookie for cookie in cookies if cookie is not None]
+
+        return [self._read_cookie(page_offset + offset, as_record, page_offset, fields=fields)
+                for offset in cookie_offsets]
+
     def _read_cookie_offsets(self, cookie_number: int) -> list:
         """
         Read the offsets for all cookies in a page.
@@ -379,53 +3742,86 @@ class PyCookieParser(object):
         :rtype: list
         """
         
-        cookie_offsets = []
-        for _ in range(cookie_number):
-            offset = self._read_chunk_little_endian()
-            cookie_offsets.append(offset)
+        cookie_offsets = list(Struct(f'<{cookie_number}i').unpack_from(self._get_buffer(), self.offset))
+        self._increment_offset(cookie_number * 4)
         
         return cookie_offsets
 
-    def _read_cookie(self, offset: int) -> dict:
+    def _read_cookie(self, offset: int, as_record: bool = False, page_offset: int = 0,
+                     cookie_filter: CookieFilter = None, fields: tuple = None):
         """
         Read a cookie at a given offset in the cookie file.
 
         :param offset: The offset to read the cookie from.
         :type offset: int
+        :param as_record: If True, return a Cookie record instead of a dictionary.
+        :type as_record: bool
+        :param page_offset: The offset of the page the cookie belongs to. The offset
+            stored in a Cookie record is relative to it.
+        :type page_offset: int
+        :param cookie_filter: A filter checked before the fields it does not need are decoded.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode these fields. A dictionary only has these keys, and the other
+            fields of a Cookie record are None, unless the filter needed them.
+        :type fields: tuple
 
-        :return: A cookie. The cookie is a dictionary.
-        :rtype: dict
+        :return: A cookie, or None if it does not match the filter. The cookie is a dictionary or a Cookie record.
+        :rtype: dict or Cookie or None
         """
         
-        cookie_size = self._read_chunk_little_endian()
+        (cookie_size, _, flag, _,
+         urloffset, nameoffset, pathoffset, valueoffset,
+         _, expiry_date_mac, create_date_mac) = _COOKIE_RECORD.unpack_from(self._get_buffer(), offset)
 
-        # unknown b'\x00\x00\x00\x00'
-        _ = self._read_chunk()
-
-        flag = self._read_chunk_little_endian()
-        cookie_flag = self._get_cookie_flag(flag)
-
-        # unknown b'\x00\x00\x00\x00'
-        _ = self._read_chunk()
-
-        urloffset = self._read_chunk_little_endian()
-        nameoffset = self._read_chunk_little_endian()
-        pathoffset = self._read_chunk_little_endian()
-        valueoffset = self._read_chunk_little_endian()
+        expiry_date_epoch = expiry_date_mac + MAC_EPOCH_OFFSET
+        create_date_epoch = create_date_mac + MAC_EPOCH_OFFSET
+        if cookie_filter is not None and not cookie_filter.matches_header(flag, expiry_date_epoch, create_date_epoch):
+            return None
 
-        # unknown b'\x00\x00\x00\x00\x00\x00\x00\x00'
-        _ = self._read_chunk(chunk_size=8)
+        # string offsets are relative to the start of the cookie
+        cookie_end = offset + cookie_size
+        if fields is None:
+            url = self._read_string(offset + urloffset, cookie_end)
+            if cookie_filter is not None and not cookie_filter.matches_url(url):
+                return None
+            name = self._read_string(offset + nameoffset, cookie_end)
+            if cookie_filter is not None and not cookie_filter.matches_name(name):
+                return None
 
-        expiry_date_epoch = self._read_chunk_double() + 978307200
-        expiry_date = strftime("%a, %d %b %Y ", gmtime(expiry_date_epoch))[:-1]
+            cookie_flag = self._get_cookie_flag(flag)
+            expiry_date = _format_date(expiry_date_epoch, self.date_format)
+            create_date = _format_date(create_date_epoch, self.date_format)
+            path = self._read_string(offset + pathoffset, cookie_end)
+            value = self._read_string(offset + valueoffset, cookie_end)
+        else:
+            # only the selected fields, and the ones the filter checks, are decoded and formatted
+            url = name = path = value = expiry_date = create_date = cookie_flag = None
+            check_url = cookie_filter is not None and cookie_filter.domains is not None
+            if check_url or 'url' in fields:
+                url = self._read_string(offset + urloffset, cookie_end)
+                if check_url and not cookie_filter.matches_url(url):
+                    return None
+            check_name = cookie_filter is not None and cookie_filter.names is not None
+            if check_name or 'name' in fields:
+                name = self._read_string(offset + nameoffset, cookie_end)
+                if check_name and not cookie_filter.matches_name(name):
+                    return None
 
-        create_date_epoch = self._read_chunk_double() + 978307200
-        create_date = strftime("%a, %d %b %Y ", gmtime(create_date_epoch))[:-1]
+            if 'cookie_flag' in fields:
+                cookie_flag = self._get_cookie_flag(flag)
+            if 'expiry_date' in fields:
+                expiry_date = _format_date(expiry_date_epoch, self.date_format)
+            if 'create_date' in fields:
+                create_date = _format_date(create_date_epoch, self.date_format)
+            if 'path' in fields:
+                path = self._read_string(offset + pathoffset, cookie_end)
+            if 'value' in fields:
+                value = self._read_string(offset + valueoffset, cookie_end)
 
-        url = self._read_null_terminated_string()
-        name = self._read_null_terminated_string()
-        path = self._read_null_terminated_string()
-        value = self._read_null_terminated_string()
+        if as_record:
+            return Cookie(name, value, url, path, expiry_date, create_date, cookie_flag,
+                          flag, expiry_date_epoch, create_date_epoch, offset - page_offset, cookie_size,
+                          urloffset, nameoffset, pathoffset, valueoffset, expiry_date_mac, create_date_mac)
 
         cookie = {
             'name': name,
@@ -437,26 +3833,79 @@ class PyCookieParser(object):
             'cookie_flag': cookie_flag
         }
 
+        if fields is not None:
+            return {field: cookie[field] for field in fields}
+
         return cookie
 
+    def _fill_table(self, table: CookieTable, page_offset: int, source: str = '') -> None:
+        """
+        Read all cookies from a single page into a columnar table.
+
+        :param table: The table to append the cookies to.
+        :type table: CookieTable
+        :param page_offset: The offset of the page in the cookie file.
+        :type page_offset: int
+        :param source: The source file name stored with every cookie.
+        :type source: str
+        """
+
+        buffer = self._get_buffer()
+        _, cookie_number = _PAGE_HEADER.unpack_from(buffer, page_offset)
+
+        self.offset = page_offset + _PAGE_HEADER.size
+        for cookie_offset in self._read_cookie_offsets(cookie_number):
+            offset = page_offset + cookie_offset
+            (cookie_size, _, flag, _,
+             urloffset, nameoffset, pathoffset, valueoffset,
+             _, expiry_date_mac, create_date_mac) = _COOKIE_RECORD.unpack_from(buffer, offset)
+
+            cookie_end = offset + cookie_size
+            table.append(self._read_string(offset + nameoffset, cookie_end),
+                         self._read_string(offset + valueoffset, cookie_end),
+                         self._read_string(offset + urloffset, cookie_end),
+                         self._read_string(offset + pathoffset, cookie_end),
+                         self._get_cookie_flag(flag),
+                         flag,
+                         expiry_date_mac + MAC_EPOCH_OFFSET,
+                         create_date_mac + MAC_EPOCH_OFFSET,
+                         source)
+
+    def _read_string(self, offset: int, limit: int) -> str:
+        """
+        Read a null-terminated string at a given offset in the cookie file.
+        The string is sliced and decoded once, using the parser's encoding error policy.
+
+        :param offset: The offset of the first character of the string.
+        :type offset: int
+        :param limit: The offset the terminator must be found before, usually the end of the cookie.
+        :type limit: int
+
+        :return: The decoded string.
+        :rtype: str
+        """
+
+        return _decode_string(self._get_buffer(), offset, limit, self.encoding_errors)
+
     def _read_null_terminated_string(self, chunk_size=1) -> str:
         """
-        Read a null-terminated string from the cookie file.
+        Read a null-terminated string at the current offset, incrementing the offset
+        past its terminator.
 
-        :param chunk_size: The size of the chunk to read.
+        :param chunk_size: The size of the terminator to skip.
         :type chunk_size: int
 
         :return: A null-terminated string.
         :rtype: str
         """
         
-        string = ''
-        char = self.cookie_file.read(chunk_size)
-        self._increment_offset(chunk_size)
-        while unpack('<b', char)[0] != 0:
-            string += char.decode('utf-8')
-            char = self.cookie_file.read(chunk_size)
-            self._increment_offset(chunk_size)
+        buffer = self._get_buffer()
+        end = buffer.find(b'\x00', self.offset)
+        if end < 0:
+            raise ValueError(f'Unterminated string at offset {self.offset}.')
+
+        string = buffer[self.offset:end].decode('utf-8', self.encoding_errors)
+        self.offset = end + chunk_size
         
         return string
 
@@ -471,26 +3920,454 @@ class PyCookieParser(object):
         :rtype: str
         """
         
-        if flag == 0:
-            return ''
-        elif flag == 1:
-            return 'Secure'
-        elif flag == 4:
-            return 'HttpOnly'
-        elif flag == 5:
-            return 'Secure; HttpOnly'
-        else:
-            return 'Unknown'
+        return _COOKIE_FLAGS.get(flag, 'Unknown')
+
+
+class AsyncPyCookieParser(object):
+    """
+    An asyncio front end to the parser, for use inside async services.
+
+    Files are read and cookies are decoded in an executor, so the event loop
+    is never blocked. By default, the default executor of the loop is used;
+    pass a ProcessPoolExecutor to decode on several cores::
+
+        parser = AsyncPyCookieParser('cookies.binarycookies')
+        cookies = await parser.read_cookie_file()
+
+        async for cookie in parser.iter_cookies():
+            print(cookie['name'])
+
+        results = await AsyncPyCookieParser.batch_process('dataset', concurrency=8)
+
+    :param file_name: The name of the cookie file.
+    :type file_name: str
+    :param encoding_errors: The error handling scheme used when a cookie string
+        is not valid UTF-8, such as 'strict', 'replace', or 'backslashreplace'.
+    :type encoding_errors: str
+    :param date_format: The format of the expiry and creation dates, 'day' or 'iso'.
+    :type date_format: str
+    :param executor: The thread or process pool to read and decode in. Defaults to the default executor of the loop.
+    :type executor: concurrent.futures.Executor
+    """
+
+    def __init__(self, file_name: str, encoding_errors: str = 'strict', date_format: str = 'day',
+                 executor: Executor = None):
+        self.file_name = file_name
+        self.encoding_errors = encoding_errors
+        self.date_format = date_format
+        self.executor = executor
+
+    async def read_cookie_file(self, silent: bool = False, as_record: bool = False,
+                               cookie_filter: CookieFilter = None, fields: tuple = None):
+        """
+        Read and parse the contents of the cookie file in the executor.
+
+        :param silent: If True, suppress warning messages for invalid files.
+        :type silent: bool
+        :param as_record: If True, return Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param cookie_filter: Keep only the cookies matching this filter, skipping the others while parsing.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and return these fields, such as ('name', 'url'). All fields by default.
+        :type fields: tuple
+
+        :return: A list of cookie dictionaries, or None on failure.
+        :rtype: list or None
+        """
+        fields = _check_fields(fields)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _parse_file, self.file_name, self.encoding_errors, False,
+                                          as_record, self.date_format, silent, cookie_filter, fields)
+
+    async def iter_cookies(self, silent: bool = False, as_record: bool = False, cookie_filter: CookieFilter = None,
+                           fields: tuple = None):
+        """
+        Read the cookie file in the executor and decode it one page at a time,
+        yielding cookies in file order with ``async for``.
+        Nothing is yielded if the file cannot be read or is not a binary cookie file.
+
+        :param silent: If True, suppress warning messages for invalid files.
+        :type silent: bool
+        :param as_record: If True, yield Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param cookie_filter: Keep only the cookies matching this filter, skipping the others while parsing.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and yield these fields, such as ('name', 'url'). All fields by default.
+        :type fields: tuple
+
+        :return: An async generator of cookie dictionaries.
+        :rtype: async generator
+        """
+        fields = _check_fields(fields)
+        loop = asyncio.get_running_loop()
+        buffer = await loop.run_in_executor(self.executor, _read_file, self.file_name)
+        if buffer is None:
+            if not silent:
+                print('Failed to open the cookie file:', self.file_name)
+            return
+
+        parser = PyCookieParser.from_bytes(buffer, self.file_name, self.encoding_errors, self.date_format)
+        try:
+            page_sizes = parser._read_page_table(silent)
+            if page_sizes is None:
+                return
+
+            for page_offset, page_size in zip(parser._get_page_offsets(page_sizes), page_sizes):
+                cookies = await loop.run_in_executor(self.executor, _read_page_data,
+                                                     buffer[page_offset:page_offset + page_size],
+                                                     self.encoding_errors, as_record, self.date_format,
+                                                     cookie_filter, fields)
+                for cookie in cookies:
+                    yield cookie
+
+        except Exception:
+            if not silent:
+                print('Failed to read the cookie file:', self.file_name)
+
+    @staticmethod
+    async def batch_process(directory: str, encoding_errors: str = 'strict', as_record: bool = False,
+                            date_format: str = 'day', concurrency: int = None, executor: Executor = None,
+                            semaphore: asyncio.Semaphore = None, candidate_filter: CandidateFilter = None,
+                            cookie_filter: CookieFilter = None, fields: tuple = None,
+                            deduplicator: CookieDeduplicator = None) -> dict:
+        """
+        Process all cookie files in a directory and its subdirectories concurrently.
+
+        :param directory: The path to the directory containing cookie files.
+        :type directory: str
+        :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+        :type encoding_errors: str
+        :param as_record: If True, parse cookies into Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param date_format: The format of the expiry and creation dates, 'day' or 'iso'.
+        :type date_format: str
+        :param concurrency: The maximum number of files parsed at once. Defaults to the number of CPUs.
+        :type concurrency: int
+        :param executor: The thread or process pool to parse in. Defaults to the default executor of the loop.
+        :type executor: concurrent.futures.Executor
+        :param semaphore: A semaphore shared with other tasks to bound the number of files parsed at once,
+            instead of one created from concurrency.
+        :type semaphore: asyncio.Semaphore
+        :param candidate_filter: The pre-filter of candidate files, to set heuristics and read its counts.
+        :type candidate_filter: CandidateFilter
+        :param cookie_filter: Keep only the cookies matching this filter, skipping the others while parsing.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and return these fields, such as ('name', 'url'). All fields by default.
+        :type fields: tuple
+        :param deduplicator: A deduplicator whose files are hashed before parsing, so that files with
+            the same content as one already seen are not parsed. Their cookies are deduplicated with add().
+        :type deduplicator: CookieDeduplicator
+
+        :return: A dictionary mapping file paths to lists of cookies.
+        :rtype: dict
+        """
+        return {file_path: cookies async for file_path, cookies in AsyncPyCookieParser.iter_batch_process(
+            directory, encoding_errors, as_record, date_format, concurrency, executor, semaphore, candidate_filter,
+            cookie_filter, fields, deduplicator)}
+
+    @staticmethod
+    async def iter_batch_process(directory: str, encoding_errors: str = 'strict', as_record: bool = False,
+                                 date_format: str = 'day', concurrency: int = None, executor: Executor = None,
+                                 semaphore: asyncio.Semaphore = None, candidate_filter: CandidateFilter = None,
+                                 cookie_filter: CookieFilter = None, fields: tuple = None,
+                                 deduplicator: CookieDeduplicator = None):
+        """
+        Process all cookie files in a directory and its subdirectories concurrently,
+        yielding (relative file path, list of cookies) tuples in the same order as
+        ``PyCookieParser.iter_batch_process()`` with ``async for``. At most a few
+        files per concurrent task are parsed ahead of the consumer.
+
+        :param directory: The path to the directory containing cookie files.
+        :type directory: str
+        :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+        :type encoding_errors: str
+        :param as_record: If True, parse cookies into Cookie records instead of dictionaries.
+        :type as_record: bool
+        :param date_format: The format of the expiry and creation dates, 'day' or 'iso'.
+        :type date_format: str
+        :param concurrency: The maximum number of files parsed at once. Defaults to the number of CPUs.
+        :type concurrency: int
+        :param executor: The thread or process pool to parse in. Defaults to the default executor of the loop.
+        :type executor: concurrent.futures.Executor
+        :param semaphore: A semaphore shared with other tasks to bound the number of files parsed at once,
+            instead of one created from concurrency.
+        :type semaphore: asyncio.Semaphore
+        :param candidate_filter: The pre-filter of candidate files, to set heuristics and read its counts.
+        :type candidate_filter: CandidateFilter
+        :param cookie_filter: Keep only the cookies matching this filter, skipping the others while parsing.
+        :type cookie_filter: CookieFilter
+        :param fields: Only decode and return these fields, such as ('name', 'url'). All fields by default.
+        :type fields: tuple
+        :param deduplicator: A deduplicator whose files are hashed before parsing, so that files with
+            the same content as one already seen are not parsed. Their cookies are deduplicated with add().
+        :type deduplicator: CookieDeduplicator
+
+        :return: An async generator of (relative file path, result) tuples.
+        :rtype: async generator
+        """
+        fields = _check_fields(fields)
+        loop = asyncio.get_running_loop()
+        # finding and reading files blocks as well, so it runs in the default thread pool
+        candidate_filter = candidate_filter or CandidateFilter()
+        sources = await loop.run_in_executor(None, PyCookieParser._find_sources, directory, candidate_filter)
+        if sources is None:
+            print(f"Directory not found: {directory}")
+            return
+        sources = candidate_filter.filter(sources)
+        if deduplicator is not None:
+            sources = deduplicator.filter(sources)
+
+        concurrency = concurrency or os.cpu_count() or 1
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(concurrency)
+
+        async def parse(source):
+            async with semaphore:
+                return await loop.run_in_executor(executor, _parse_file, source, encoding_errors, False,
+                                                  as_record, date_format, True, cookie_filter, fields)
+
+        pending = deque()
+        try:
+            while True:
+                item = await loop.run_in_executor(None, next, sources, None)
+                if item is None:
+                    break
+
+                name, source = item
+                pending.append((name, asyncio.ensure_future(parse(source))))
+                if len(pending) < concurrency * 2:
+                    continue
+
+                name, task = pending.popleft()
+                result = await task
+                if result is None:
+                    candidate_filter.failed.append(name)
+                else:
+                    yield name, result
+
+            while pending:
+                name, task = pending.popleft()
+                result = await task
+                if result is None:
+                    candidate_filter.failed.append(name)
+                else:
+                    yield name, result
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+
+def _read_page_data(page: bytes, encoding_errors: str = 'strict', as_record: bool = False,
+                    date_format: str = 'day', cookie_filter: CookieFilter = None, fields: tuple = None) -> list:
+    """
+    Decode the cookies of a single page. This is a module-level function so that
+    pages can be sent to worker processes.
+
+    :param page: The content of the page.
+    :type page: bytes
+    :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+    :type encoding_errors: str
+    :param as_record: If True, return Cookie records instead of dictionaries.
+    :type as_record: bool
+    :param date_format: The date format, 'day' or 'iso'.
+    :type date_format: str
+    :param cookie_filter: Only return the cookies matching this filter.
+    :type cookie_filter: CookieFilter
+    :param fields: Only decode and return these fields.
+    :type fields: tuple
+
+    :return: List of cookies in the page. Each cookie is a dictionary or a Cookie record.
+    :rtype: list
+    """
+    parser = PyCookieParser.from_buffer(page, encoding_errors=encoding_errors, date_format=date_format)
+
+    return parser._read_page(0, as_record, cookie_filter=cookie_filter, fields=fields)
+
+
+def _scan_directory(path: str, rel_path: str):
+    """
+    List a single directory with os.scandir(). Directories that cannot be listed
+    are treated as empty, like os.walk() does.
+
+    :param path: The path to the directory.
+    :type path: str
+    :param rel_path: The path to the directory relative to the top of the walk.
+    :type rel_path: str
+
+    :return: Lists of (relative path, path, size) tuples of the files, with None as the size
+        of the files that cannot be stat'ed, and of (relative path, path) tuples of the subdirectories.
+    :rtype: tuple
+    """
+    files = []
+    subdirectories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                entry_rel_path = os.path.join(rel_path, entry.name)
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if not is_dir:
+                    # the size lets the candidate filter reject files without opening them
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        size = None
+                    files.append((entry_rel_path, entry.path, size))
+                elif not entry.is_symlink():
+                    subdirectories.append((entry_rel_path, entry.path))
+    except OSError:
+        pass
+
+    return files, subdirectories
+
+
+def _safe_name(name: str) -> str:
+    """
+    Make a member name of an archive, or a path from a backup manifest, safe to use
+    as a relative output name. These names come from the evidence, so leading
+    slashes and drive letters are stripped and '.' and '..' parts are dropped.
+
+    :param name: The name, with '/' or '\\' separators.
+    :type name: str
+
+    :return: A relative name without parent references, never empty.
+    :rtype: str
+    """
+    parts = name.replace('\\', '/').split('/')
+    if parts and len(parts[0]) == 2 and parts[0][1] == ':' and parts[0][0].isalpha():
+        parts = parts[1:]
+
+    return '/'.join(part for part in parts if part not in ('', '.', '..')) or '_'
+
+
+def _read_file(file_path: str):
+    """
+    Read the whole content of a file. This is a module-level function so that
+    it can be run in an executor.
+
+    :param file_path: The path to the file.
+    :type file_path: str
+
+    :return: The content of the file, or None if it cannot be read.
+    :rtype: bytes or None
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _open_source(source, encoding_errors: str = 'strict', mmap: bool = False,
+                 date_format: str = 'day') -> PyCookieParser:
+    """
+    Create a parser for a cookie file given by its path or by its content.
+
+    :param source: The path to the cookie file, or its content.
+    :type source: str or bytes
+    :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+    :type encoding_errors: str
+    :param mmap: If True, memory-map the cookie file.
+    :type mmap: bool
+    :param date_format: The date format, 'day' or 'iso'.
+    :type date_format: str
+
+    :return: The parser.
+    :rtype: PyCookieParser
+    """
+    if isinstance(source, bytes):
+        return PyCookieParser.from_bytes(source, encoding_errors=encoding_errors, date_format=date_format)
+
+    return PyCookieParser(source, encoding_errors, mmap, date_format)
+
+
+def _parse_file(file_path, encoding_errors: str = 'strict', mmap: bool = False, as_record: bool = False,
+                date_format: str = 'day', silent: bool = True, cookie_filter: CookieFilter = None,
+                fields: tuple = None):
+    """
+    Parse a single binary cookie file. This is a module-level function so that
+    it can be sent to worker processes.
+
+    :param file_path: The path to the cookie file, or its content.
+    :type file_path: str or bytes
+    :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+    :type encoding_errors: str
+    :param mmap: If True, memory-map the cookie file.
+    :type mmap: bool
+    :param as_record: If True, parse cookies into Cookie records instead of dictionaries.
+    :type as_record: bool
+    :param date_format: The date format, 'day' or 'iso'.
+    :type date_format: str
+    :param silent: If True, suppress warning messages for invalid files.
+    :type silent: bool
+    :param cookie_filter: Keep only the cookies matching this filter.
+    :type cookie_filter: CookieFilter
+    :param fields: Only decode and return these fields.
+    :type fields: tuple
+
+    :return: A list of cookies, or None if the file is not a valid binary cookie file.
+    :rtype: list or None
+    """
+    try:
+        with _open_source(file_path, encoding_errors, mmap, date_format) as parser:
+            return parser.read_cookie_file(silent=silent, as_record=as_record, cookie_filter=cookie_filter,
+                                           fields=fields)
+    except Exception:
+        # Skip files that cannot be parsed
+        return None
+
+
+def _parse_file_table(file_path, encoding_errors: str = 'strict', mmap: bool = False,
+                      date_format: str = 'day'):
+    """
+    Parse a single binary cookie file into a columnar table. This is a module-level
+    function so that it can be sent to worker processes.
+
+    :param file_path: The path to the cookie file, or its content.
+    :type file_path: str or bytes
+    :param encoding_errors: The error handling scheme for cookie strings that are not valid UTF-8.
+    :type encoding_errors: str
+    :param mmap: If True, memory-map the cookie file.
+    :type mmap: bool
+    :param date_format: The date format, 'day' or 'iso'.
+    :type date_format: str
+
+    :return: A table of cookies, or None if the file is not a valid binary cookie file.
+    :rtype: CookieTable or None
+    """
+    try:
+        with _open_source(file_path, encoding_errors, mmap, date_format) as parser:
+            return parser.read_cookie_table(silent=True)
+    except Exception:
+        # Skip files that cannot be parsed
+        return None
 
 
 def main():
     # command option
     parser = argparse.ArgumentParser(description='iOS binary cookie parser.')
     parser.add_argument('-i', '--input_path', action='store', help='Input file path')
-    parser.add_argument('-d', '--directory', action='store', help='Input directory path for batch processing')
-    parser.add_argument('-t', '--output_type', choices=['txt', 'json', 'csv'], action='store', required=True, help='Output file type, such as txt, json, and csv')
+    parser.add_argument('-d', '--directory', action='store', help='Input directory, zip or tar archive, or iTunes backup path for batch processing')
+    parser.add_argument('-t', '--output_type', choices=list(WRITERS), action='store', required=True, help='Output file type, such as txt, json, jsonl, csv, and sqlite')
     parser.add_argument('-o', '--output_path', action='store', required=True, help='Output file path')
     parser.add_argument('--summary', action='store_true', help='Print a statistical summary of parsed cookies')
+    parser.add_argument('--compress', choices=list(COMPRESSION_EXTENSIONS), help='Compress output files with gzip or zstd')
+    parser.add_argument('--single_output', action='store_true', help='In batch processing, write all cookies into a single output file with a source column')
+    parser.add_argument('--encoding_errors', choices=['strict', 'replace', 'backslashreplace', 'ignore'], default='strict', help='How to handle cookie strings that are not valid UTF-8')
+    parser.add_argument('--mmap', action='store_true', help='Memory-map cookie files instead of reading them into memory')
+    parser.add_argument('--date_format', choices=list(DATE_FORMATS), default='day', help='Date format: day strings (default) or ISO-8601 timestamps')
+    parser.add_argument('--name_pattern', action='append', help='In batch processing, only parse files whose name matches this pattern, such as "*.binarycookies"; can be repeated')
+    parser.add_argument('--filter', action='append', help='Only keep cookies matching this expression, such as "domain=.google.com", "name=SID", "secure", "httponly", "unexpired" or "expires_after=2025-01-01"; can be repeated')
+    parser.add_argument('--fields', action='store', help='Only decode and write these comma-separated fields, such as "name,url,expiry_date"')
+    parser.add_argument('--approximate', action='store_true', help='Estimate the distinct and top domains of the summary in bounded memory, for very large runs')
+    parser.add_argument('--dedup', action='store_true', help='In batch processing, skip duplicate files and write and summarize every cookie only once')
+    parser.add_argument('--index', action='store', help='In batch processing, save an index of the cookies by domain, name and source file to this path')
+    parser.add_argument('--cache', action='store', help='Path of a parse cache database; unchanged and duplicate files are not parsed again')
+    parser.add_argument('--cache_size', type=int, default=1024, help='Maximum size of the parse cache in MB')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes for batch processing, or for decoding the pages of a single file')
 
     # parse arguments
     arguments = parser.parse_args()
@@ -502,33 +4379,121 @@ def main():
     if arguments.input_path and arguments.directory:
         parser.error('Cannot use both -i/--input_path and -d/--directory at the same time.')
 
+    if arguments.output_type == 'sqlite' and arguments.compress:
+        parser.error('--compress cannot be used with SQLite output.')
+
+    try:
+        cookie_filter = CookieFilter.parse(arguments.filter) if arguments.filter else None
+    except ValueError as error:
+        parser.error(str(error))
+
+    try:
+        fields = _check_fields([field.strip() for field in arguments.fields.split(',') if field.strip()]
+                               if arguments.fields else None)
+    except ValueError as error:
+        parser.error(str(error))
+
+    # the summary, deduplication and index read a few fields besides the written ones
+    parse_fields = fields
+    if fields:
+        extra_fields = ()
+        if arguments.summary:
+            extra_fields += ('url', 'cookie_flag', 'expiry_date')
+        if arguments.dedup:
+            extra_fields += ('url', 'name', 'path')
+        if arguments.index:
+            extra_fields += ('url', 'name')
+        parse_fields = _check_fields(fields + extra_fields)
+
+    # records keep the numeric dates of the SQLite output and the raw creation times compared by deduplication
+    as_record = arguments.output_type == 'sqlite' or arguments.dedup
+
     # batch processing mode
     if arguments.directory:
         print('Batch processing directory:', arguments.directory)
-        results = PyCookieParser.batch_process(arguments.directory)
+        cache = ParseCache(arguments.cache, arguments.cache_size * 1024 * 1024) if arguments.cache else None
+        candidate_filter = CandidateFilter(arguments.name_pattern)
+        deduplicator = CookieDeduplicator() if arguments.dedup else None
+        results = PyCookieParser.iter_batch_process(arguments.directory, arguments.encoding_errors, arguments.mmap, arguments.jobs,
+                                                    as_record, arguments.date_format, cache, candidate_filter,
+                                                    cookie_filter, parse_fields, deduplicator)
+        parsed_files = 0
+        output_writer = None
+
+        # SQLite output always goes to a single database that grows incrementally
+        if arguments.single_output or arguments.output_type == 'sqlite':
+            # one writer for the whole batch, with the source file of every cookie
+            os.makedirs(arguments.output_path, exist_ok=True)
+            writer_class = WRITERS[arguments.output_type]
+            output_file = (os.path.basename(os.path.normpath(arguments.directory)) + '-parsed' +
+                           writer_class.extension + COMPRESSION_EXTENSIONS.get(arguments.compress, ''))
+            output_writer = writer_class(os.path.join(arguments.output_path, output_file), arguments.compress,
+                                         include_source=True, fields=fields)
+            output_writer.open()
 
-        if not results:
+        summary = CookieSummary(approximate=arguments.approximate)
+        index = CookieIndex() if arguments.index else None
+
+        def write_batch_results():
+            # write every file as soon as it is parsed and add its cookies to the summary
+            nonlocal parsed_files
+            for file_name, cookies in results:
+                parsed_files += 1
+                if deduplicator:
+                    # duplicate files were already dropped before parsing, only new cookies are kept
+                    cookies = deduplicator.add(file_name, cookies)
+                print(f'  Parsed: {file_name} ({len(cookies)} cookies)')
+                if output_writer:
+                    output_writer.write(cookies, source=file_name)
+                else:
+                    cookie_parser = PyCookieParser(os.path.join(arguments.directory, file_name))
+                    cookie_parser.write_results(cookies, arguments.output_type, arguments.output_path, file_name,
+                                                arguments.compress, fields)
+                summary.update(cookies, source=file_name)
+                if index is not None:
+                    index.update(cookies, source=file_name)
+
+        try:
+            write_batch_results()
+        finally:
+            if output_writer:
+                output_writer.close()
+            for file_name in candidate_filter.failed:
+                print(f'  Failed to parse: {file_name}')
+            print(f'Scanned {candidate_filter.scanned} files, rejected {candidate_filter.rejected} that are not cookie files, '
+                  f'failed to parse {len(candidate_filter.failed)}')
+            if cache:
+                print(f'Parse cache: {cache.hits} hits, {cache.misses} misses')
+                cache.close()
+            if deduplicator:
+                for file_name, duplicates in deduplicator.file_duplicates().items():
+                    for duplicate in duplicates:
+                        print(f'  Skipped duplicate: {duplicate} (same as {file_name})')
+                print(f'Deduplication: {deduplicator.duplicate_files} duplicate files, '
+                      f'{deduplicator.duplicate_cookies} duplicate cookies skipped')
+
+        if output_writer and parsed_files:
+            print('Saving parsing results to:', output_writer.file_name)
+
+        if index is not None and parsed_files:
+            index.save(arguments.index)
+            print('Saving cookie index to:', arguments.index)
+
+        if not parsed_files:
             print('No valid cookie files found in the directory.')
             return
 
-        all_cookies = []
-        for file_name, cookies in results.items():
-            print(f'  Parsed: {file_name} ({len(cookies)} cookies)')
-            cookie_parser = PyCookieParser(os.path.join(arguments.directory, file_name))
-            cookie_parser.write_results(cookies, arguments.output_type, arguments.output_path, file_name)
-            all_cookies.extend(cookies)
-
-        if arguments.summary and all_cookies:
-            summary = PyCookieParser.summarize_cookies(all_cookies)
-            _print_summary(summary)
+        if arguments.summary and summary.total_cookies:
+            _print_summary(summary.to_dict())
 
         return
 
     # single file mode
-    cookie_parser = PyCookieParser(arguments.input_path)
+    cookie_parser = PyCookieParser(arguments.input_path, arguments.encoding_errors, arguments.mmap, arguments.date_format)
     print('Parsing a cookie file    :', arguments.input_path)
     cookie_parser.open_file()
-    cookies = cookie_parser.read_cookie_file()
+    cookies = cookie_parser.read_cookie_file(workers=arguments.jobs, as_record=as_record, cookie_filter=cookie_filter,
+                                             fields=parse_fields)
     cookie_parser.close_file()
 
     # get cookie file name
@@ -536,11 +4501,13 @@ def main():
     
     # write results
     if cookies:
-        cookie_parser.write_results(cookies, arguments.output_type, arguments.output_path, file_name)
-        print('Saving parsing results to:', os.path.join(arguments.output_path, file_name + '-parsed.' + arguments.output_type))
+        cookie_parser.write_results(cookies, arguments.output_type, arguments.output_path, file_name, arguments.compress,
+                                    fields)
+        output_file = file_name + '-parsed' + WRITERS[arguments.output_type].extension + COMPRESSION_EXTENSIONS.get(arguments.compress, '')
+        print('Saving parsing results to:', os.path.join(arguments.output_path, output_file))
 
         if arguments.summary:
-            summary = PyCookieParser.summarize_cookies(cookies)
+            summary = PyCookieParser.summarize_cookies(cookies, arguments.approximate)
             _print_summary(summary)
 
 
@@ -555,9 +4522,14 @@ def _print_summary(summary: dict) -> None:
     print(f"Total cookies      : {summary['total_cookies']}")
     print(f"Unique domains     : {summary['unique_domains']}")
     print(f"Flag distribution  : {summary['flag_distribution']}")
+    print(f"Secure ratio       : {summary['secure_ratio']:.1%}")
+    print(f"HttpOnly ratio     : {summary['http_only_ratio']:.1%}")
     print('Top domains:')
     for domain, count in summary['top_domains']:
         print(f"  {domain}: {count}")
+    print('Expiry years:')
+    for year, count in summary['expiry_histogram'].items():
+        print(f"  {year if year is not None else 'unknown'}: {count}")
     print('----------------------')
 
 
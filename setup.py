@@ -22,6 +22,8 @@ setup(
     install_requires=[],
     extras_require={
         'dev': ['pytest', 'Sphinx', 'sphinx-rtd-theme'],
+        'numpy': ['numpy'],
+        'zstd': ['zstandard'],
     },
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -1,12 +1,77 @@
 import os
 import json
+import asyncio
 import csv
 import pytest
 from struct import pack
 from time import time, gmtime, strftime
 from tempfile import NamedTemporaryFile, TemporaryDirectory
 from io import BytesIO
-from pycookieparser.pycookieparser import PyCookieParser
+from pycookieparser.pycookieparser import (
+    AsyncPyCookieParser,
+    CandidateFilter,
+    Cookie,
+    CookieDeduplicator,
+    CookieFilter,
+    CookieIndex,
+    CookieSummary,
+    CookieTable,
+    CsvWriter,
+    JsonLinesWriter,
+    JsonWriter,
+    LazyCookie,
+    MemoryCache,
+    ParseCache,
+    PyCookieParser,
+    SqliteWriter,
+    TxtWriter,
+    _format_date,
+    _format_day,
+)
+
+# Helpers: building synthetic cookie files
+
+def _build_cookie(url, name, path, value, flag=0, expiry=0.0, create=0.0):
+    """Helper to build a single binary cookie record."""
+    strings = [field.encode('utf-8') + b'\x00' for field in (url, name, path, value)]
+    offsets = []
+    position = 56
+    for string in strings:
+        offsets.append(position)
+        position += len(string)
+
+    return pack('<iiiiiiii8sdd', position, 0, flag, 0, *offsets, b'\x00' * 8, expiry, create) + b''.join(strings)
+
+
+def _build_page(records):
+    """Helper to build a page from a list of cookie records."""
+    header_size = 8 + 4 * len(records) + 4
+    offsets = []
+    position = header_size
+    for record in records:
+        offsets.append(position)
+        position += len(record)
+
+    header = b'\x00\x00\x01\x00' + pack('<i', len(records))
+    header += b''.join(pack('<i', offset) for offset in offsets) + b'\x00' * 4
+
+    return header + b''.join(records)
+
+
+def _build_cookie_file(pages):
+    """Helper to build a binary cookie file from a list of pages."""
+    data = b'cook' + pack('>i', len(pages))
+    data += b''.join(pack('>i', len(page)) for page in pages)
+
+    return data + b''.join(pages) + b'\x00' * 8
+
+
+def _write_temp_file(data):
+    """Helper to write bytes to a named temporary file and return its path."""
+    with NamedTemporaryFile(delete=False) as f:
+        f.write(data)
+
+    return f.name
 
 # Test: Reading cookie file
 
@@ -30,6 +95,207 @@ def test_read_cookie_file():
     assert 'cookie_flag' in cookie
 
 
+def test_read_cookie_file_multiple_pages():
+    data = _build_cookie_file([
+        _build_page([_build_cookie('.a.com', 'first', '/', '1', flag=1),
+                     _build_cookie('.b.com', 'second', '/b', '2', flag=4)]),
+        _build_page([_build_cookie('.c.com', 'third', '/c', '3', flag=5)]),
+    ])
+    file_name = _write_temp_file(data)
+
+    with PyCookieParser(file_name) as parser:
+        cookies = parser.read_cookie_file()
+        # a second read decodes the same buffer again
+        assert parser.read_cookie_file() == cookies
+    os.remove(file_name)
+
+    assert [cookie['name'] for cookie in cookies] == ['first', 'second', 'third']
+    assert [cookie['url'] for cookie in cookies] == ['.a.com', '.b.com', '.c.com']
+    assert [cookie['cookie_flag'] for cookie in cookies] == ['Secure', 'HttpOnly', 'Secure; HttpOnly']
+    assert cookies[2]['path'] == '/c'
+    assert cookies[2]['expiry_date'] == 'Mon, 01 Jan 2001'
+
+
+def test_read_cookie_file_concurrent_pages():
+    from concurrent.futures import ThreadPoolExecutor
+
+    pages = [_build_page([_build_cookie(f'.site{page}.com', f'cookie{index}', '/', str(index))
+                          for index in range(3)])
+             for page in range(6)]
+    file_name = _write_temp_file(_build_cookie_file(pages))
+
+    with PyCookieParser(file_name) as parser:
+        expected = parser.read_cookie_file()
+        with_processes = parser.read_cookie_file(workers=2)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            with_threads = parser.read_cookie_file(executor=executor)
+    os.remove(file_name)
+
+    assert len(expected) == 18
+    assert with_processes == expected
+    assert with_threads == expected
+    assert expected[3]['url'] == '.site1.com'
+
+
+def test_read_cookie_file_mmap():
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with PyCookieParser(cookie_file) as parser:
+        expected = parser.read_cookie_file()
+
+    with PyCookieParser(cookie_file, mmap=True) as parser:
+        cookies = parser.read_cookie_file()
+
+    parser = PyCookieParser(cookie_file)
+    parser.open_file(mmap=True)
+    cookies_open_file = parser.read_cookie_file()
+    parser.close_file()
+
+    assert cookies == expected
+    assert cookies_open_file == expected
+    assert parser._buffer is None
+
+
+def test_read_cookie_file_mmap_empty_file():
+    file_name = _write_temp_file(b'')
+
+    with PyCookieParser(file_name, mmap=True) as parser:
+        cookies = parser.read_cookie_file(silent=True)
+    os.remove(file_name)
+
+    assert cookies is None
+
+
+def test_iter_cookies():
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with PyCookieParser(cookie_file) as parser:
+        expected = parser.read_cookie_file()
+        cookies = parser.iter_cookies()
+        assert not isinstance(cookies, list)
+        assert list(cookies) == expected
+
+
+def test_iter_cookies_invalid_format(capsys):
+    file_name = _write_temp_file(b'invalid_data')
+
+    with PyCookieParser(file_name) as parser:
+        assert list(parser.iter_cookies()) == []
+    os.remove(file_name)
+
+    captured = capsys.readouterr()
+    assert 'is not a binary cookie file' in captured.out
+
+
+def test_read_cookie_file_as_record():
+    data = _build_cookie_file([
+        _build_page([_build_cookie('.a.com', 'first', '/', '1', flag=1, expiry=86400.0, create=0.5)]),
+    ])
+    file_name = _write_temp_file(data)
+
+    with PyCookieParser(file_name) as parser:
+        expected = parser.read_cookie_file()
+        records = parser.read_cookie_file(as_record=True)
+        assert list(parser.iter_cookies(as_record=True)) == records
+        assert parser.read_cookie_file(workers=2, as_record=True) == records
+    os.remove(file_name)
+
+    record = records[0]
+    assert isinstance(record, Cookie)
+    assert not hasattr(record, '__dict__')
+    assert record.to_dict() == expected[0]
+    assert record['name'] == 'first'
+    assert record.get('missing', 'default') == 'default'
+    assert record.flag == 1
+    assert record.expiry_date_epoch == 86400.0 + 978307200
+    assert record.create_date_epoch == 0.5 + 978307200
+    assert record.offset == 16
+    assert record.url_offset == 56
+    assert record.name_offset == 63
+
+
+def test_cookie_record_summary_and_write():
+    records = [Cookie(**cookie) for cookie in _create_sample_cookies()]
+    summary = PyCookieParser.summarize_cookies(records)
+    assert summary == PyCookieParser.summarize_cookies(_create_sample_cookies())
+
+    with TemporaryDirectory() as tmpdir:
+        PyCookieParser("dummy").write_results(records, 'csv', tmpdir, 'testfile')
+        with open(os.path.join(tmpdir, 'testfile-parsed.csv'), 'r') as f:
+            rows = list(csv.reader(f))
+
+    assert rows[1][0] == 'session_id'
+
+    with TemporaryDirectory() as tmpdir:
+        PyCookieParser("dummy").write_results(records, 'json', tmpdir, 'testfile')
+        with open(os.path.join(tmpdir, 'testfile-parsed.json'), 'r') as f:
+            assert json.load(f) == _create_sample_cookies()
+
+
+def test_read_cookie_file_lazy():
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with PyCookieParser(cookie_file) as parser:
+        expected = parser.read_cookie_file(as_record=True)
+        cookies = parser.read_cookie_file(lazy=True)
+        iterated = list(parser.iter_cookies(lazy=True))
+
+    cookie = cookies[0]
+    assert isinstance(cookie, LazyCookie)
+    # only the fixed-size fields are set before the strings are accessed
+    with pytest.raises(AttributeError):
+        Cookie.__dict__['name'].__get__(cookie, Cookie)
+
+    assert cookie.cookie_flag == expected[0].cookie_flag
+    assert cookie.name == expected[0].name
+    assert Cookie.__dict__['name'].__get__(cookie, Cookie) == expected[0].name
+    assert cookies == expected
+    assert iterated == expected
+    assert [lazy_cookie.to_dict() for lazy_cookie in cookies] == [record.to_dict() for record in expected]
+
+
+def test_read_cookie_table():
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with PyCookieParser(cookie_file) as parser:
+        expected = parser.read_cookie_file()
+        table = parser.read_cookie_table(source='device1')
+
+    assert isinstance(table, CookieTable)
+    assert len(table) == 12
+    assert list(table) == expected
+    assert table.column('url') == [cookie['url'] for cookie in expected]
+    assert table.column('source') == ['device1'] * 12
+    assert len(table.categories('url')) == len(set(table.column('url')))
+    assert len(table.codes('url')) == 12
+    summary = PyCookieParser.summarize_cookies(table)
+    assert summary.pop('files') == {'device1': 12}
+    expected_summary = PyCookieParser.summarize_cookies(expected)
+    assert expected_summary.pop('files') == {}
+    assert summary == expected_summary
+
+
+def test_cookie_table_filter_and_group():
+    table = CookieTable()
+    table.append('a', '1', '.example.com', '/', 'Secure', 1, 100.0, 10.0)
+    table.append('b', '2', '.other.com', '/', '', 0, 200.0, 20.0)
+    table.append('c', '3', '.example.com', '/x', 'HttpOnly', 4, 300.0, 30.0)
+
+    assert table.filter(url='.example.com').name == ['a', 'c']
+    assert table.filter(url='.example.com', flag=4).name == ['c']
+    assert table.filter(url='.missing.com').name == []
+    assert table.filter(expires_after=150.0, expires_before=300.0).name == ['b']
+    assert table.count_by('url') == {'.example.com': 2, '.other.com': 1}
+    assert table.group_by('url') == {'.example.com': [0, 2], '.other.com': [1]}
+    assert list(table.rows(('name', 'path'))) == [('a', '/'), ('b', '/'), ('c', '/x')]
+
+    merged = CookieTable()
+    merged.append('d', '4', '.other.com', '/', '', 0, 400.0, 40.0)
+    merged.extend(table, source='device2')
+    assert merged.column('url') == ['.other.com', '.example.com', '.other.com', '.example.com']
+    assert merged.column('source') == ['', 'device2', 'device2', 'device2']
+
+
 def test_read_cookie_file_invalid_file():
     parser = PyCookieParser("non_existent_file")
     cookies = parser.read_cookie_file()
@@ -79,6 +345,51 @@ def test_read_null_terminated_string():
     os.remove(f.name)
 
 
+def test_read_null_terminated_string_multibyte():
+    file_name = _write_temp_file('café\x00ok\x00'.encode('utf-8'))
+
+    parser = PyCookieParser(file_name)
+    parser.open_file()
+    assert parser._read_null_terminated_string() == 'café'
+    assert parser._read_null_terminated_string() == 'ok'
+    parser.close_file()
+    os.remove(file_name)
+
+
+def test_read_cookie_long_and_multibyte_values():
+    long_value = 'x' * 8192
+    data = _build_cookie_file([
+        _build_page([_build_cookie('.example.com', 'tracker', '/', long_value),
+                     _build_cookie('.example.jp', '名前', '/パス', '値')]),
+    ])
+    file_name = _write_temp_file(data)
+
+    with PyCookieParser(file_name) as parser:
+        cookies = parser.read_cookie_file()
+    os.remove(file_name)
+
+    assert cookies[0]['value'] == long_value
+    assert cookies[1]['name'] == '名前'
+    assert cookies[1]['path'] == '/パス'
+    assert cookies[1]['value'] == '値'
+
+
+def test_read_cookie_encoding_errors():
+    record = _build_cookie('.example.com', 'name', '/', 'v')
+    # replace the value with an invalid UTF-8 byte
+    record = record[:-2] + b'\xff\x00'
+    file_name = _write_temp_file(_build_cookie_file([_build_page([record])]))
+
+    with PyCookieParser(file_name) as parser:
+        assert parser.read_cookie_file(silent=True) is None
+
+    with PyCookieParser(file_name, encoding_errors='replace') as parser:
+        cookies = parser.read_cookie_file()
+    os.remove(file_name)
+
+    assert cookies[0]['value'] == '\ufffd'
+
+
 def test_read_page_sizes():
     with NamedTemporaryFile(delete=False) as f:
         # Write 3 page sizes as big-endian integers
@@ -147,6 +458,47 @@ def test_read_chunk_double():
     assert chunk == 1.23
     os.remove(f.name)
 
+# Test: Date formatting
+
+def test_format_date():
+    epoch = 978307200 + 8 * 3600 + 30 * 60 + 15.75
+    assert _format_date(epoch) == strftime("%a, %d %b %Y ", gmtime(epoch))[:-1]
+    assert _format_date(epoch) == 'Mon, 01 Jan 2001'
+    assert _format_date(epoch, 'iso') == '2001-01-01T08:30:15Z'
+    assert _format_date(-1.0, 'iso') == '1969-12-31T23:59:59Z'
+
+
+def test_format_date_cache():
+    _format_day.cache_clear()
+    for hour in range(24):
+        _format_date(978307200 + hour * 3600)
+
+    info = _format_day.cache_info()
+    assert info.misses == 1
+    assert info.hits == 23
+
+
+def test_read_cookie_file_date_format():
+    data = _build_cookie_file([
+        _build_page([_build_cookie('.a.com', 'first', '/', '1', expiry=3600.5, create=60.0)]),
+    ])
+    file_name = _write_temp_file(data)
+
+    with PyCookieParser(file_name, date_format='iso') as parser:
+        cookies = parser.read_cookie_file()
+        records = parser.read_cookie_file(as_record=True)
+        lazy_cookies = parser.read_cookie_file(lazy=True)
+        table = parser.read_cookie_table()
+    os.remove(file_name)
+
+    assert cookies[0]['expiry_date'] == '2001-01-01T01:00:00Z'
+    assert cookies[0]['create_date'] == '2001-01-01T00:01:00Z'
+    assert records[0].expiry_date_mac == 3600.5
+    assert records[0].create_date_mac == 60.0
+    assert records[0].expiry_date_epoch == 978307200 + 3600.5
+    assert lazy_cookies[0] == records[0]
+    assert list(table) == cookies
+
 # Test: File open/close errors
 
 def test_open_file_ioerror(capsys):
@@ -241,6 +593,218 @@ def test_write_results_txt():
         assert 'tracker=xyz789' in lines[1]
 
 
+def test_write_results_jsonl_gzip():
+    import gzip
+    cookies = _create_sample_cookies()
+
+    with TemporaryDirectory() as tmpdir:
+        parser = PyCookieParser("dummy")
+        parser.write_results(iter(cookies), 'jsonl', tmpdir, 'testfile', compression='gzip')
+
+        output_file = os.path.join(tmpdir, 'testfile-parsed.jsonl.gz')
+        with gzip.open(output_file, 'rt') as f:
+            loaded = [json.loads(line) for line in f]
+
+    assert loaded == cookies
+
+
+def test_writers_stream_in_batches():
+    cookies = _create_sample_cookies() * 5
+
+    with TemporaryDirectory() as tmpdir:
+        for writer_class in (JsonWriter, JsonLinesWriter, CsvWriter, TxtWriter):
+            file_name = os.path.join(tmpdir, 'cookies' + writer_class.extension)
+            with writer_class(file_name, batch_size=3) as writer:
+                assert writer.write(cookie for cookie in cookies[:4]) == 4
+                assert writer.write(cookies[4:]) == 6
+            assert writer.count == 10
+
+            with open(file_name, 'r') as f:
+                content = f.read()
+
+            if writer_class is JsonWriter:
+                assert content == json.dumps(cookies, indent=4)
+            elif writer_class is JsonLinesWriter:
+                assert [json.loads(line) for line in content.splitlines()] == cookies
+            elif writer_class is CsvWriter:
+                assert len(list(csv.reader(content.splitlines()))) == 11
+            else:
+                assert len(content.splitlines()) == 10
+
+
+def test_writers_include_source():
+    cookies = _create_sample_cookies()
+    records = [Cookie(**cookie) for cookie in cookies]
+
+    with TemporaryDirectory() as tmpdir:
+        jsonl_file = os.path.join(tmpdir, 'batch.jsonl')
+        with JsonLinesWriter(jsonl_file, include_source=True) as writer:
+            writer.write(cookies, source='device1/cookies')
+            writer.write(records, source='device2/cookies')
+
+        with open(jsonl_file, 'r') as f:
+            loaded = [json.loads(line) for line in f]
+
+        csv_file = os.path.join(tmpdir, 'batch.csv')
+        with CsvWriter(csv_file, include_source=True) as writer:
+            writer.write(cookies, source='device1/cookies')
+
+        with open(csv_file, 'r') as f:
+            rows = list(csv.reader(f))
+
+    assert [cookie['source'] for cookie in loaded] == ['device1/cookies'] * 2 + ['device2/cookies'] * 2
+    assert {key: loaded[2][key] for key in cookies[0]} == cookies[0]
+    assert 'source' not in cookies[0]
+    assert rows[0][-1] == 'source'
+    assert rows[1][-1] == 'device1/cookies'
+
+
+def test_writers_fields():
+    import sqlite3
+    cookies = _create_sample_cookies()
+    records = [Cookie(**cookie) for cookie in cookies]
+    fields = ('url', 'name')
+
+    with TemporaryDirectory() as tmpdir:
+        parser = PyCookieParser("dummy")
+        for output_type in ('json', 'jsonl', 'csv', 'txt', 'sqlite'):
+            parser.write_results(records, output_type, tmpdir, 'testfile', fields=fields)
+
+        with open(os.path.join(tmpdir, 'testfile-parsed.json'), 'r') as f:
+            assert json.load(f) == [{'url': '.example.com', 'name': 'session_id'},
+                                    {'url': '.tracker.com', 'name': 'tracker'}]
+
+        with open(os.path.join(tmpdir, 'testfile-parsed.jsonl'), 'r') as f:
+            assert [list(json.loads(line)) for line in f] == [['url', 'name']] * 2
+
+        with open(os.path.join(tmpdir, 'testfile-parsed.csv'), 'r') as f:
+            assert list(csv.reader(f)) == [['url', 'name'], ['.example.com', 'session_id'], ['.tracker.com', 'tracker']]
+
+        with open(os.path.join(tmpdir, 'testfile-parsed.txt'), 'r') as f:
+            assert f.readline() == 'Cookie: domain=.example.com; name=session_id\n'
+
+        connection = sqlite3.connect(os.path.join(tmpdir, 'testfile-parsed.sqlite'))
+        rows = connection.execute('SELECT name, value, url, source FROM cookies ORDER BY id').fetchall()
+        connection.close()
+        assert rows[0] == ('session_id', None, '.example.com', 'testfile')
+
+        jsonl_file = os.path.join(tmpdir, 'batch.jsonl')
+        with JsonLinesWriter(jsonl_file, include_source=True, fields=('cookie_flag',)) as writer:
+            writer.write(cookies, source='device1/cookies')
+
+        with open(jsonl_file, 'r') as f:
+            assert json.loads(f.readline()) == {'cookie_flag': 'Secure', 'source': 'device1/cookies'}
+
+        with TxtWriter(os.path.join(tmpdir, 'flags.txt'), fields=('name', 'cookie_flag')) as writer:
+            writer.write(cookies)
+
+        with open(os.path.join(tmpdir, 'flags.txt'), 'r') as f:
+            assert f.readline() == 'Cookie: name=session_id; Secure\n'
+
+    with pytest.raises(ValueError):
+        CsvWriter('cookies.csv', fields=('url', 'domain'))
+
+
+def test_writers_cookie_table(monkeypatch):
+    import sqlite3
+    with PyCookieParser('tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c') as parser:
+        table = parser.read_cookie_table()
+    cookies = list(table)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('a row was built as a dictionary')
+
+    with TemporaryDirectory() as tmpdir:
+        for writer_class in (CsvWriter, TxtWriter):
+            for options in ({}, {'include_source': True, 'fields': ('cookie_flag', 'url')}):
+                expected_file = os.path.join(tmpdir, 'expected' + writer_class.extension)
+                with writer_class(expected_file, **options) as writer:
+                    writer.write(cookies, source='device1')
+
+                table_file = os.path.join(tmpdir, 'table' + writer_class.extension)
+                with monkeypatch.context() as patch:
+                    patch.setattr(CookieTable, 'row', fail)
+                    with writer_class(table_file, batch_size=5, **options) as writer:
+                        assert writer.write(table, source='device1') == len(table)
+
+                with open(expected_file, 'r') as f, open(table_file, 'r') as g:
+                    assert g.read() == f.read()
+
+        sqlite_file = os.path.join(tmpdir, 'table.sqlite')
+        monkeypatch.setattr(CookieTable, 'row', fail)
+        with SqliteWriter(sqlite_file) as writer:
+            writer.write(table, source='device1')
+
+        connection = sqlite3.connect(sqlite_file)
+        rows = connection.execute('SELECT name, url, expiry_date, expiry_date_epoch, create_date_epoch, source '
+                                  'FROM cookies ORDER BY id').fetchall()
+        connection.close()
+
+    # the epoch columns of a table are exact
+    assert rows == [(cookie['name'], cookie['url'], cookie['expiry_date'], expiry, create, 'device1')
+                    for cookie, expiry, create in zip(cookies, table.expiry_date_epoch, table.create_date_epoch)]
+
+
+def test_json_writer_empty():
+    with TemporaryDirectory() as tmpdir:
+        file_name = os.path.join(tmpdir, 'cookies.json')
+        with JsonWriter(file_name) as writer:
+            writer.write([])
+
+        with open(file_name, 'r') as f:
+            assert json.load(f) == []
+
+
+def test_writer_invalid_compression():
+    with TemporaryDirectory() as tmpdir:
+        with pytest.raises(ValueError):
+            JsonWriter(os.path.join(tmpdir, 'cookies.json'), compression='rar').open()
+
+
+def test_write_results_sqlite():
+    import sqlite3
+    cookies = _create_sample_cookies()
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with PyCookieParser(cookie_file) as parser:
+        records = parser.read_cookie_file(as_record=True)
+
+    with TemporaryDirectory() as tmpdir:
+        parser = PyCookieParser("dummy")
+        parser.write_results(cookies, 'sqlite', tmpdir, 'testfile')
+        # a second write appends to the same database
+        parser.write_results(records, 'sqlite', tmpdir, 'testfile')
+
+        connection = sqlite3.connect(os.path.join(tmpdir, 'testfile-parsed.sqlite'))
+        rows = connection.execute('SELECT name, url, source, expiry_date_epoch FROM cookies ORDER BY id').fetchall()
+        indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        connection.close()
+
+    assert len(rows) == 14
+    # the expiry of a dictionary is parsed from its day string
+    assert rows[0] == ('session_id', '.example.com', 'testfile', 1893456000)
+    assert rows[2][3] == records[0].expiry_date_epoch
+    assert {'cookies_url', 'cookies_name', 'cookies_expiry_date_epoch', 'cookies_source'} <= indexes
+
+    with PyCookieParser(cookie_file, date_format='iso') as parser:
+        cookies = parser.read_cookie_file()
+
+    with TemporaryDirectory() as tmpdir:
+        parser.write_results(cookies, 'sqlite', tmpdir, 'testfile')
+        connection = sqlite3.connect(os.path.join(tmpdir, 'testfile-parsed.sqlite'))
+        rows = connection.execute('SELECT expiry_date_epoch, create_date_epoch FROM cookies ORDER BY id').fetchall()
+        connection.close()
+
+    # ISO-8601 dates keep the time of day
+    assert rows == [(record.expiry_date_epoch, record.create_date_epoch) for record in records]
+
+
+def test_sqlite_writer_compression():
+    with TemporaryDirectory() as tmpdir:
+        with pytest.raises(ValueError):
+            SqliteWriter(os.path.join(tmpdir, 'cookies.sqlite'), compression='gzip').open()
+
+
 def test_write_results_invalid_type(capsys):
     cookies = _create_sample_cookies()
 
@@ -251,6 +815,20 @@ def test_write_results_invalid_type(capsys):
         captured = capsys.readouterr()
         assert 'Output file type is not supported' in captured.out
 
+
+def test_write_results_outside_output_path(capsys):
+    cookies = _create_sample_cookies()
+
+    with TemporaryDirectory() as tmpdir:
+        output_path = os.path.join(tmpdir, 'out')
+        parser = PyCookieParser("dummy")
+        parser.write_results(cookies, 'txt', output_path, '../escaped')
+        parser.write_results(cookies, 'txt', output_path, os.path.join(tmpdir, 'escaped'))
+
+        assert os.listdir(tmpdir) == []
+        captured = capsys.readouterr()
+        assert captured.out.count('Output file would be outside the output path') == 2
+
 # Test: Context manager
 
 def test_context_manager():
@@ -302,6 +880,14 @@ def test_summarize_cookies_none():
     assert summary['total_cookies'] == 0
 
 
+def test_summarize_cookies_generator():
+    cookies = _create_sample_cookies()
+    summary = PyCookieParser.summarize_cookies(cookie for cookie in cookies)
+
+    assert summary == PyCookieParser.summarize_cookies(cookies)
+    assert summary['total_cookies'] == 2
+
+
 def test_summarize_cookies_same_domain():
     cookies = [
         {'name': 'a', 'value': '1', 'url': '.example.com', 'path': '/', 'expiry_date': '', 'create_date': '', 'cookie_flag': 'Secure'},
@@ -317,6 +903,103 @@ def test_summarize_cookies_same_domain():
 
 # Test: Batch processing
 
+def test_cookie_summary():
+    cookies = _create_sample_cookies()
+    summary = CookieSummary()
+    summary.update(cookies[:1], source='a')
+    for cookie in cookies[1:]:
+        summary.add(cookie, source='b')
+    result = summary.to_dict()
+
+    assert result == dict(PyCookieParser.summarize_cookies(cookies), files={'a': 1, 'b': len(cookies) - 1})
+    assert result['secure_ratio'] == 0.5
+    assert result['http_only_ratio'] == 0.5
+    assert result['expiry_histogram'] == {2030: 2}
+    assert result['domain_flags']['.example.com'] == {'cookies': 1, 'secure_ratio': 1.0, 'http_only_ratio': 0.0}
+
+
+def test_cookie_summary_merge():
+    import pickle
+    cookies = _create_sample_cookies()
+    first = CookieSummary().update(cookies, source='a')
+    second = pickle.loads(pickle.dumps(CookieSummary().update(cookies, source='b')))
+
+    merged = first.merge(second).to_dict()
+    assert merged['total_cookies'] == 2 * len(cookies)
+    assert merged['files'] == {'a': len(cookies), 'b': len(cookies)}
+    assert merged['top_domains'] == [(cookie['url'], 2) for cookie in cookies]
+    assert merged['domain_flags']['.example.com']['cookies'] == 2
+
+    with pytest.raises(ValueError):
+        CookieSummary().merge(CookieSummary(approximate=True))
+
+
+def test_cookie_summary_approximate():
+    cookies = [{'url': f'domain{index}.com', 'cookie_flag': 'Secure', 'expiry_date': 'Mon, 01 Jan 2001'}
+               for index in range(5000)]
+    cookies += [{'url': 'heavy.com', 'cookie_flag': '', 'expiry_date': 'Mon, 01 Jan 2001'}] * 500
+
+    first = CookieSummary(approximate=True, top_k=1).update(cookies[:3000])
+    second = CookieSummary(approximate=True, top_k=1).update(cookies[3000:])
+    summary = first.merge(second).to_dict()
+
+    assert summary['total_cookies'] == 5500
+    assert abs(summary['unique_domains'] - 5001) < 5001 * 0.03
+    assert summary['top_domains'][0][0] == 'heavy.com'
+    assert summary['domain_flags'] == {}
+    assert summary['expiry_histogram'] == {2001: 5500}
+    assert PyCookieParser.summarize_cookies([], approximate=True)['unique_domains'] == 0
+
+
+def test_cookie_index():
+    def cookie(url, name):
+        return {'name': name, 'value': '', 'url': url, 'path': '/', 'expiry_date': '', 'create_date': '',
+                'cookie_flag': ''}
+
+    google = cookie('.google.com', 'SID')
+    mail = cookie('mail.google.com', 'SID')
+    other = cookie('.google.com', 'NID')
+    notgoogle = cookie('.notgoogle.com', 'SID')
+
+    index = CookieIndex()
+    index.update([google, notgoogle], source='device1')
+    index.update([mail, other], source='device2')
+
+    assert len(index) == 4
+    assert index.find(domain='.google.com') == [google, mail, other]
+    assert index.find(domain='GOOGLE.com', name='SID') == [google, mail]
+    assert index.find(domain='*.google.com') == [mail]
+    assert index.find(domain='com') == [google, notgoogle, mail, other]
+    assert index.find(domain='example.com') == []
+    assert index.find(name='SID', source='device1') == [google, notgoogle]
+    assert index.find_with_sources(name='NID') == [('device2', other)]
+    assert index.sources(domain='.google.com', name='SID') == ['device1', 'device2']
+    assert index.find() == [google, notgoogle, mail, other]
+
+    with TemporaryDirectory() as tmpdir:
+        index_path = os.path.join(tmpdir, 'cookies.index')
+        index.save(index_path)
+        loaded = CookieIndex.load(index_path)
+        assert loaded.find(domain='google.com', name='SID') == [google, mail]
+
+        with open(index_path, 'wb') as f:
+            import pickle
+            pickle.dump({'not': 'an index'}, f)
+        with pytest.raises(ValueError):
+            CookieIndex.load(index_path)
+
+
+def test_cookie_index_records():
+    with PyCookieParser('tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c') as parser:
+        records = parser.read_cookie_file(as_record=True)
+
+    index = CookieIndex().update(records, source='device')
+    domain = records[0].url.lstrip('.').lower()
+    expected = [record for record in records
+                if record.url.lstrip('.').lower() == domain or record.url.lower().endswith('.' + domain)]
+    assert expected and index.find(domain=domain) == expected
+
+
 def test_batch_processing():
     cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
 
@@ -333,6 +1016,510 @@ def test_batch_processing():
         assert len(results['cookie_file_1']) == 12
 
 
+def test_iter_batch_processing():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'cookie_file_1'))
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'cookie_file_2'))
+        with open(os.path.join(tmpdir, 'invalid_file.txt'), 'w') as f:
+            f.write('this is not a cookie file')
+
+        results = PyCookieParser.iter_batch_process(tmpdir)
+        assert not isinstance(results, dict)
+
+        results = dict(results)
+        assert sorted(results) == ['cookie_file_1', 'cookie_file_2']
+        assert results == PyCookieParser.batch_process(tmpdir)
+
+
+def test_batch_processing_workers():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        for index in range(5):
+            shutil.copy2(cookie_file_src, os.path.join(tmpdir, f'cookie_file_{index}'))
+        with open(os.path.join(tmpdir, 'invalid_file.txt'), 'w') as f:
+            f.write('this is not a cookie file')
+
+        expected = list(PyCookieParser.iter_batch_process(tmpdir))
+        results = list(PyCookieParser.iter_batch_process(tmpdir, workers=2))
+
+        assert results == expected
+        assert len(results) == 5
+        assert PyCookieParser.batch_process(tmpdir, workers=2) == dict(expected)
+
+
+def test_batch_processing_cache():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        data_dir = os.path.join(tmpdir, 'data')
+        os.mkdir(data_dir)
+        shutil.copy2(cookie_file_src, os.path.join(data_dir, 'cookie_file_1'))
+        shutil.copy2(cookie_file_src, os.path.join(data_dir, 'cookie_file_2'))
+        with open(os.path.join(data_dir, 'invalid_file.txt'), 'w') as f:
+            f.write('this is not a cookie file')
+        expected = PyCookieParser.batch_process(data_dir)
+
+        with ParseCache(os.path.join(tmpdir, 'cache.sqlite')) as cache:
+            assert PyCookieParser.batch_process(data_dir, cache=cache) == expected
+            # the second copy is found by content, and the invalid file is filtered out before the cache
+            assert (cache.hits, cache.misses) == (1, 1)
+
+        with ParseCache(os.path.join(tmpdir, 'cache.sqlite')) as cache:
+            assert PyCookieParser.batch_process(data_dir, workers=2, cache=cache) == expected
+            assert (cache.hits, cache.misses) == (2, 0)
+
+            # other parse options are cached separately
+            PyCookieParser.batch_process(data_dir, date_format='iso', cache=cache)
+            assert cache.misses == 1
+
+            os.remove(os.path.join(data_dir, 'cookie_file_2'))
+            shutil.copy2(os.path.join(data_dir, 'invalid_file.txt'), os.path.join(data_dir, 'cookie_file_2'))
+            results = PyCookieParser.batch_process(data_dir, cache=cache)
+            assert sorted(results) == ['cookie_file_1']
+
+
+def test_parse_cache_eviction():
+    with TemporaryDirectory() as tmpdir:
+        with ParseCache(os.path.join(tmpdir, 'cache.sqlite'), max_size=150) as cache:
+            cache.put('a', b'a' * 40)
+            cache.put('b', b'b' * 40)
+            assert cache.get('a') == b'a' * 40
+            cache.put('c', b'c' * 40)
+
+            # 'b' is the least recently used entry
+            assert cache.get('b') is None
+            assert cache.get('a') == b'a' * 40
+            assert cache.get('c') == b'c' * 40
+            assert cache.size() <= 150
+
+            # replacing an entry does not count it twice
+            size = cache.size()
+            cache.put('c', b'c' * 40)
+            assert cache.size() == size
+
+            # a result larger than the cache is not stored, and does not evict the others
+            cache.put('d', b'd' * 200)
+            assert cache.get('d') is None
+            assert cache.get('a') == b'a' * 40
+            assert cache.size() == size
+
+        with ParseCache(os.path.join(tmpdir, 'cache.sqlite'), max_size=150) as cache:
+            assert cache.size() == size
+
+
+def test_memory_cache():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    cache = MemoryCache()
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        cookie_file = os.path.join(tmpdir, 'cookie_file')
+        shutil.copy2(cookie_file_src, cookie_file)
+
+        with PyCookieParser(cookie_file, cache=cache) as parser:
+            expected = parser.read_cookie_file()
+        assert (cache.hits, cache.misses) == (0, 1)
+
+        # a hit does not need an opened file
+        assert PyCookieParser(cookie_file, cache=cache).read_cookie_file() == expected
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        with PyCookieParser(cookie_file, cache=cache) as parser:
+            records = parser.read_cookie_file(as_record=True)
+        assert [record.to_dict() for record in records] == expected
+        assert cache.misses == 2 and len(cache) == 2
+
+        # the cached cookies are not shared with callers
+        expected[0]['name'] = records[0].name = 'modified'
+        cookies = PyCookieParser(cookie_file, cache=cache).read_cookie_file()
+        assert cookies[0]['name'] != 'modified'
+        cookies[0]['name'] = 'modified'
+        assert PyCookieParser(cookie_file, cache=cache).read_cookie_file()[0]['name'] != 'modified'
+        assert PyCookieParser(cookie_file, cache=cache).read_cookie_file(as_record=True)[0].name != 'modified'
+
+        # a changed file is parsed again
+        with open(cookie_file, 'w') as f:
+            f.write('this is not a cookie file')
+        with PyCookieParser(cookie_file, cache=cache) as parser:
+            assert parser.read_cookie_file(silent=True) is None
+        assert cache.misses == 3
+
+
+def test_memory_cache_eviction():
+    cache = MemoryCache(max_entries=2)
+    cache.put('a', [{'name': 'a'}])
+    cache.put('b', [{'name': 'b'}])
+    assert cache.get('a') == [{'name': 'a'}]
+    cache.put('c', [{'name': 'c'}])
+
+    assert cache.get('b') is None
+    assert len(cache) == 2 and cache.evictions == 1
+
+    size = MemoryCache._result_size([{'name': 'a'}])
+    cache = MemoryCache(max_bytes=size)
+    cache.put('a', [{'name': 'a'}])
+    cache.put('b', [{'name': 'b'}])
+    assert cache.get('a') is None
+    assert cache.get('b') == [{'name': 'b'}]
+    assert cache.size() <= size
+
+
+def test_async_read_cookie_file():
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    with PyCookieParser(cookie_file) as parser:
+        expected = parser.read_cookie_file()
+
+    async def read():
+        parser = AsyncPyCookieParser(cookie_file)
+        cookies = await parser.read_cookie_file()
+        streamed = [cookie async for cookie in parser.iter_cookies()]
+        records = [cookie async for cookie in parser.iter_cookies(as_record=True)]
+        return cookies, streamed, records
+
+    cookies, streamed, records = asyncio.run(read())
+    assert cookies == expected
+    assert streamed == expected
+    assert [record.to_dict() for record in records] == expected
+
+
+def test_async_read_invalid_file(capsys):
+    async def read():
+        parser = AsyncPyCookieParser('tests/test_pycookieparser.py')
+        return await parser.read_cookie_file(silent=True), [cookie async for cookie in parser.iter_cookies()]
+
+    assert asyncio.run(read()) == (None, [])
+    assert 'is not a binary cookie file' in capsys.readouterr().out
+
+
+def test_async_iter_cookies_truncated_file(capsys):
+    with open('tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c', 'rb') as f:
+        content = f.read()
+
+    with TemporaryDirectory() as tmpdir:
+        cookie_file = os.path.join(tmpdir, 'cookie_file')
+
+        async def read():
+            return [cookie async for cookie in AsyncPyCookieParser(cookie_file).iter_cookies()]
+
+        # a truncated page table
+        with open(cookie_file, 'wb') as f:
+            f.write(b'cook' + pack('>i', 100) + bytes(20))
+        assert asyncio.run(read()) == []
+        assert 'Failed to read the cookie file:' in capsys.readouterr().out
+
+        # pages cut short, after the cookies of the complete pages
+        with open(cookie_file, 'wb') as f:
+            f.write(content[:len(content) // 2])
+        with PyCookieParser(cookie_file) as parser:
+            expected = list(parser.iter_cookies())
+        assert asyncio.run(read()) == expected
+        assert capsys.readouterr().out.count('Failed to read the cookie file:') == 2
+
+
+def test_async_batch_processing():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        for index in range(5):
+            shutil.copy2(cookie_file_src, os.path.join(tmpdir, f'cookie_file_{index}'))
+        with open(os.path.join(tmpdir, 'invalid_file.txt'), 'w') as f:
+            f.write('this is not a cookie file')
+        expected = list(PyCookieParser.iter_batch_process(tmpdir))
+
+        async def process():
+            streamed = [item async for item in AsyncPyCookieParser.iter_batch_process(tmpdir, concurrency=2)]
+            return streamed, await AsyncPyCookieParser.batch_process(tmpdir, semaphore=asyncio.Semaphore(1))
+
+        streamed, results = asyncio.run(process())
+        assert streamed == expected
+        assert results == dict(expected)
+
+
+def test_batch_processing_archives():
+    import tarfile
+    import zipfile
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    with PyCookieParser(cookie_file) as parser:
+        expected = parser.read_cookie_file()
+
+    with TemporaryDirectory() as tmpdir:
+        zip_path = os.path.join(tmpdir, 'evidence.zip')
+        with zipfile.ZipFile(zip_path, 'w') as zip_file:
+            zip_file.write(cookie_file, 'Library/Cookies/Cookies.binarycookies')
+            zip_file.writestr('notes.txt', 'this is not a cookie file')
+        with tarfile.open(os.path.join(tmpdir, 'evidence.tar.gz'), 'w:gz') as tar_file:
+            tar_file.add(cookie_file, 'cookies/a')
+            tar_file.add(cookie_file, 'cookies/b')
+
+        assert PyCookieParser.batch_process(zip_path) == {'Library/Cookies/Cookies.binarycookies': expected}
+
+        results = PyCookieParser.batch_process(tmpdir)
+        assert sorted(results) == ['evidence.tar.gz/cookies/a', 'evidence.tar.gz/cookies/b',
+                                   'evidence.zip/Library/Cookies/Cookies.binarycookies']
+        assert all(cookies == expected for cookies in results.values())
+        assert PyCookieParser.batch_process(tmpdir, workers=2) == results
+
+        table = PyCookieParser.batch_process_table(tmpdir)
+        assert len(table) == 3 * len(expected)
+
+
+def test_batch_processing_archive_candidates():
+    import tarfile
+    import zipfile
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    size = os.path.getsize(cookie_file)
+
+    with TemporaryDirectory() as tmpdir:
+        zip_path = os.path.join(tmpdir, 'evidence.zip')
+        with zipfile.ZipFile(zip_path, 'w') as zip_file:
+            zip_file.write(cookie_file, 'cookies')
+            zip_file.writestr('notes.txt', 'this is not a cookie file')
+            zip_file.writestr('large', b'cook' + bytes(size))
+        tar_path = os.path.join(tmpdir, 'evidence.tar.gz')
+        with tarfile.open(tar_path, 'w:gz') as tar_file:
+            tar_file.add(cookie_file, 'cookies')
+            tar_file.add(os.path.join(tmpdir, 'evidence.zip'), 'large')
+
+        # members are only read in full if their listed size fits and their magic matches
+        for archive_path in (zip_path, tar_path):
+            candidate_filter = CandidateFilter(max_size=size)
+            members = list(PyCookieParser._read_archive(archive_path, candidate_filter=candidate_filter))
+            contents = {name: content for name, content, _ in members}
+            assert len(contents['cookies']) == size
+            assert all(len(content) <= 4 for name, content in contents.items() if name != 'cookies')
+
+            results = PyCookieParser.batch_process(archive_path, candidate_filter=candidate_filter)
+            assert list(results) == ['cookies']
+            assert candidate_filter.rejected == len(members) - 1
+
+
+def test_batch_processing_archive_member_names():
+    import tarfile
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with TemporaryDirectory() as tmpdir:
+        tar_path = os.path.join(tmpdir, 'evidence.tar')
+        with tarfile.open(tar_path, 'w') as tar_file:
+            tar_file.add(cookie_file, '../../../escaped_rel')
+            tar_file.add(cookie_file, '/tmp/escaped_abs')
+            tar_file.add(cookie_file, 'C:\\Users\\..\\escaped_drive')
+
+        results = PyCookieParser.batch_process(tar_path)
+        assert list(results) == ['escaped_rel', 'tmp/escaped_abs', 'Users/escaped_drive']
+
+        output_path = os.path.join(tmpdir, 'out', 'a', 'b')
+        for file_name, cookies in results.items():
+            PyCookieParser(file_name).write_results(cookies, 'txt', output_path, file_name)
+        written = sorted(os.path.relpath(os.path.join(root, name), tmpdir)
+                         for root, _, files in os.walk(tmpdir) for name in files)
+        assert written == ['evidence.tar'] + sorted(os.path.join('out', 'a', 'b', name + '-parsed.txt')
+                                                    for name in results)
+
+
+def test_batch_processing_backup():
+    import shutil
+    import sqlite3
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    file_id = '1d6e5b79fb0125ba3b3b2eb55cca0553159164d5'
+
+    with TemporaryDirectory() as tmpdir:
+        backup_dir = os.path.join(tmpdir, 'Backup', '00008030-001A2B3C4D5E6F70')
+        os.makedirs(os.path.join(backup_dir, file_id[:2]))
+        with sqlite3.connect(os.path.join(backup_dir, 'Manifest.db')) as connection:
+            connection.execute('CREATE TABLE Files (fileID TEXT PRIMARY KEY, domain TEXT, relativePath TEXT, '
+                               'flags INTEGER, file BLOB)')
+            connection.executemany('INSERT INTO Files VALUES (?, ?, ?, ?, NULL)', [
+                (file_id, 'AppDomain-com.example.app', 'Library/Cookies/Cookies.binarycookies', 1),
+                ('0' * 40, 'HomeDomain', 'Library/Preferences/com.apple.example.plist', 1),
+            ])
+        connection.close()
+        shutil.copy2(cookie_file, os.path.join(backup_dir, file_id[:2], file_id))
+        # files that are not listed as cookie files are not parsed
+        shutil.copy2(cookie_file, os.path.join(backup_dir, '0' * 40))
+
+        results = PyCookieParser.batch_process(backup_dir)
+        assert list(results) == ['AppDomain-com.example.app/Library/Cookies/Cookies.binarycookies']
+
+        # a backup in a subdirectory is found during the walk, next to other files
+        shutil.copy2(cookie_file, os.path.join(tmpdir, 'cookie_file'))
+        results = PyCookieParser.batch_process(tmpdir)
+        assert sorted(results) == [
+            'Backup/00008030-001A2B3C4D5E6F70/AppDomain-com.example.app/Library/Cookies/Cookies.binarycookies',
+            'cookie_file']
+
+
+def test_candidate_filter():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'Cookies.binarycookies'))
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'cookie_file'))
+        with open(os.path.join(tmpdir, 'invalid_file.txt'), 'w') as f:
+            f.write('this is not a cookie file')
+        with open(os.path.join(tmpdir, 'short_file'), 'wb') as f:
+            f.write(b'coo')
+
+        candidate_filter = CandidateFilter()
+        results = PyCookieParser.batch_process(tmpdir, candidate_filter=candidate_filter)
+        assert sorted(results) == ['Cookies.binarycookies', 'cookie_file']
+        assert (candidate_filter.scanned, candidate_filter.rejected) == (4, 2)
+
+        candidate_filter = CandidateFilter(name_patterns=('*.binarycookies',))
+        results = PyCookieParser.batch_process(tmpdir, workers=2, candidate_filter=candidate_filter)
+        assert sorted(results) == ['Cookies.binarycookies']
+        assert (candidate_filter.scanned, candidate_filter.rejected) == (4, 3)
+
+        candidate_filter = CandidateFilter(max_size=os.path.getsize(cookie_file_src) - 1)
+        assert PyCookieParser.batch_process(tmpdir, candidate_filter=candidate_filter) == {}
+        assert candidate_filter.rejected == 4
+
+    assert CandidateFilter().accepts('cookies', b'cook' + bytes(8))
+    assert not CandidateFilter().accepts('cookies', b'not a cookie file')
+
+
+def test_candidate_filter_known_size(monkeypatch):
+    import pycookieparser.pycookieparser as module
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    size = os.path.getsize(cookie_file)
+    assert CandidateFilter().accepts('cookies', cookie_file, size)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('the file was opened')
+
+    # a size from the directory listing rejects files without opening them
+    monkeypatch.setattr(module, 'open', fail, raising=False)
+    candidate_filter = CandidateFilter(max_size=size - 1)
+    assert not candidate_filter.accepts('cookies', cookie_file, size)
+    assert not candidate_filter.accepts('empty', cookie_file, 0)
+    assert (candidate_filter.scanned, candidate_filter.rejected) == (2, 2)
+
+
+def test_batch_processing_failed_files():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'cookie_file'))
+        # the magic passes the pre-filter, but the page table is truncated
+        with open(os.path.join(tmpdir, 'truncated_file'), 'wb') as f:
+            f.write(b'cook' + pack('>i', 100) + bytes(20))
+
+        for workers in (1, 2):
+            candidate_filter = CandidateFilter()
+            results = PyCookieParser.batch_process(tmpdir, workers=workers, candidate_filter=candidate_filter)
+            assert list(results) == ['cookie_file']
+            assert candidate_filter.failed == ['truncated_file']
+            assert (candidate_filter.scanned, candidate_filter.rejected) == (2, 0)
+
+        candidate_filter = CandidateFilter()
+        results = asyncio.run(AsyncPyCookieParser.batch_process(tmpdir, candidate_filter=candidate_filter))
+        assert list(results) == ['cookie_file']
+        assert candidate_filter.failed == ['truncated_file']
+
+
+def test_cookie_deduplicator():
+    first = _create_sample_cookies()
+    copy = _create_sample_cookies()
+    overlapping = _create_sample_cookies()[:1] + [dict(first[1], create_date='Tue, 02 Jan 2001')]
+
+    deduplicator = CookieDeduplicator()
+    results = list(deduplicator.deduplicate([('a', first), ('b', copy), ('c', overlapping)]))
+
+    assert results == [('a', first), ('c', overlapping[1:])]
+    assert (deduplicator.files_seen, deduplicator.duplicate_files) == (3, 1)
+    assert (deduplicator.cookies_seen, deduplicator.duplicate_cookies) == (len(first) * 2 + 2, len(first) + 1)
+    assert deduplicator.unique_cookies() == first + overlapping[1:]
+    assert deduplicator.provenance(first[0]) == ['a', 'b', 'c']
+    assert deduplicator.provenance(overlapping[1]) == ['c']
+    assert deduplicator.file_duplicates() == {'a': ['b']}
+    assert overlapping[1]['url'] is first[1]['url']
+
+    # without the raw creation time, cookies created on the same day are only merged if all their fields are equal
+    deduplicator = CookieDeduplicator()
+    assert deduplicator.add('a', first[:1]) == first[:1]
+    assert deduplicator.add('b', [dict(first[0], value='other')]) == [dict(first[0], value='other')]
+
+
+def test_cookie_deduplicator_records():
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    with PyCookieParser(cookie_file) as parser:
+        records = parser.read_cookie_file(as_record=True)
+        lazy = parser.read_cookie_file(lazy=True)
+
+    deduplicator = CookieDeduplicator()
+    assert deduplicator.add('records', records) == records
+    assert deduplicator.add('lazy', lazy) is None
+    assert all(deduplicator.provenance(record) == ['records', 'lazy'] for record in records)
+
+    deduplicator = CookieDeduplicator()
+    assert deduplicator.add('lazy', lazy) == lazy
+
+    # records with the same domain, name and path are told apart by their creation time
+    same_day = Cookie(**dict(records[0].to_dict(), value='other'), create_date_epoch=records[0].create_date_epoch + 1)
+    assert deduplicator.add('same_day', [same_day]) == [same_day]
+    assert [cookie.to_dict() for cookie in lazy] == [record.to_dict() for record in records]
+
+
+def test_cookie_deduplicator_file_content():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    with open(cookie_file_src, 'rb') as f:
+        data = f.read()
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'device1'))
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'device2'))
+        # same cookies, different content
+        with open(os.path.join(tmpdir, 'device3'), 'wb') as f:
+            f.write(data + b'\x00')
+
+        deduplicator = CookieDeduplicator()
+        results = PyCookieParser.batch_process(tmpdir, as_record=True, deduplicator=deduplicator)
+        assert sorted(results) == ['device1', 'device3']
+        assert deduplicator.file_duplicates() == {'device1': ['device2']}
+
+        new_cookies = [deduplicator.add(name, results[name]) for name in ('device1', 'device3')]
+        assert [len(cookies) for cookies in new_cookies] == [12, 0]
+        assert (deduplicator.files_seen, deduplicator.duplicate_files, deduplicator.duplicate_cookies) == (3, 1, 12)
+        assert deduplicator.provenance(results['device1'][0]) == ['device1', 'device2', 'device3']
+
+        # files whose cookies were all filtered out are not duplicates of each other
+        deduplicator = CookieDeduplicator()
+        cookie_filter = CookieFilter(domains=('nonexistent.example',))
+        results = PyCookieParser.batch_process(tmpdir, cookie_filter=cookie_filter, deduplicator=deduplicator)
+        assert results == {'device1': [], 'device3': []}
+        assert deduplicator.duplicate_files == 1
+
+    deduplicator = CookieDeduplicator()
+    assert deduplicator.add('a', []) == []
+    assert deduplicator.add('b', []) == []
+    assert deduplicator.duplicate_files == 0
+
+
+def test_batch_processing_table():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'cookie_file_1'))
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'cookie_file_2'))
+
+        table = PyCookieParser.batch_process_table(tmpdir)
+        results = PyCookieParser.batch_process(tmpdir)
+
+    assert len(table) == 24
+    assert list(table) == [cookie for cookies in results.values() for cookie in cookies]
+    assert table.count_by('source') == {'cookie_file_1': 12, 'cookie_file_2': 12}
+
+
 def test_batch_processing_empty_directory():
     with TemporaryDirectory() as tmpdir:
         results = PyCookieParser.batch_process(tmpdir)
@@ -384,6 +1571,219 @@ def test_batch_processing_subdirectories():
         assert len(results[expected_key]) == 12
 
 
+def test_cookie_filter():
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    with PyCookieParser(cookie_file) as parser:
+        cookies = parser.read_cookie_file(cookie_filter=CookieFilter(domains=('google.com',)))
+        assert [cookie['url'] for cookie in cookies] == ['.play.google.com'] * 3 + ['.google.com'] * 2 + ['www.google.com']
+
+        cookies = parser.read_cookie_file(cookie_filter=CookieFilter(domains=('.usedust.com',), names=('_ga', '_gid')))
+        assert [(cookie['url'], cookie['name']) for cookie in cookies] == [('.usedust.com', '_ga'), ('.usedust.com', '_gid')]
+
+        cookies = parser.read_cookie_file(cookie_filter=CookieFilter(domains=('*.usedust.com',)))
+        assert [cookie['url'] for cookie in cookies] == ['www.usedust.com'] * 3
+
+        cookies = parser.read_cookie_file(cookie_filter=CookieFilter(secure=True))
+        assert [cookie['name'] for cookie in cookies] == ['SNID']
+
+        cookies = parser.read_cookie_file(cookie_filter=CookieFilter(http_only=True, secure=False))
+        assert [cookie['name'] for cookie in cookies] == ['NID', '37bb2bda7481ee9b06cc7f37d25a0ee1360f96eb',
+                                                          'laravel_session']
+
+        cookies = parser.read_cookie_file(as_record=True,
+                                          cookie_filter=CookieFilter(expires_after=1566000000, created_before=1503588500))
+        assert [cookie.name for cookie in cookies] == ['_ga']
+
+        expected = parser.read_cookie_file(cookie_filter=CookieFilter(domains=('.google.com',), http_only=True))
+        assert [cookie['name'] for cookie in expected] == ['NID', 'SNID']
+        cookie_filter = CookieFilter(domains=('.google.com',), http_only=True)
+        assert [cookie.name for cookie in parser.read_cookie_file(lazy=True, cookie_filter=cookie_filter)] == ['NID', 'SNID']
+        assert parser.read_cookie_file(workers=2, cookie_filter=cookie_filter) == expected
+        assert list(parser.iter_cookies(cookie_filter=cookie_filter)) == expected
+
+        assert parser.read_cookie_file(cookie_filter=CookieFilter(names=('missing',))) == []
+
+
+def test_read_cookie_file_fields():
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    with PyCookieParser(cookie_file) as parser:
+        expected = parser.read_cookie_file()
+        cookies = parser.read_cookie_file(fields=('url', 'name', 'url'))
+        assert cookies == [{'url': cookie['url'], 'name': cookie['name']} for cookie in expected]
+        assert list(cookies[0]) == ['url', 'name']
+
+        assert parser.read_cookie_file(workers=2, fields=('url', 'name')) == cookies
+        assert list(parser.iter_cookies(fields=('url', 'name'))) == cookies
+
+        records = parser.read_cookie_file(as_record=True, fields=('expiry_date',))
+        assert records[0].expiry_date == expected[0]['expiry_date']
+        assert records[0].name is None and records[0].value is None
+        assert records[0].expiry_date_epoch == 1566660731
+
+        cookie_filter = CookieFilter(domains=('.google.com',), secure=True)
+        assert parser.read_cookie_file(cookie_filter=cookie_filter, fields=('value',)) == [
+            {'value': cookie['value']} for cookie in expected if cookie['name'] == 'SNID']
+
+        with pytest.raises(ValueError):
+            parser.read_cookie_file(fields=('url', 'domain'))
+        with pytest.raises(ValueError):
+            parser.read_cookie_file(fields=())
+
+
+def test_batch_processing_fields():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'device1'))
+
+        with ParseCache(os.path.join(tmpdir, 'cache.db')) as cache:
+            assert len(PyCookieParser.batch_process(tmpdir, cache=cache)['device1'][0]) == 7
+            for workers in (1, 2):
+                results = PyCookieParser.batch_process(tmpdir, workers=workers, cache=cache, fields=('url',))
+                assert results['device1'][0] == {'url': '.play.google.com'}
+
+        results = asyncio.run(AsyncPyCookieParser.batch_process(tmpdir, fields=('name',)))
+        assert results['device1'][0] == {'name': '_ga'}
+
+        with pytest.raises(ValueError):
+            PyCookieParser.batch_process(tmpdir, fields=('domain',))
+
+
+def test_cookie_filter_skips_name_of_other_domains():
+    page = _build_page([_build_cookie('.other.com', 'BADNAME', '/', 'v'), _build_cookie('.good.com', 'ok', '/', 'v')])
+    # the name of the first cookie is not valid UTF-8, and is never decoded
+    data = _build_cookie_file([page]).replace(b'BADNAME', b'\xffADNAME')
+    cookie_filter = CookieFilter(domains=('good.com',))
+
+    parser = PyCookieParser.from_bytes(data)
+    assert parser.read_cookie_file() is None
+    assert [cookie['name'] for cookie in parser.read_cookie_file(cookie_filter=cookie_filter)] == ['ok']
+    assert parser.read_cookie_file(cookie_filter=cookie_filter, fields=('name',)) == [{'name': 'ok'}]
+
+
+def test_cookie_filter_parse():
+    cookie_filter = CookieFilter.parse(['domain=.google.com', 'name=NID', 'name=SNID', 'insecure',
+                                        'expires_after=2017-08-24', 'created_before=1503588500'])
+    assert cookie_filter.domains == ('.google.com',)
+    assert cookie_filter.names == frozenset(['NID', 'SNID'])
+    assert cookie_filter.secure is False
+    assert cookie_filter.expires_after == 1503532800
+    assert cookie_filter.created_before == 1503588500
+    assert repr(cookie_filter) == repr(CookieFilter.parse(['name=SNID', 'name=NID', 'domain=.google.com', 'insecure',
+                                                           'expires_after=2017-08-24T00:00:00+00:00',
+                                                           'created_before=1503588500']))
+
+    # unexpired is checked against the current time when a cookie is matched
+    assert repr(CookieFilter.parse(['unexpired'])) == 'CookieFilter(unexpired=True)'
+    assert CookieFilter(unexpired=True).matches_header(0, time() + 60, 0)
+    assert not CookieFilter(unexpired=True).matches_header(0, time() - 60, 0)
+    for expression in ('domain=', 'secure=yes', 'expires_after=tomorrow', 'color=blue'):
+        with pytest.raises(ValueError):
+            CookieFilter.parse([expression])
+
+
+def test_batch_processing_cookie_filter():
+    cookie_file_src = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    cookie_filter = CookieFilter(domains=('usedust.com',), names=('_ga',))
+
+    with TemporaryDirectory() as tmpdir:
+        import shutil
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'device1'))
+        shutil.copy2(cookie_file_src, os.path.join(tmpdir, 'device2'))
+
+        for workers in (1, 2):
+            results = PyCookieParser.batch_process(tmpdir, workers=workers, cookie_filter=cookie_filter)
+            assert sorted(results) == ['device1', 'device2']
+            assert all([cookie['name'] for cookie in cookies] == ['_ga'] for cookies in results.values())
+
+        results = asyncio.run(AsyncPyCookieParser.batch_process(tmpdir, cookie_filter=cookie_filter))
+        assert all(len(cookies) == 1 for cookies in results.values())
+
+        with ParseCache(os.path.join(tmpdir, 'cache.db')) as cache:
+            assert len(PyCookieParser.batch_process(tmpdir, cache=cache)['device1']) == 12
+            results = PyCookieParser.batch_process(tmpdir, cache=cache, cookie_filter=cookie_filter)
+            assert len(results['device1']) == 1
+
+            # a filter on unexpired cookies depends on the current time, so it bypasses the cache
+            hits, misses = cache.hits, cache.misses
+            results = PyCookieParser.batch_process(tmpdir, cache=cache, cookie_filter=CookieFilter.parse(['unexpired']))
+            assert results == {'device1': [], 'device2': []}
+            assert (cache.hits, cache.misses) == (hits, misses)
+
+        cache = MemoryCache()
+        with PyCookieParser(os.path.join(tmpdir, 'device1'), cache=cache) as parser:
+            assert parser.read_cookie_file(cookie_filter=CookieFilter(unexpired=True)) == []
+            assert parser.read_cookie_file(cookie_filter=CookieFilter(unexpired=True)) == []
+            assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+
+def test_from_bytes():
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    with PyCookieParser(cookie_file) as parser:
+        expected = parser.read_cookie_file()
+    with open(cookie_file, 'rb') as f:
+        data = f.read()
+
+    with PyCookieParser.from_bytes(data) as parser:
+        assert parser.read_cookie_file() == expected
+        assert list(parser.iter_cookies()) == expected
+        table = parser.read_cookie_table()
+    with PyCookieParser(cookie_file) as parser:
+        assert list(table.rows()) == list(parser.read_cookie_table().rows())
+
+    parser = PyCookieParser.from_buffer(memoryview(bytearray(data)))
+    assert parser.read_cookie_file(workers=2) == expected
+    parser.close_file()
+    assert parser.read_cookie_file() == expected
+
+    assert PyCookieParser.from_buffer(bytearray(data)).read_cookie_file(as_record=True) == \
+        PyCookieParser.from_bytes(data).read_cookie_file(as_record=True)
+
+
+def test_from_fileobj(capsys):
+    import zipfile
+    cookie_file = 'tests/fdda2f81cc0b838dc00e3050b14da7ef2d835f3c'
+    with PyCookieParser(cookie_file) as parser:
+        expected = parser.read_cookie_file()
+
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        zip_file.write(cookie_file, 'Cookies.binarycookies')
+        zip_file.writestr('notes.txt', 'this is not a cookie file')
+
+    with zipfile.ZipFile(archive) as zip_file:
+        with zip_file.open('Cookies.binarycookies') as member:
+            parser = PyCookieParser.from_fileobj(member, 'Cookies.binarycookies')
+        assert parser.read_cookie_file() == expected
+
+        with zip_file.open('notes.txt') as member:
+            assert PyCookieParser.from_fileobj(member).read_cookie_file() is None
+        assert 'notes.txt is not a binary cookie file' in capsys.readouterr().out
+
+
+def test_find_files():
+    with TemporaryDirectory() as tmpdir:
+        for index in range(3):
+            subdirectory = os.path.join(tmpdir, f'dir_{index}', 'nested')
+            os.makedirs(subdirectory)
+            for name in ('a', 'b'):
+                with open(os.path.join(subdirectory, name), 'w') as f:
+                    f.write('file')
+        with open(os.path.join(tmpdir, 'top'), 'w') as f:
+            f.write('file')
+        os.symlink(os.path.join(tmpdir, 'dir_0'), os.path.join(tmpdir, 'link'))
+
+        expected = [os.path.relpath(os.path.join(root, name), tmpdir)
+                    for root, _, files in os.walk(tmpdir) for name in files]
+        found = list(PyCookieParser._find_files(tmpdir, threads=2))
+
+        assert [rel_path for rel_path, _, _ in found] == expected
+        assert all(path == os.path.join(tmpdir, rel_path) for rel_path, path, _ in found)
+        assert all(size == 4 for _, _, size in found)
+        assert len(found) == 7
+
+
 def test_read_cookie_file_silent(capsys):
     with NamedTemporaryFile(delete=False) as f:
         f.write(b'invalid_data')